@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+"""Benchmarks for the mortgage core and rendering paths
+
+Run with:
+
+    python -m bloodloan.benchmark [--json results.json] [--compare baseline.json]
+
+Everything runs offline: mapping benchmarks use a fake HTTP function instead of OpenStreetMap.
+Results can be written as JSON and compared against an earlier run to spot regressions,
+for instance after swapping one schedule engine for another.
+"""
+
+import argparse
+import fnmatch
+import functools
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy
+
+from bloodloan.mortgage import amortize
+from bloodloan.mortgage import closing
+from bloodloan.mortgage import costconfig
+from bloodloan.mortgage import expenses
+from bloodloan.mortgage import formatting
+from bloodloan.mortgage import metrics
+from bloodloan.mortgage import mmath
+from bloodloan.mortgage import schedule
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+
+SCRIPTDIR = os.path.dirname(os.path.realpath(__file__))
+CONFIGDIR = os.path.join(os.path.dirname(SCRIPTDIR), 'configs')
+
+# A typical property for benchmarks that don't vary it
+INTEREST_RATE = 0.04
+SALE_PRICE = 300000
+PRINCIPAL = 290000
+RENT = 2000
+APPRECIATION = 0.03
+PROPERTY_TAXES = 4000
+OVERPAYMENT = 100
+
+# A geocoding response like the ones OpenStreetMap returns
+FAKE_GEOCODE = [{
+    'lat': '30.2672',
+    'lon': '-97.7431',
+    'display_name': "123 Main St, Austin, Travis County, Texas, USA",
+    'address': {'neighborhood': "Downtown", 'county': "Travis County"},
+}]
+
+
+class FakeResponse:
+    """A response from fake_httpget()"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        """Return the response data"""
+        return self.data
+
+
+def fake_httpget(_):
+    """Stand in for requests.get, returning the same geocoding response for every URI"""
+    return FakeResponse(FAKE_GEOCODE)
+
+
+def loan_schedule(years, costs=None, engine=schedule.schedule):
+    """Calculate a schedule for the typical property, as a list"""
+    term = years * mmath.MONTHS_IN_YEAR
+    return list(engine(
+        INTEREST_RATE, SALE_PRICE, PRINCIPAL, SALE_PRICE, term,
+        overpayments=[OVERPAYMENT] * term, appreciation=APPRECIATION,
+        monthlycosts=costs, monthlyrent=RENT))
+
+
+def frame_schedule(years, costs=None):
+    """Calculate a schedule for the typical property, as a frame.ScheduleFrame"""
+    term = years * mmath.MONTHS_IN_YEAR
+    return amortize.amortize(
+        INTEREST_RATE, SALE_PRICE, PRINCIPAL, SALE_PRICE, term,
+        overpayments=[OVERPAYMENT] * term, appreciation=APPRECIATION,
+        monthlycosts=costs, monthlyrent=RENT)
+
+
+def cases(configdir):
+    """Yield (name, params, function) for every benchmark
+
+    name        the name of the code path being measured
+    params      a dict describing this variation of it
+    function    a function taking no arguments to time
+    """
+    allcosts = costconfig.CostConfigurationCollection(directory=configdir)
+
+    yield (
+        'costconfig.CostConfigurationCollection', {'configs': len(allcosts.configs)},
+        functools.partial(costconfig.CostConfigurationCollection, directory=configdir))
+    yield from config_cache_cases(configdir, len(allcosts.configs))
+
+    for years in (15, 30, 50):
+        for withcosts in (False, True):
+            params = {'years': years, 'costs': withcosts}
+            costs = allcosts.monthly if withcosts else None
+            yield 'schedule.schedule', params, functools.partial(loan_schedule, years, costs)
+            yield 'amortize.schedule', params, functools.partial(
+                loan_schedule, years, costs, engine=amortize.schedule)
+            yield 'amortize.amortize', params, functools.partial(frame_schedule, years, costs)
+
+    yield 'expenses.monthly_expenses', {'costs': len(allcosts.monthly)}, functools.partial(
+        expenses.monthly_expenses, allcosts.monthly, SALE_PRICE, SALE_PRICE, PRINCIPAL, RENT)
+
+    for config in list(allcosts.configs) + [None]:
+        closingcosts = config.closing if config else allcosts.closing
+        yield 'closing.close', {'config': config.label if config else "all"}, functools.partial(
+            closing.close,
+            SALE_PRICE, INTEREST_RATE, 30 * mmath.MONTHS_IN_YEAR, PROPERTY_TAXES, closingcosts)
+
+    plan = closing.closing_plan(allcosts)
+    yield 'closing.ClosingPlan', {'costs': len(plan)}, functools.partial(
+        closing.ClosingPlan, allcosts.closing)
+    yield 'closing.ClosingPlan.close', {'costs': len(plan)}, functools.partial(
+        plan.close, SALE_PRICE, INTEREST_RATE, PROPERTY_TAXES)
+    yield 'closing.ClosingPlan.totals', {'costs': len(plan)}, functools.partial(
+        plan.totals, SALE_PRICE, INTEREST_RATE, PROPERTY_TAXES)
+
+    months = loan_schedule(30, allcosts.monthly)
+    yield 'schedule.monthly2yearly_schedule', {'months': len(months)}, lambda: list(
+        schedule.monthly2yearly_schedule(months))
+
+    for years in (30, 50):
+        column = frame_schedule(years).totalpmt
+        params = {'rows': len(column)}
+        yield 'formatting.dollar', params, lambda column=column: [
+            formatting.dollar(amount) for amount in column]
+        yield 'formatting.dollars', params, functools.partial(formatting.dollars, column)
+
+    payments = frame_schedule(30, allcosts.monthly)
+    yield 'metrics.evaluate', {'rows': len(payments)}, functools.partial(
+        metrics.evaluate, payments, SALE_PRICE - PRINCIPAL, 0, SALE_PRICE)
+    flows = metrics.hold_cashflows(payments, SALE_PRICE - PRINCIPAL, range(1, len(payments) + 1))
+    yield 'metrics.irr', {'rows': len(flows)}, functools.partial(metrics.irr, flows)
+
+    yield from template_cases(allcosts)
+    yield from streetmap_cases()
+
+
+def config_cache_cases(configdir, nconfigs):
+    """Yield benchmarks for loading configs that haven't changed since they were cached"""
+    with tempfile.TemporaryDirectory() as cachedir:
+        cachepath = os.path.join(cachedir, 'configs.pickle')
+        costconfig.ConfigFileCache(cachepath).load(configdir)
+
+        # A new cache object for every call, like a kernel that was just started
+        yield 'costconfig.CostConfigurationCollection', {
+            'configs': nconfigs, 'cache': 'pickle'}, lambda: costconfig.CostConfigurationCollection(
+                directory=configdir, cache=costconfig.ConfigFileCache(cachepath))
+
+        memorycache = costconfig.ConfigFileCache()
+        memorycache.load(configdir)
+        yield 'costconfig.CostConfigurationCollection', {
+            'configs': nconfigs, 'cache': 'memory'}, functools.partial(
+                costconfig.CostConfigurationCollection, directory=configdir, cache=memorycache)
+
+
+def template_cases(allcosts):
+    """Yield a benchmark for rendering each template"""
+    from bloodloan.ui.templ import Templ  # pylint: disable=C0415
+
+    term = 30 * mmath.MONTHS_IN_YEAR
+    closed = closing.close(SALE_PRICE, INTEREST_RATE, term, PROPERTY_TAXES, allcosts.closing)
+    summary, summary_no_over = amortize.amortize_tracks(
+        INTEREST_RATE, SALE_PRICE, closed.principal_total, SALE_PRICE, term,
+        [[OVERPAYMENT for _ in range(term)], None], appreciation=APPRECIATION,
+        monthlycosts=allcosts.monthly, monthlyrent=RENT, keep=[0])
+
+    yield 'Templ.Instructions', {}, Templ.Instructions.render
+    yield 'Templ.Close', {}, functools.partial(Templ.Close.render, closeresult=closed)
+    yield 'Templ.SchedulePreface', {}, functools.partial(
+        Templ.SchedulePreface.render,
+        interestrate=INTEREST_RATE, principal=closed.principal_total, term=term,
+        overpayment=OVERPAYMENT, appreciation=APPRECIATION,
+        summary=summary, summary_no_over=summary_no_over)
+    yield 'Templ.MonthlyCosts', {}, functools.partial(
+        Templ.MonthlyCosts.render,
+        costs=summary.frame[0].othercosts, rent=RENT, mortgagepmt=summary.frame.regularpmt[0])
+
+    for years in (30, 50):
+        payments = frame_schedule(years, allcosts.monthly)
+        yield 'Templ.Schedule', {'rows': len(payments)}, functools.partial(
+            Templ.Schedule.render,
+            principal=PRINCIPAL, value=SALE_PRICE, loanpayments=payments,
+            paymentinterval_name="Month")
+
+
+def streetmap_cases():
+    """Yield benchmarks for geocoding, with a fake HTTP function so they run offline"""
+    from bloodloan.ui import streetmap  # pylint: disable=C0415
+
+    address = "123 Main St, Austin, TX"
+    mapper = streetmap.OpenStreetMapper(httpget=fake_httpget)
+    yield 'streetmap.OpenStreetMapper.geocode', {}, functools.partial(mapper.geocode, address)
+
+    with tempfile.TemporaryDirectory() as cachedir:
+        cache = streetmap.GeocodeCache(os.path.join(cachedir, 'geocode.sqlite'))
+        caching = streetmap.CachingMapper(mapper, cache)
+        caching.geocode(address)
+        yield 'streetmap.CachingMapper.geocode', {'cached': True}, functools.partial(
+            caching.geocode, address)
+
+
+def measure(function, repeat=5, mintime=0.2):
+    """Time a function
+
+    function    a function taking no arguments
+    repeat      number of timing runs
+    mintime     each run calls the function enough times to take at least this many seconds
+
+    returns     a dict of timing results, in seconds per call
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, int(number * mintime / 0.2))
+    times = [total / number for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'number': number,
+        'repeat': repeat,
+        'best': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+    }
+
+
+def casename(name, params):
+    """A unique name for a benchmark and its params, like "schedule.schedule[years=30]" """
+    if not params:
+        return name
+    return f"{name}[{','.join(f'{key}={value}' for key, value in params.items())}]"
+
+
+def run(configdir=CONFIGDIR, patterns=None, repeat=5, mintime=0.2):
+    """Run benchmarks, logging each result as it finishes
+
+    patterns    list of fnmatch patterns; if given, only run benchmarks whose name matches one
+
+    returns     a dict of machine information and a list of results
+    """
+    results = []
+    for name, params, function in cases(configdir):
+        fullname = casename(name, params)
+        if patterns and not any(fnmatch.fnmatch(fullname, pattern) for pattern in patterns):
+            continue
+        result = {'name': name, 'params': params, 'id': fullname}
+        result.update(measure(function, repeat=repeat, mintime=mintime))
+        logger.info("%s: %.3fms", fullname, result['best'] * 1e3)
+        results.append(result)
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=1.2):
+    """Compare results to a baseline run
+
+    returns     a list of (id, baseline best, current best, ratio) tuples
+                for benchmarks that got slower by more than threshold
+    """
+    before = {result['id']: result['best'] for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        if result['id'] in before:
+            ratio = result['best'] / before[result['id']]
+            if ratio > threshold:
+                regressions.append((result['id'], before[result['id']], result['best'], ratio))
+    return regressions
+
+
+def main(*arguments):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the mortgage core and rendering")
+    parser.add_argument(
+        'patterns', nargs='*',
+        help="Only run benchmarks matching these patterns, like 'schedule.*' or '*years=30*'")
+    parser.add_argument('--configs', default=CONFIGDIR, help="Cost configuration directory")
+    parser.add_argument('--repeat', type=int, default=5, help="Number of timing runs")
+    parser.add_argument(
+        '--mintime', type=float, default=0.2, help="Minimum seconds for each timing run")
+    parser.add_argument('--json', help="Write results to this JSON file, or - for stdout")
+    parser.add_argument('--compare', help="Compare against results from an earlier --json run")
+    parser.add_argument(
+        '--threshold', type=float, default=1.2,
+        help="With --compare, report benchmarks that are this many times slower")
+    parsed = parser.parse_args(arguments or sys.argv[1:])
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stderr)
+    # The engines log every schedule they calculate, which would drown out the results
+    logging.getLogger('bloodloan.mortgage').setLevel(logging.WARNING)
+
+    results = run(
+        configdir=parsed.configs, patterns=parsed.patterns,
+        repeat=parsed.repeat, mintime=parsed.mintime)
+
+    if parsed.json == '-':
+        json.dump(results, sys.stdout, indent=2)
+    elif parsed.json:
+        with open(parsed.json, 'w') as jsonfile:
+            json.dump(results, jsonfile, indent=2)
+
+    if parsed.compare:
+        with open(parsed.compare) as baselinefile:
+            regressions = compare(results, json.load(baselinefile), parsed.threshold)
+        for benchid, before, after, ratio in regressions:
+            logger.warning(
+                "REGRESSION %s: %.3fms -> %.3fms (%.2fx)",
+                benchid, before * 1e3, after * 1e3, ratio)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
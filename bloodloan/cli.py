@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+
+"""Batch mortgage calculations from the command line
+
+Read property scenarios from a CSV or JSON Lines file,
+calculate closing costs and a mortgage schedule for each one,
+and stream the results to CSV, JSON Lines, or Parquet.
+
+Scenarios are read and results written a window at a time,
+so feeds of any size can be processed without holding them in memory.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import sys
+
+from bloodloan.mortgage import amortize
+from bloodloan.mortgage import closing
+from bloodloan.mortgage import costconfig
+from bloodloan.mortgage import mmath
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+
+def labels(value):
+    """Parse a list of cost configuration labels
+
+    In a CSV file, labels are separated by semicolons; in JSON Lines they may also be a list
+    """
+    if isinstance(value, str):
+        value = value.split(';')
+    return tuple(label.strip() for label in value if label.strip())
+
+
+# Scenario fields, mapped to (type, default); a default of None means the field is required.
+# Like the notebook, interestrate and appreciation are percentages, and years is the loan term.
+SCENARIO_FIELDS = {
+    'saleprice': (float, None),
+    'interestrate': (float, None),
+    'years': (int, 30),
+    'rent': (float, 0),
+    'overpayment': (float, 0),
+    'appreciation': (float, 0),
+    'propertytaxes': (float, 0),
+    'costs': (labels, ()),
+}
+
+# Output fields in summary mode, one row per scenario
+SUMMARY_FIELDS = (
+    'id',
+    'saleprice',
+    'interestrate',
+    'years',
+    'loanamount',
+    'cashatclosing',
+    'monthlypayment',
+    'firstmonthcosts',
+    'firstmonthcashflow',
+    'months',
+    'totalinterest',
+    'months_no_over',
+    'totalinterest_no_over',
+)
+
+# Output fields in schedule mode, one row per month of each scenario
+SCHEDULE_FIELDS = (
+    'id',
+    'month',
+    'regularpmt',
+    'interestpmt',
+    'balancepmt',
+    'overpmt',
+    'totalothercosts',
+    'totalpmt',
+    'principal',
+    'value',
+    'equity',
+    'totalinterest',
+)
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+# Calculation state for this process; see init_worker()
+_WORKER = {}
+
+
+def parse_scenario(record):
+    """Convert a record read from an input file to a scenario dict
+
+    record      a dict of field name to string (from CSV) or JSON value;
+                an 'id' field is passed through to the results, and other unknown fields ignored
+    """
+    scenario = {'id': record.get('id')}
+    for name, (fieldtype, default) in SCENARIO_FIELDS.items():
+        value = record.get(name)
+        if value is None or value == "":
+            if default is None:
+                raise ValueError(f"Missing required field {name}")
+            value = default
+        scenario[name] = fieldtype(value)
+    return scenario
+
+
+def read_scenarios(infile, fmt):
+    """Yield (line number, record) tuples from an open input file
+
+    infile      an open text file
+    fmt         'csv' or 'jsonl'
+
+    CSV records are dicts; JSON Lines records are the unparsed lines,
+    parsed by evaluate_record() so that one malformed line only fails its own record
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(infile)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for lineno, line in enumerate(infile, start=1):
+            if line.strip():
+                yield lineno, line
+    else:
+        raise ValueError(f"Unknown input format {fmt}")
+
+
+def init_worker(configdir):
+    """Load cost configurations once for each worker process
+
+    configdir   directory of cost configuration YAML files, or None for no cost configs
+    """
+    _WORKER['configs'] = costconfig.CostConfigurationCollection(directory=configdir)
+
+
+def selected_costs(selection):
+    """Get a collection of the cost configs with the given labels
+
+    The collection keeps the same collection for each distinct selection,
+    so that each selection compiles its monthly CostPlan only once
+    """
+    costs = _WORKER['configs'].get(selection)
+    missing = set(selection) - set(costs.labels)
+    if missing:
+        raise ValueError(f"Unknown cost configs {sorted(missing)}")
+    return costs
+
+
+def evaluate(scenario, schedules=False):
+    """Calculate closing costs and a mortgage schedule for a scenario
+
+    scenario    a dict from parse_scenario()
+    schedules   if True, return a row for each month of the schedule;
+                otherwise, return a single summary row
+
+    returns     a list of output row dicts
+    """
+    costs = selected_costs(scenario['costs'])
+    interestrate = mmath.percent2decimal(scenario['interestrate'])
+    saleprice = scenario['saleprice']
+    term = scenario['years'] * mmath.MONTHS_IN_YEAR
+
+    downpayment, fees, principal = closing.closing_plan(costs).totals(
+        saleprice, interestrate, scenario['propertytaxes'])
+    overpayments = [scenario['overpayment'] for _ in range(term)]
+
+    # TODO: currently assuming sale price is value, like the notebook does
+    summary, summary_no_over = amortize.amortize_tracks(
+        interestrate, saleprice, principal, saleprice, term, [overpayments, None],
+        appreciation=mmath.percent2decimal(scenario['appreciation']),
+        monthlycosts=costs.monthly_plan, monthlyrent=scenario['rent'], keep=[0])
+    payments = summary.frame
+
+    if schedules:
+        columns = {
+            name: payments.columns[name].tolist()
+            for name in SCHEDULE_FIELDS if name not in ('id', 'month')}
+        return [
+            dict(
+                id=scenario['id'],
+                month=month + 1,
+                **{name: column[month] for name, column in columns.items()})
+            for month in range(len(payments))]
+
+    first = payments[0] if len(payments) else None
+    return [{
+        'id': scenario['id'],
+        'saleprice': saleprice,
+        'interestrate': scenario['interestrate'],
+        'years': scenario['years'],
+        'loanamount': principal,
+        'cashatclosing': downpayment + fees,
+        'monthlypayment': first.regularpmt if first else 0,
+        'firstmonthcosts': first.totalothercosts if first else 0,
+        'firstmonthcashflow': scenario['rent'] - first.totalpmt if first else 0,
+        'months': summary.months,
+        'totalinterest': summary.totalinterest,
+        'months_no_over': summary_no_over.months,
+        'totalinterest_no_over': summary_no_over.totalinterest,
+    }]
+
+
+def evaluate_record(args):
+    """Parse and evaluate one input record, in a worker process
+
+    args        a tuple of ((line number, record dict or JSON line), schedules)
+
+    returns     a tuple of (line number, list of output rows, error message or None)
+    """
+    (lineno, record), schedules = args
+    try:
+        if isinstance(record, str):
+            record = json.loads(record)
+            if not isinstance(record, dict):
+                raise ValueError(f"Expected a JSON object, not {type(record).__name__}")
+        scenario = parse_scenario(record)
+        if scenario['id'] is None:
+            scenario['id'] = lineno
+        return lineno, evaluate(scenario, schedules=schedules), None
+    except Exception as exc:  # pylint: disable=W0703
+        # One bad listing shouldn't stop the whole feed
+        return lineno, [], f"{type(exc).__name__}: {exc}"
+
+
+class CsvWriter:
+    """Write rows to a CSV file"""
+
+    def __init__(self, outfile, fields):
+        self.writer = csv.DictWriter(outfile, fieldnames=fields)
+        self.writer.writeheader()
+
+    def write(self, rows):
+        """Write a list of row dicts"""
+        self.writer.writerows(rows)
+
+    def close(self):
+        """Finish writing"""
+
+
+class JsonlWriter:
+    """Write rows to a JSON Lines file"""
+
+    def __init__(self, outfile, fields):
+        self.outfile = outfile
+        self.fields = fields
+
+    def write(self, rows):
+        """Write a list of row dicts"""
+        for row in rows:
+            self.outfile.write(json.dumps({name: row[name] for name in self.fields}))
+            self.outfile.write("\n")
+
+    def close(self):
+        """Finish writing"""
+
+
+class ParquetWriter:
+    """Write rows to a Parquet file, one row group per batch of rows
+
+    Requires pyarrow, which is not otherwise a dependency
+    """
+
+    def __init__(self, path, fields, batchsize=65536):
+        import pyarrow  # pylint: disable=C0415
+        import pyarrow.parquet  # pylint: disable=C0415
+        self.pyarrow = pyarrow
+        self.fields = fields
+        self.batchsize = batchsize
+        self.path = path
+        self.writer = None
+        self.pending = []
+
+    def write(self, rows):
+        """Write a list of row dicts, once there are enough for a row group"""
+        self.pending.extend(rows)
+        if len(self.pending) >= self.batchsize:
+            self.flush()
+
+    def flush(self):
+        """Write any pending rows as a row group"""
+        if not self.pending:
+            return
+        table = self.pyarrow.table({
+            name: [row[name] for row in self.pending] for name in self.fields})
+        if self.writer is None:
+            # The id column may be strings or line numbers, so take the schema from the data
+            self.writer = self.pyarrow.parquet.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+        self.pending = []
+
+    def close(self):
+        """Write any pending rows and finish the file"""
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def guess_format(path, formats):
+    """Guess a file format from a path's extension, or return None"""
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    extension = {'ndjson': 'jsonl', 'json': 'jsonl', 'parq': 'parquet'}.get(extension, extension)
+    return extension if extension in formats else None
+
+
+def windows(iterable, size):
+    """Yield lists of up to size items from iterable"""
+    window = []
+    for item in iterable:
+        window.append(item)
+        if len(window) >= size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+def run(records, writer, schedules=False, configdir=None, jobs=1, chunksize=16):
+    """Evaluate records and write the results, in order
+
+    records     an iterable of (line number, record dict) tuples
+    writer      a CsvWriter, JsonlWriter, or ParquetWriter
+    schedules   whether to write full schedules instead of summaries
+    configdir   directory of cost configuration YAML files, or None
+    jobs        number of worker processes; if 1, work in this process
+    chunksize   number of records to send to a worker at a time
+
+    returns     a tuple of (number of scenarios written, number that failed)
+    """
+    written = failed = 0
+
+    def handle(results):
+        nonlocal written, failed
+        for lineno, rows, error in results:
+            if error:
+                logger.error("Line %s: %s", lineno, error)
+                failed += 1
+            else:
+                writer.write(rows)
+                written += 1
+
+    tasks = ((record, schedules) for record in records)
+    if jobs == 1:
+        init_worker(configdir)
+        handle(map(evaluate_record, tasks))
+        return written, failed
+
+    # Pool.imap() would read the whole input as fast as it can,
+    # so feed it a bounded window at a time instead
+    with multiprocessing.Pool(jobs, initializer=init_worker, initargs=(configdir,)) as pool:
+        for window in windows(tasks, jobs * chunksize * 4):
+            handle(pool.imap(evaluate_record, window, chunksize=chunksize))
+    return written, failed
+
+
+def parseargs(arguments):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Calculate closing costs and mortgage schedules for many properties")
+    parser.add_argument(
+        'input',
+        help="CSV or JSON Lines file of property scenarios, or - for standard input. "
+        f"Fields: id (optional), {', '.join(SCENARIO_FIELDS)}. "
+        "Rates are percentages; costs is a list of cost config labels, separated by ';' in CSV.")
+    parser.add_argument(
+        '--input-format', choices=('csv', 'jsonl'),
+        help="Input format; guessed from the input file extension by default")
+    parser.add_argument(
+        '--output', '-o', default='-',
+        help="Output file, or - for standard output (the default)")
+    parser.add_argument(
+        '--format', '-f', choices=FORMATS,
+        help="Output format; guessed from the output file extension, or csv by default")
+    parser.add_argument(
+        '--configs', '-c',
+        help="Directory of cost configuration YAML files, such as the configs/ directory")
+    parser.add_argument(
+        '--schedules', action='store_true',
+        help="Write a row for every month of every schedule, instead of one summary per property")
+    parser.add_argument(
+        '--jobs', '-j', type=int, default=1,
+        help="Number of worker processes; 0 means one per CPU")
+    parser.add_argument(
+        '--chunksize', type=int, default=16,
+        help="Number of properties to send to a worker process at a time")
+    parser.add_argument(
+        '--verbose', '-v', action='count', default=0,
+        help="Log more; may be passed twice")
+
+    parsed = parser.parse_args(arguments)
+
+    if parsed.input_format is None:
+        parsed.input_format = guess_format(parsed.input, ('csv', 'jsonl'))
+        if parsed.input_format is None:
+            parser.error("Cannot guess the input format; pass --input-format")
+    if parsed.format is None:
+        parsed.format = guess_format(parsed.output, FORMATS) or 'csv'
+    if parsed.format == 'parquet' and parsed.output == '-':
+        parser.error("Parquet output must be written to a file")
+    if parsed.jobs < 0:
+        parser.error("--jobs cannot be negative")
+    parsed.jobs = parsed.jobs or os.cpu_count()
+
+    return parsed
+
+
+def main(*arguments):
+    """Command line entry point"""
+    parsed = parseargs(arguments or sys.argv[1:])
+    logging.basicConfig(
+        level=[logging.WARNING, logging.INFO, logging.DEBUG][min(parsed.verbose, 2)],
+        format='%(levelname)-.4s %(asctime)s %(name)s: %(message)s')
+
+    fields = SCHEDULE_FIELDS if parsed.schedules else SUMMARY_FIELDS
+    infile = sys.stdin if parsed.input == '-' else open(parsed.input, newline='')
+    if parsed.format == 'parquet':
+        outfile = None
+        try:
+            writer = ParquetWriter(parsed.output, fields)
+        except ImportError:
+            infile.close()
+            sys.exit("Parquet output requires pyarrow; try 'pip install pyarrow'")
+    else:
+        outfile = sys.stdout if parsed.output == '-' else open(parsed.output, 'w', newline='')
+        writer = {'csv': CsvWriter, 'jsonl': JsonlWriter}[parsed.format](outfile, fields)
+
+    try:
+        written, failed = run(
+            read_scenarios(infile, parsed.input_format), writer,
+            schedules=parsed.schedules, configdir=parsed.configs,
+            jobs=parsed.jobs, chunksize=parsed.chunksize)
+        writer.close()
+    finally:
+        for fileobj in (infile, outfile):
+            if fileobj not in (None, sys.stdin, sys.stdout):
+                fileobj.close()
+
+    logger.info("Wrote %s properties, %s failed", written, failed)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Logging helpers that keep logging cheap in hot code
+
+Hot code should log with %-style arguments, like logger.debug("Month %s", idx),
+so that messages are only formatted if a handler will actually write them.
+
+Messages logged once per month of a schedule go to a separate logger from monthlogger(),
+so they can be turned on, sampled with a SampleFilter, or left off (the default)
+independently of the module's other messages.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+
+
+def monthlogger(name):
+    """Get the logger for messages that a module logs once per month of a schedule
+
+    name        the module's logger name, like __name__
+
+    Its level defaults to WARNING, so per-month debug messages are off
+    even when the rest of the module logs at DEBUG
+    """
+    result = logging.getLogger(f"{name}.months")
+    if result.level == logging.NOTSET:
+        result.setLevel(logging.WARNING)
+    return result
+
+
+class SampleFilter(logging.Filter):
+    """Keep only some of the records logged with the same message template
+
+    every       keep the first of every this many records with the same template;
+                0 drops them all
+
+    Meant for a monthlogger(), where the template is the same every month
+    """
+
+    def __init__(self, every=12):
+        super().__init__()
+        self.every = every
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.every <= 0:
+            return False
+        with self._lock:
+            count = self.counts.get(record.msg, 0)
+            self.counts[record.msg] = count + 1
+        return count % self.every == 0
+
+
+class QueuedRotatingFileHandler(logging.Handler):
+    """A rotating log file that is written by a background thread
+
+    Logging calls only put the record on a queue;
+    a QueueListener thread formats it and writes it to disk,
+    so that e.g. widget callbacks never wait on the disk.
+
+    Takes the same arguments as logging.handlers.RotatingFileHandler,
+    so it can be used in a logging.config.dictConfig() configuration.
+    This wraps a QueueHandler rather than subclassing it,
+    because from Python 3.12 dictConfig() configures QueueHandler subclasses differently,
+    expecting the handlers to send records to in the configuration instead.
+    """
+
+    def __init__(self, filename, mode='a', maxBytes=0, backupCount=0, encoding=None, delay=False):
+        super().__init__()
+        self.queue = queue.Queue()
+        self.enqueuer = logging.handlers.QueueHandler(self.queue)
+        self.target = logging.handlers.RotatingFileHandler(
+            filename, mode=mode, maxBytes=maxBytes, backupCount=backupCount,
+            encoding=encoding, delay=delay)
+        self.listener = logging.handlers.QueueListener(self.queue, self.target)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        # Format in the listener thread, not in the thread that logged the message.
+        # (The QueueHandler still merges the message with its arguments,
+        # so that arguments can't change before the listener gets to them.)
+        self.target.setFormatter(fmt)
+
+    def emit(self, record):
+        self.enqueuer.emit(record)
+
+    def close(self):
+        """Write any queued records, then stop the background thread and close the file"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            self.target.close()
+        super().close()
@@ -0,0 +1,249 @@
+"""Vectorized mortgage schedule
+
+Calculate a whole amortization schedule at once with NumPy arrays,
+instead of one month at a time like schedule.schedule() does.
+The results are the same, including how the final month is truncated.
+
+schedule() adapts this to schedule.schedule()'s interface of LoanPayment objects,
+but without monthly costs it just calls schedule.schedule(),
+which is faster when the caller wants LoanPayment objects anyway.
+"""
+
+import logging
+
+import numpy
+
+from bloodloan.mortgage import costconfig
+from bloodloan.mortgage import frame
+from bloodloan.mortgage import mmath
+from bloodloan.mortgage import schedule as mschedule
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+
+def principal_paths(principal, interestrate, mpay, overpayments):
+    """Remaining principal at the beginning of each month, ignoring the end of the loan
+
+    principal       total amount of the loan
+    interestrate    yearly interest rate of the loan
+    mpay            regular monthly payment
+    overpayments    array of overpayment amounts for each month;
+                    may be 2d, with one row per track of overpayments
+
+    returns         an array one element longer than overpayments along its last axis;
+                    the last element is the principal after the last overpayment
+
+    Solves the recurrence principal[k+1] = principal[k] * (1 + mrate) - mpay - overpayments[k]
+    with cumulative sums instead of a loop:
+
+        principal[k] = (1 + mrate)**k * (
+            principal[0] - sum((mpay + overpayments[j]) / (1 + mrate)**(j + 1) for j < k))
+
+    The results are not exactly what schedule.schedule() gets by subtracting month by month,
+    but they agree to well under a cent.
+    """
+    overpayments = numpy.asarray(overpayments, dtype=float)
+    discount = (1 + mmath.monthlyrate(interestrate)) ** -numpy.arange(overpayments.shape[-1] + 1)
+    paid = numpy.cumsum((mpay + overpayments) * discount[1:], axis=-1)
+    paid = numpy.concatenate((numpy.zeros(overpayments.shape[:-1] + (1,)), paid), axis=-1)
+    return (principal - paid) / discount
+
+
+def overpayment_tracks(tracks, term):
+    """Build a 2d array of overpayments with one row per track
+
+    tracks          list of overpayment arrays, as passed to schedule.schedule();
+                    None means no overpayments
+    term            loan term in months
+
+    Tracks are padded with zeros or cut off to term + 1 months,
+    because schedule.schedule() will not go past month number term
+    """
+    overs = numpy.zeros((len(tracks), term + 1))
+    for idx, overpayments in enumerate(tracks):
+        if overpayments is not None:
+            given = numpy.asarray(overpayments[:term + 1], dtype=float)
+            overs[idx, :len(given)] = given
+    return overs
+
+
+def final_months(paths, term):
+    """Find the final month for each track of principal paths
+
+    paths           2d array from principal_paths(), with one row per track
+    term            loan term in months
+
+    returns         (nmonths, truncate), two arrays with one element per track:
+                    the number of months in the schedule,
+                    and whether the final month must be truncated
+    """
+    # The schedule ends either before a month that starts with less than a cent of principal,
+    # or after a month that would take the principal to zero or below
+    below_cent = paths[:, :-1] < 0.01
+    paid_off = paths[:, 1:] <= 0
+    if not (below_cent.any(axis=1) | paid_off.any(axis=1)).all():
+        raise Exception("This should never happen")
+    below_cent_idx = numpy.where(below_cent.any(axis=1), below_cent.argmax(axis=1), term + 1)
+    paid_off_idx = numpy.where(paid_off.any(axis=1), paid_off.argmax(axis=1), term + 1)
+    truncate = paid_off_idx < below_cent_idx
+    nmonths = numpy.where(truncate, paid_off_idx + 1, below_cent_idx)
+    return nmonths, truncate
+
+
+def track_frame(
+        interestrate,
+        value,
+        saleprice,
+        mpay,
+        path,
+        overs,
+        nmonths,
+        truncate,
+        appreciation,
+        costplan,
+        monthlyrent):
+    """Build a frame.ScheduleFrame for one track of principal_paths()"""
+    boms = path[:nmonths]
+    interestpmt = boms * mmath.monthlyrate(interestrate)
+    balancepmt = mpay - interestpmt
+    overpmt = overs[:nmonths].copy()
+    remaining = path[1:nmonths + 1].copy()
+
+    if truncate:
+        last = nmonths - 1
+        if boms[last] - balancepmt[last] > 0:
+            overpmt[last] = boms[last] - balancepmt[last]
+            logger.info("#%s: Truncating overpayment to %s in final month", last, overpmt[last])
+        else:
+            overpmt[last] = 0
+            balancepmt[last] = boms[last]
+            logger.info(
+                "#%s: Truncating balance payment to %s in final month", last, balancepmt[last])
+        remaining[last] = 0
+
+    # Multiply the value out the same way schedule.schedule() does, so the results match exactly
+    growth = numpy.full(nmonths + 1, 1 + appreciation / mmath.MONTHS_IN_YEAR)
+    growth[0] = value
+    values = numpy.cumprod(growth)[1:]
+
+    months = numpy.arange(nmonths)
+    boyprincipals = boms[months - months % mmath.MONTHS_IN_YEAR]
+    rent = numpy.full(nmonths, float(monthlyrent))
+
+    costbasis = costplan.basis(saleprice, values, boyprincipals, rent)
+    return frame.ScheduleFrame(
+        {
+            'regularpmt': numpy.full(nmonths, mpay),
+            'interestpmt': interestpmt,
+            'balancepmt': balancepmt,
+            'overpmt': overpmt,
+            'principal': remaining,
+            'value': values,
+            'rent': rent,
+            'totalinterest': numpy.cumsum(interestpmt),
+            'totalothercosts': costplan.total(costbasis),
+        },
+        costplan=costplan,
+        costbasis=costbasis)
+
+
+def amortize_tracks(
+        interestrate,
+        value,
+        principal,
+        saleprice,
+        term,
+        tracks,
+        appreciation=0,
+        monthlycosts=None,
+        monthlyrent=0,
+        keep=None):
+    """Calculate several schedules that differ only in their overpayments, all in one pass
+
+    Takes the same arguments as schedule.schedule(), except:
+
+    tracks          list of overpayment arrays, one per schedule to calculate;
+                    None means no overpayments, e.g. for a baseline to compare against
+    keep            list of indexes into tracks for which to build a full schedule;
+                    if None, keep all of them
+
+    returns         a list of schedule.ScheduleSummary objects, one per track;
+                    the summaries of kept tracks have a frame.ScheduleFrame as their frame
+    """
+    keep = range(len(tracks)) if keep is None else keep
+    costplan = costconfig.CostPlan.compile(monthlycosts)
+    mpay = mmath.monthly_payment(interestrate, principal, term)
+    logger.info("Monthly payment calculated at %s for %s tracks", mpay, len(tracks))
+
+    overs = overpayment_tracks(tracks, term)
+    paths = principal_paths(principal, interestrate, mpay, overs)
+    nmonths, truncate = final_months(paths, term)
+
+    # Truncating the final payment doesn't change that month's interest,
+    # so we can total up interest without building the whole schedule
+    interest = numpy.cumsum(paths[:, :-1] * mmath.monthlyrate(interestrate), axis=1)
+    totalinterests = numpy.where(
+        nmonths > 0, interest[numpy.arange(len(tracks)), numpy.maximum(nmonths - 1, 0)], 0)
+
+    summaries = [
+        mschedule.ScheduleSummary(months=int(months), totalinterest=float(totalinterest))
+        for months, totalinterest in zip(nmonths, totalinterests)]
+    for idx in keep:
+        summaries[idx].frame = track_frame(
+            interestrate, value, saleprice, mpay, paths[idx], overs[idx], nmonths[idx],
+            truncate[idx], appreciation, costplan, monthlyrent)
+    return summaries
+
+
+def amortize(
+        interestrate,
+        value,
+        principal,
+        saleprice,
+        term,
+        overpayments=None,
+        appreciation=0,
+        monthlycosts=None,
+        monthlyrent=0):
+    """Calculate a schedule of payments, including overpayments, all at once
+
+    Takes the same arguments as schedule.schedule(), and handles the final month the same way:
+    the schedule ends when the remaining principal is less than a cent,
+    and in the month the loan is paid off, the overpayment and then the balance payment
+    are truncated so that the remaining principal is exactly zero.
+
+    returns         a frame.ScheduleFrame
+    """
+    summaries = amortize_tracks(
+        interestrate, value, principal, saleprice, term, [overpayments],
+        appreciation=appreciation, monthlycosts=monthlycosts, monthlyrent=monthlyrent)
+    return summaries[0].frame
+
+
+def schedule(
+        interestrate,
+        value,
+        principal,
+        saleprice,
+        term,
+        overpayments=None,
+        appreciation=0,
+        monthlycosts=None,
+        monthlyrent=0):
+    """A drop-in replacement for schedule.schedule() backed by amortize()
+
+    yield           LoanPayment objects
+
+    Without monthly costs there is little for amortize() to vectorize,
+    and building LoanPayment objects from its frame costs more than just calculating them,
+    so that case uses schedule.schedule() itself
+    """
+    if not monthlycosts:
+        return mschedule.schedule(
+            interestrate, value, principal, saleprice, term,
+            overpayments=overpayments, appreciation=appreciation, monthlyrent=monthlyrent)
+    return amortize(
+        interestrate, value, principal, saleprice, term,
+        overpayments=overpayments, appreciation=appreciation, monthlycosts=monthlycosts,
+        monthlyrent=monthlyrent).loanpayments()
@@ -1,11 +1,11 @@
 """Closing costs"""
 
 import copy
+import heapq
 import logging
 
 from bloodloan.mortgage import costconfig
 from bloodloan.mortgage import mmath
-from bloodloan.mortgage import schedule
 
 
 logger = logging.getLogger(__name__)  # pylint: disable=C0103
@@ -57,7 +57,8 @@ class CloseResult:
 
     def apply(self, cost):
         """Apply a cost to closing"""
-        logger.info(f"Closing cost: {cost}")
+        # Formatting a Cost is slow, so only do it if the message will be written
+        logger.debug("Closing cost: %s", cost)
 
         if cost.paytype == costconfig.CostPaymentType.PRINCIPAL:
             self.principal.append(cost)
@@ -77,66 +78,177 @@ class CloseResult:
             raise Exception(f"Unknown paytype {cost.paytype}")
 
 
-def close(saleprice, interestrate, loanterm, propertytaxes, costs):
+# What each calculation type is calculated from:
+# a close() argument, the loan amount ('principal'), or nothing for a plain dollar amount
+CALCULATED_FROM = {
+    costconfig.CostCalculationType.DOLLAR_AMOUNT: None,
+    costconfig.CostCalculationType.SALE_FRACTION: 'saleprice',
+    costconfig.CostCalculationType.PROPERTY_TAX_FRACTION: 'propertytaxes',
+    costconfig.CostCalculationType.LOAN_FRACTION: 'principal',
+    costconfig.CostCalculationType.INTEREST_MONTHS: 'principal',
+}
+
+# What each payment type adds to (down payments subtract from the loan amount)
+PAID_INTO = {
+    costconfig.CostPaymentType.PRINCIPAL: 'principal',
+    costconfig.CostPaymentType.DOWN_PAYMENT: 'principal',
+    costconfig.CostPaymentType.FEE: None,
+}
+
+
+class ClosingPlan:
+    """Closing costs, sorted into the order they must be calculated in
+
+    Some costs are calculated from the loan amount, which other costs change.
+    Compiling a list of costs builds a dependency graph between them:
+    a cost calculated from the loan amount depends on every cost paid into it.
+    When a cost both depends on the loan amount and is paid into it
+    (like an upfront mortgage insurance premium financed into the loan),
+    it depends only on such costs listed before it, and costs listed after it depend on it.
+    The costs are then sorted topologically, so each is calculated exactly once.
+    Where the graph allows, costs that can't depend on other costs come first,
+    and otherwise costs keep the order they were listed in;
+    that is the order close() has always reported costs in, and the order they are displayed.
+
+    costs       list of costconfig.Cost objects the plan was compiled from
+    order       the costs that close() can calculate, in the order to calculate them
+    """
+
+    def __init__(self, costs=None):
+        self.costs = list(costs or [])
+
+        calculable = []
+        for cost in self.costs:
+            if not cost.validated:
+                cost.check()
+            if cost.calctype in CALCULATED_FROM:
+                calculable.append(cost)
+            else:
+                logger.warning(
+                    "Ignoring closing cost %s of calctype %s", cost.label, cost.calctype)
+
+        # dependents[idx] lists the costs that must be calculated after calculable[idx]
+        dependents = [[] for _ in calculable]
+        blockers = [0 for _ in calculable]
+        for idx, cost in enumerate(calculable):
+            paidinto = PAID_INTO[cost.paytype]
+            if paidinto is None:
+                continue
+            circular = CALCULATED_FROM[cost.calctype] == paidinto
+            for depidx, dependent in enumerate(calculable):
+                if CALCULATED_FROM[dependent.calctype] == paidinto and depidx != idx and (
+                        not circular or depidx > idx):
+                    dependents[idx].append(depidx)
+                    blockers[depidx] += 1
+
+        # Sort by (whether the cost is calculated from something costs are paid into, index)
+        paidinto = set(PAID_INTO.values()) - {None}
+        ready = [
+            (CALCULATED_FROM[calculable[idx].calctype] in paidinto, idx)
+            for idx, count in enumerate(blockers) if count == 0]
+        heapq.heapify(ready)
+        self.order = []
+        while ready:
+            _, idx = heapq.heappop(ready)
+            self.order.append(calculable[idx])
+            for depidx in dependents[idx]:
+                blockers[depidx] -= 1
+                if blockers[depidx] == 0:
+                    heapq.heappush(ready, (True, depidx))
+
+    def __len__(self):
+        return len(self.costs)
+
+    def __str__(self):
+        return f"<ClosingPlan: {len(self)} closing costs>"
+
+    @classmethod
+    def compile(cls, costs):
+        """Return costs as a ClosingPlan, compiling it only if it isn't one already"""
+        if isinstance(costs, cls):
+            return costs
+        return cls(costs)
+
+    def values(self, saleprice, interestrate, propertytaxes):
+        """Yield (cost, value) for each cost in order, without copying any costs
+
+        Arguments are the same as for close(),
+        and may be NumPy arrays that broadcast together to calculate many closings at once
+        """
+        inputs = {'saleprice': saleprice, 'propertytaxes': propertytaxes}
+        principal = saleprice
+        for cost in self.order:
+            if cost.calctype is costconfig.CostCalculationType.DOLLAR_AMOUNT:
+                value = cost.value
+            elif cost.calctype is costconfig.CostCalculationType.LOAN_FRACTION:
+                value = principal * cost.calc
+            elif cost.calctype is costconfig.CostCalculationType.INTEREST_MONTHS:
+                # TODO: Assumes interest is the same in all months (not true)
+                #       OK because we don't expect INTEREST_MONTHS to be many months long
+                value = principal * mmath.monthlyrate(interestrate) * cost.calc
+            else:
+                value = inputs[CALCULATED_FROM[cost.calctype]] * cost.calc
+            yield cost, value
+
+            if cost.paytype is costconfig.CostPaymentType.PRINCIPAL:
+                principal = principal + value
+            elif cost.paytype is costconfig.CostPaymentType.DOWN_PAYMENT:
+                principal = principal - value
+
+    def totals(self, saleprice, interestrate, propertytaxes):
+        """Calculate just the totals of a closing, without building a CloseResult
+
+        returns     (downpayment total, fees total, principal total)
+        """
+        downpayment = 0
+        fees = 0
+        principal = saleprice
+        for cost, value in self.values(saleprice, interestrate, propertytaxes):
+            if cost.paytype is costconfig.CostPaymentType.PRINCIPAL:
+                principal = principal + value
+            elif cost.paytype is costconfig.CostPaymentType.DOWN_PAYMENT:
+                downpayment = downpayment + value
+                principal = principal - value
+            elif cost.paytype is costconfig.CostPaymentType.FEE:
+                fees = fees + value
+            else:
+                raise Exception(f"Unknown paytype {cost.paytype}")
+        return downpayment, fees, principal
+
+    def close(self, saleprice, interestrate, propertytaxes):
+        """Calculate loan amount and closing costs
+
+        Arguments are the same as for the close() function
+
+        returns     a CloseResult, with a copy of each cost with its value calculated
+        """
+        result = CloseResult(saleprice=saleprice)
+        for cost, value in self.values(saleprice, interestrate, propertytaxes):
+            # Don't modify the costs in the plan, in case they are reused elsewhere
+            cost = copy.copy(cost)
+            cost.value = value
+            result.apply(cost)
+        return result
+
+
+def closing_plan(costs):
+    """Get the ClosingPlan for the closing costs of a costconfig.CostConfigurationCollection
+
+    Compiled once, and kept by the collection until its configs change
+    """
+    return costs.view('closing_plan', lambda configs: ClosingPlan(
+        [cost for config in configs for cost in config.closing]))
+
+
+def close(saleprice, interestrate, loanterm, propertytaxes, costs):  # pylint: disable=W0613
     """Calculate loan amount and closing costs
 
     saleprice       sale price for the property
     interestrate    interest rate for the loan
     loanterm        loan term in months
+                    (unused, since the first month's interest doesn't depend on it)
     propertytaxes   estimated property taxes
-    costs           list of costconfig.Cost objects
+    costs           list of costconfig.Cost objects, or a ClosingPlan
+                    (compile a plan once when calling this repeatedly for the same costs)
     """
-
-    result = CloseResult(saleprice=saleprice)
-
-    # Don't modify costs we were passed, in case they are reused elsewhere
-    costs = copy.deepcopy(costs)
-
-    # BEWARE!
-    # ORDER IS IMPORTANT AND SUBTLE!
-
-    for cost in costs:
-        # First, check our inputs
-        if cost.calctype == costconfig.CostCalculationType.DOLLAR_AMOUNT and cost.value is None:
-            raise Exception(
-                f"The {cost.label} costconfig.Cost calctype is DOLLAR_AMOUNT, "
-                "but with an empty value property")
-        elif cost.calctype != costconfig.CostCalculationType.DOLLAR_AMOUNT and cost.calc is None:
-            raise Exception(
-                f"The {cost.label} costconfig.Cost calctype is {cost.calctype}, "
-                "but with an empty calc property")
-
-        # Now calculate what can be calculated now
-        # Don't calculate LOAN_FRACTION or INTEREST_MONTHS calctypes here,
-        # because any PRINCIPAL paytypes will affect their value
-        if cost.calctype == costconfig.CostCalculationType.DOLLAR_AMOUNT:
-            result.apply(cost)
-        if cost.calctype == costconfig.CostCalculationType.SALE_FRACTION:
-            cost.value = saleprice * cost.calc
-            result.apply(cost)
-        elif cost.calctype == costconfig.CostCalculationType.PROPERTY_TAX_FRACTION:
-            cost.value = propertytaxes * cost.calc
-            result.apply(cost)
-
-    for cost in costs:
-        # Now that we have calculated the other costs, including loan amount,
-        # we can calculate LOAN_FRACTION or INTEREST_MONTHS calctypes
-        # Note that theoretically you could have something weird like a cost of
-        # calctype=LOAN_FRACTION paytype=PRINCIPAL,
-        # but that wouldn't make much sense so we don't really handle it here
-        if cost.calctype == costconfig.CostCalculationType.LOAN_FRACTION:
-            cost.value = result.principal_total * cost.calc
-            result.apply(cost)
-        elif cost.calctype == costconfig.CostCalculationType.INTEREST_MONTHS:
-            # TODO: Improve INTEREST_MONTHS closing cost calculation
-            # 1)    Assumes interest is the same in all months (not true)
-            #       OK because we don't expect INTEREST_MONTHS to be many months long
-            # 2)    Assumes saleprice == value
-            #       OK for now but should be fixed at some point
-            monthgen = schedule.schedule(
-                interestrate, saleprice, result.principal_total, saleprice, loanterm)
-            firstmonth = next(monthgen)
-            cost.value = firstmonth.interestpmt * cost.calc
-            result.apply(cost)
-
-    return result
+    return ClosingPlan.compile(costs).close(saleprice, interestrate, propertytaxes)
@@ -3,21 +3,30 @@
 Code related to closing costs and monthly expenses
 """
 
+import copy
 import enum
+import itertools
 import logging
 import numbers
 import os
+import pickle
 import re
+import stat
+import threading
 
-import yaml
+import numpy
 
+from bloodloan.mortgage import formatting
 from bloodloan.mortgage import mmath
-from bloodloan.ui import uiutil
 
 
 logger = logging.getLogger(__name__)  # pylint: disable=C0103
 
 
+# A calculation like "3.5%"
+PERCENT_PATTERN = re.compile(r"^([0-9_,\.]*)\%$")
+
+
 class CostType(enum.Enum):
     """Determines the type of a cost
 
@@ -93,7 +102,15 @@ class CapitalExpenditure():
         self.monthly = self.total / self.lifespan / mmath.MONTHS_IN_YEAR
 
     def __str__(self):
-        return f"{uiutil.dollar(self.total)} over {self.lifespan} years"
+        return f"{formatting.dollar(self.total)} over {self.lifespan} years"
+
+
+def parse_calculation(calc):
+    """Convert a calculation string from a config file, like "3.5%" or "0.5", to a number"""
+    pct_match = PERCENT_PATTERN.match(calc)
+    if pct_match:
+        return mmath.percent2decimal(float(pct_match.group(1)))
+    return float(calc)
 
 
 class Cost():
@@ -115,8 +132,12 @@ class Cost():
                 should be a CostCalculationType
     paytype     how the payment is applied
                 should be a CostPaymentType
+    validated   True if the cost was loaded from a config file that passed ConfigValidator,
+                so check() can be skipped
     """
 
+    validated = False
+
     def __init__(
             self,
             dictionary=None,
@@ -168,11 +189,7 @@ class Cost():
         # Calc needs to be either a number or a CapitalExpenditure
         # String values could be percentages (ending in %) or decimals (not)
         if isinstance(self.calc, str):
-            pct_match = re.match(r"^([0-9_,\.]*)\%$", self.calc)
-            if pct_match:
-                self.calc = mmath.percent2decimal(float(pct_match.group(1)))
-            else:
-                self.calc = float(self.calc)
+            self.calc = parse_calculation(self.calc)
 
         if not self.label:
             raise ValueError(f"Invalid empty label")
@@ -210,26 +227,168 @@ class Cost():
         elif self.calctype is CostCalculationType.CAPEX:
             return self.calc
         else:
-            return f"{uiutil.percent(self.calc)} of {self.calctype.value}"
+            return f"{formatting.percent(self.calc)} of {self.calctype.value}"
+
+    def check(self):
+        """Raise an exception if the cost doesn't have what its calctype needs to be calculated
+
+        Unlike the checks in __init__, these depend on the cost's value,
+        which might be set after the cost is created
+        """
+        if self.calctype is CostCalculationType.DOLLAR_AMOUNT and self.value is None:
+            raise Exception(
+                f"The {self.label} Cost calctype is DOLLAR_AMOUNT, "
+                "but with an empty value property")
+        elif self.calctype is not CostCalculationType.DOLLAR_AMOUNT and self.calc is None:
+            raise Exception(
+                f"The {self.label} Cost calctype is {self.calctype}, "
+                "but with an empty calc property")
 
     def __str__(self):
         return " ".join([
             f"{self.costtype}: {self.label} - {self.value}",
             f"({self.calcstr}) ({self.paytype})"])
 
+    def __copy__(self):
+        # Costs are copied for every line item of every month or interval,
+        # and this is several times faster than copy.copy()'s generic __reduce_ex__ path
+        result = Cost.__new__(Cost)
+        result.__dict__.update(self.__dict__)
+        return result
+
     def __repr__(self):
         return str(self)
 
 
+class CostPlan:
+    """Monthly costs compiled into coefficients
+
+    Every monthly cost is a coefficient times one of a few bases:
+    a constant dollar amount, the sale price, the property value,
+    the beginning-of-year principal spread over twelve months, or the rent.
+    Compiling a list of costs once turns a month's expenses into a dot product,
+    instead of copying and recalculating every Cost object every month.
+
+    costs           list of Cost objects the plan was compiled from
+    coefficients    2d array with one row per cost and one column per basis
+    totals          coefficients summed across all costs
+    """
+
+    BASIS_CONSTANT = 0
+    BASIS_SALE_PRICE = 1
+    BASIS_VALUE = 2
+    BASIS_BOY_PRINCIPAL = 3
+    BASIS_RENT = 4
+    NBASES = 5
+
+    def __init__(self, costs=None):
+        self.costs = list(costs or [])
+        self.coefficients = numpy.zeros((len(self.costs), self.NBASES))
+
+        for idx, cost in enumerate(self.costs):
+            if not cost.validated:
+                cost.check()
+
+            if cost.calctype is CostCalculationType.DOLLAR_AMOUNT:
+                self.coefficients[idx, self.BASIS_CONSTANT] = cost.value
+            elif cost.calctype is CostCalculationType.CAPEX:
+                self.coefficients[idx, self.BASIS_CONSTANT] = cost.calc.monthly
+            elif cost.calctype is CostCalculationType.SALE_FRACTION:
+                self.coefficients[idx, self.BASIS_SALE_PRICE] = cost.calc
+            elif cost.calctype is CostCalculationType.VALUE_FRACTION:
+                self.coefficients[idx, self.BASIS_VALUE] = cost.calc
+            elif cost.calctype is CostCalculationType.YEARLY_PRINCIPAL_FRACTION:
+                self.coefficients[idx, self.BASIS_BOY_PRINCIPAL] = cost.calc
+            elif cost.calctype is CostCalculationType.MONTHLY_RENT_FRACTION:
+                self.coefficients[idx, self.BASIS_RENT] = cost.calc
+            else:
+                raise NotImplementedError(
+                    f"Cannot process a cost with a calctype of {cost.calctype}")
+
+        self.totals = self.coefficients.sum(axis=0)
+
+    def __len__(self):
+        return len(self.costs)
+
+    def __str__(self):
+        return f"<CostPlan: {len(self)} monthly costs>"
+
+    @classmethod
+    def compile(cls, costs):
+        """Return costs as a CostPlan, compiling it only if it isn't one already"""
+        if isinstance(costs, cls):
+            return costs
+        return cls(costs)
+
+    def basis(self, saleprice, value, boyprincipal, rent):
+        """Build the basis values that coefficients are multiplied by
+
+        Arguments may be numbers or NumPy arrays of any shape that broadcast together;
+        the result has that shape, plus one last axis with an element for each basis.
+
+        saleprice       sale price of the property
+        value           actual value of the property
+        boyprincipal    principal at beginning of year
+        rent            projected monthly rent for the property
+        """
+        bases = [None] * self.NBASES
+        bases[self.BASIS_CONSTANT] = 1.0
+        bases[self.BASIS_SALE_PRICE] = saleprice
+        bases[self.BASIS_VALUE] = value
+        bases[self.BASIS_BOY_PRINCIPAL] = numpy.divide(boyprincipal, mmath.MONTHS_IN_YEAR)
+        bases[self.BASIS_RENT] = rent
+        return numpy.stack(numpy.broadcast_arrays(*bases), axis=-1).astype(float)
+
+    def total(self, basis):
+        """Total of all costs for a basis from basis()"""
+        return basis @ self.totals
+
+    def totalfor(self, saleprice, value, boyprincipal, rent):
+        """Total of all costs, the same as total(basis(...)), without building the basis
+
+        Saves memory when the arguments are large arrays, like one row per Monte Carlo path
+        """
+        return (
+            self.totals[self.BASIS_CONSTANT] +
+            self.totals[self.BASIS_SALE_PRICE] * numpy.asarray(saleprice, dtype=float) +
+            self.totals[self.BASIS_VALUE] * numpy.asarray(value, dtype=float) +
+            self.totals[self.BASIS_BOY_PRINCIPAL] *
+            numpy.divide(boyprincipal, mmath.MONTHS_IN_YEAR) +
+            self.totals[self.BASIS_RENT] * numpy.asarray(rent, dtype=float))
+
+    def values(self, basis):
+        """Value of each cost for a basis from basis(), along a new last axis"""
+        return basis @ self.coefficients.T
+
+    def expenses(self, basis):
+        """A list of Cost objects with their values calculated, for one month's basis"""
+        result = []
+        for cost, value in zip(self.costs, self.values(basis).tolist()):
+            cost = copy.copy(cost)
+            cost.value = value
+            result.append(cost)
+        return result
+
+
 class CostConfiguration:
     """A bundle of closing and monthly costs
+
+    key         a number identifying this config in caches, unique within this process
     """
 
+    _keys = itertools.count()
+
     def __init__(self, label, description="", closing=None, monthly=None):
         self.label = label
         self.description = description
         self.closing = closing or []
         self.monthly = monthly or []
+        self.key = next(self._keys)
+
+    def __setstate__(self, state):
+        # Keys are only unique within a process, so an unpickled config gets a new one
+        self.__dict__.update(state)
+        self.key = next(self._keys)
 
     @classmethod
     def fromdict(cls, dictionary):
@@ -255,14 +414,414 @@ class CostConfiguration:
         return result
 
 
+# Keys that can hold notes for people reading a config file, and are otherwise ignored
+NOTE_KEYS = ('source', 'notes', 'description')
+
+CONFIG_KEYS = ('label', 'description', 'closing', 'monthly', 'capex')
+COST_KEYS = (
+    'label', 'value', 'calc', 'calculation', 'calctype', 'calculation type',
+    'paytype', 'payment type', 'costtype', 'cost type')
+CAPEX_KEYS = ('label', 'cost', 'lifespan')
+
+# The calculation types that closing.close() and CostPlan know how to calculate
+CLOSING_CALCTYPES = (
+    CostCalculationType.DOLLAR_AMOUNT,
+    CostCalculationType.SALE_FRACTION,
+    CostCalculationType.LOAN_FRACTION,
+    CostCalculationType.PROPERTY_TAX_FRACTION,
+    CostCalculationType.INTEREST_MONTHS,
+)
+MONTHLY_CALCTYPES = (
+    CostCalculationType.DOLLAR_AMOUNT,
+    CostCalculationType.SALE_FRACTION,
+    CostCalculationType.VALUE_FRACTION,
+    CostCalculationType.YEARLY_PRINCIPAL_FRACTION,
+    CostCalculationType.MONTHLY_RENT_FRACTION,
+)
+
+
+class ConfigProblem:
+    """A problem found in a cost configuration file
+
+    path        path to the file
+    line        line number of the problem, starting at 1, or None if it isn't known
+    message     what is wrong
+    """
+
+    def __init__(self, path, line, message):
+        self.path = path
+        self.line = line
+        self.message = message
+
+    def __str__(self):
+        if self.line is None:
+            return f"{self.path}: {self.message}"
+        return f"{self.path}:{self.line}: {self.message}"
+
+    def __repr__(self):
+        return str(self)
+
+
+class ConfigValidator:
+    """Check a parsed cost configuration file against the schema that CostConfiguration expects
+
+    Works on the YAML node tree alongside the data constructed from it,
+    so that every problem can be reported with the line it is on.
+    Finds every problem in the file, rather than stopping at the first one.
+
+    path        path to the file, for reporting problems
+    problems    list of ConfigProblem objects found by validate()
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.problems = []
+
+    def problem(self, node, message):
+        """Record a problem at a YAML node, which may be None if there isn't one"""
+        line = node.start_mark.line + 1 if node is not None else None
+        self.problems.append(ConfigProblem(self.path, line, message))
+
+    @staticmethod
+    def keynodes(node):
+        """Return a dict of key to (key node, value node) for a YAML mapping node"""
+        return {keynode.value: (keynode, valuenode) for keynode, valuenode in node.value}
+
+    def validate(self, node, contents):
+        """Validate a whole file
+
+        node        the root YAML node
+        contents    the data constructed from it
+
+        returns     the problems found
+        """
+        if not isinstance(contents, dict):
+            self.problem(node, "A cost configuration must be a mapping with a label")
+            return self.problems
+
+        nodes = self.keynodes(node)
+        self.unknown(nodes, CONFIG_KEYS + NOTE_KEYS, "cost configuration")
+        self.label(node, nodes, contents, "cost configuration")
+        for section, calctypes in (('closing', CLOSING_CALCTYPES), ('monthly', MONTHLY_CALCTYPES)):
+            for itemnode, item in self.items(nodes, contents, section):
+                self.cost(itemnode, item, section, calctypes)
+        for itemnode, item in self.items(nodes, contents, 'capex'):
+            self.capex(itemnode, item)
+        self.problems.sort(key=lambda problem: problem.line or 0)
+        return self.problems
+
+    def unknown(self, nodes, known, what):
+        """Check for keys that would be ignored, which are most likely typos"""
+        for key, (keynode, _) in nodes.items():
+            if key not in known:
+                self.problem(keynode, f"Unknown key '{key}' in {what}")
+
+    def label(self, node, nodes, item, what):
+        """Check that an item has a non-empty label, and return it (or None)"""
+        label = item.get('label')
+        if label is None or label == "":
+            self.problem(node, f"The {what} has no label")
+            return None
+        if not isinstance(label, str):
+            self.problem(nodes['label'][1], f"The {what} label '{label}' isn't text")
+        return label
+
+    def items(self, nodes, contents, section):
+        """Return (node, item) pairs for each item of a section that should be a list"""
+        if section not in contents:
+            return []
+        keynode, valuenode = nodes[section]
+        if not isinstance(contents[section], list):
+            self.problem(keynode, f"The {section} section must be a list")
+            return []
+        return list(zip(valuenode.value, contents[section]))
+
+    def number(self, nodes, item, key, what, positive=False):
+        """Check that an item's key, if present, is a number, and return it (or None)"""
+        value = item.get(key)
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, numbers.Number):
+            self.problem(nodes[key][1], f"The {key} of {what} must be a number, not '{value}'")
+            return None
+        if positive and value <= 0:
+            self.problem(nodes[key][1], f"The {key} of {what} must be more than 0")
+        return value
+
+    def choice(self, nodes, item, keys, enumtype, what, default):
+        """Check that the first of keys present in an item is a value of an enum
+
+        returns     the enum member, default if none of the keys are present, or None if invalid
+        """
+        for key in keys:
+            if item.get(key) is None:
+                continue
+            try:
+                return enumtype(item[key])
+            except ValueError:
+                choices = ", ".join(f"'{member.value}'" for member in enumtype)
+                self.problem(
+                    nodes[key][1], f"The {key} of {what} is '{item[key]}', not one of {choices}")
+                return None
+        return default
+
+    def cost(self, node, item, section, calctypes):
+        """Check one closing or monthly cost"""
+        if not isinstance(item, dict):
+            self.problem(node, f"Each {section} cost must be a mapping with a label")
+            return
+        nodes = self.keynodes(node)
+        label = self.label(node, nodes, item, f"{section} cost")
+        what = f"{section} cost '{label}'" if label else f"{section} cost"
+        self.unknown(nodes, COST_KEYS + NOTE_KEYS, what)
+
+        calctype = self.choice(
+            nodes, item, ('calctype', 'calculation type'), CostCalculationType, what,
+            CostCalculationType.DOLLAR_AMOUNT)
+        self.choice(
+            nodes, item, ('paytype', 'payment type'), CostPaymentType, what, CostPaymentType.FEE)
+        self.number(nodes, item, 'value', what)
+
+        calckey = 'calc' if item.get('calc') is not None else 'calculation'
+        calc = item.get(calckey)
+        if isinstance(calc, str):
+            try:
+                calc = parse_calculation(calc)
+            except ValueError:
+                self.problem(
+                    nodes[calckey][1],
+                    f"The {calckey} of {what} is '{calc}', not a number or a percentage")
+                return
+        elif calc is not None and (isinstance(calc, bool) or not isinstance(calc, numbers.Number)):
+            self.problem(nodes[calckey][1], f"The {calckey} of {what} must be a number")
+            return
+
+        if calctype is None:
+            return
+        if calctype not in calctypes:
+            choices = ", ".join(f"'{choice.value}'" for choice in calctypes)
+            self.problem(
+                node, f"The {what} is a {calctype.value}, "
+                f"but {section} costs can only be one of {choices}")
+        if calctype is CostCalculationType.DOLLAR_AMOUNT:
+            if calc:
+                self.problem(
+                    nodes[calckey][1], f"The {what} has a {calckey} but no calculation type")
+            elif item.get('value') is None:
+                self.problem(node, f"The {what} needs a value, or a calculation and its type")
+        elif not calc:
+            self.problem(node, f"The {what} is a {calctype.value}, but has no nonzero calculation")
+
+    def capex(self, node, item):
+        """Check one capital expenditure"""
+        if not isinstance(item, dict):
+            self.problem(node, "Each capex item must be a mapping with a label")
+            return
+        nodes = self.keynodes(node)
+        label = self.label(node, nodes, item, "capex item")
+        what = f"capex item '{label}'" if label else "capex item"
+        self.unknown(nodes, CAPEX_KEYS + NOTE_KEYS, what)
+        for key in ('cost', 'lifespan'):
+            if item.get(key) is None:
+                self.problem(node, f"The {what} needs a {key}")
+            else:
+                self.number(nodes, item, key, what, positive=True)
+
+
+class ConfigFileCache:
+    """Parsed cost configuration files, keyed on each file's path, modification time, and size
+
+    Loading a directory only parses the files that are new or have changed since they were
+    last parsed; configs from unchanged files are reused as the very same objects.
+
+    If path is given, parsed configs are also saved there with pickle,
+    so that unchanged files aren't parsed again the next time Python starts.
+    As with any pickle file, only use a path that nobody else can write to.
+
+    path        path to the pickle file, or None to only cache in memory
+    entries     dict of absolute file path to ((mtime_ns, size), CostConfiguration);
+                the config is None for files that couldn't be parsed,
+                so that they are only reported once per change
+    hits        number of files loaded without parsing them
+    misses      number of files parsed
+    """
+
+    # Increase whenever Cost, CapitalExpenditure, or CostConfiguration change what they store,
+    # so that configs pickled by older code are parsed again
+    VERSION = 2
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if self.path:
+            self.entries = self._read()
+
+    def __str__(self):
+        return f"<ConfigFileCache: {self.path}, {self.hits} hits, {self.misses} misses>"
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _read(self):
+        """Read entries from the pickle file, or return no entries if it is missing or stale"""
+        try:
+            with open(self.path, 'rb') as cachefile:
+                contents = pickle.load(cachefile)
+        except FileNotFoundError:
+            return {}
+        except Exception as exc:
+            logger.warning("Ignoring unreadable config cache %s: %s", self.path, exc)
+            return {}
+        if not isinstance(contents, dict) or contents.get('version') != self.VERSION:
+            logger.info("Ignoring config cache %s from a different version", self.path)
+            return {}
+        return contents['entries']
+
+    def _write(self):
+        """Write entries to the pickle file
+
+        Writes a temporary file and renames it over the cache,
+        so that another process never reads a partly written cache
+        """
+        persist_dir, _ = os.path.split(self.path)
+        os.makedirs(persist_dir or '.', exist_ok=True)
+        temppath = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temppath, 'wb') as cachefile:
+                pickle.dump(
+                    {'version': self.VERSION, 'entries': self.entries}, cachefile,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temppath, self.path)
+        except Exception as exc:
+            logger.warning("Could not write config cache %s: %s", self.path, exc)
+
+    def load(self, directory):
+        """Return a list of CostConfiguration objects, one for each file in a directory
+
+        Only new and changed files are parsed
+        """
+        result = []
+        seen = set()
+        changed = False
+
+        with self._lock:
+            for child in [os.path.join(directory, f) for f in os.listdir(directory)]:
+                try:
+                    status = os.stat(child)
+                except OSError:
+                    continue
+                if not stat.S_ISREG(status.st_mode):
+                    continue
+
+                key = os.path.abspath(child)
+                stamp = (status.st_mtime_ns, status.st_size)
+                seen.add(key)
+                entry = self.entries.get(key)
+                if entry is not None and entry[0] == stamp:
+                    self.hits += 1
+                    config = entry[1]
+                else:
+                    self.misses += 1
+                    config = parse_config_file(child)
+                    self.entries[key] = (stamp, config)
+                    changed = True
+
+                if config is not None:
+                    result.append(config)
+
+            # Forget files that were deleted from this directory
+            absdir = os.path.abspath(directory)
+            for key in list(self.entries):
+                if os.path.dirname(key) == absdir and key not in seen:
+                    del self.entries[key]
+                    changed = True
+
+            if changed and self.path:
+                self._write()
+
+        return result
+
+
+def validate_config_file(path):
+    """Parse and validate one cost configuration YAML file
+
+    returns     (contents, problems), where contents is the parsed data (or None),
+                and problems is a list of every ConfigProblem found
+    """
+    # Only needed when loading configs from disk, so don't make every importer pay for it
+    import yaml  # pylint: disable=C0415
+
+    with open(path) as cfile:
+        loader = yaml.SafeLoader(cfile)
+        try:
+            node = loader.get_single_node()
+            contents = loader.construct_document(node) if node is not None else None
+        except yaml.YAMLError as exc:
+            mark = getattr(exc, 'problem_mark', None)
+            line = mark.line + 1 if mark is not None else None
+            problem = getattr(exc, 'problem', None) or exc
+            return None, [ConfigProblem(path, line, f"Invalid YAML: {problem}")]
+        finally:
+            loader.dispose()
+
+    return contents, ConfigValidator(path).validate(node, contents)
+
+
+def parse_config_file(path):
+    """Parse one cost configuration YAML file
+
+    Return a CostConfiguration whose costs are marked validated,
+    or None if the file has any problems, after logging all of them
+    """
+    logger.debug("Parsing config file %s", path)
+    contents, problems = validate_config_file(path)
+    if problems:
+        for problem in problems:
+            logger.error("Invalid cost configuration: %s", problem)
+        logger.error("Cost configurations from %s are not available", path)
+        return None
+
+    result = CostConfiguration.fromdict(contents)
+    for cost in result.closing + result.monthly:
+        cost.validated = True
+    return result
+
+
 class CostConfigurationCollection:
     """A collection of CostConfiguration objects
+
+    configs     configs to include as they are
+    directory   a directory of cost configuration YAML files to load configs from as well
+    cache       a ConfigFileCache to load the directory with;
+                by default, a new one that only caches in memory
+    generation  incremented every time reload() changes the configs,
+                so that callers can tell when to recalculate
+
+    The configs are a tuple, so they can only change through add(), reload(), or by setting
+    configs; any of these forgets the indexes and flattened views built from the old configs.
     """
 
-    def __init__(self, configs=None, directory=None):
-        self.configs = configs or []
+    def __init__(self, configs=None, directory=None, cache=None):
+        self.directory = directory
+        self.cache = cache
+        self.generation = 0
+        self._given = tuple(configs or [])
+        self._loaded = ()
+        self._watcher = None
         if directory:
-            self.configs += self._fromdir(directory)
+            if self.cache is None:
+                self.cache = ConfigFileCache()
+            self._loaded = tuple(self.cache.load(directory))
+        self.configs = self._given + self._loaded
 
     def __str__(self):
         return " ".join([
@@ -272,58 +831,169 @@ class CostConfigurationCollection:
             ">"
         ])
 
-    def _fromdir(self, directory):
-        """Read all cost configuration YAML files from a directory
+    def __len__(self):
+        return len(self.configs)
+
+    def __getstate__(self):
+        # A background thread can't be sent to another process
+        state = self.__dict__.copy()
+        state['_watcher'] = None
+        return state
+
+    @property
+    def configs(self):
+        """A tuple of all configs in the collection"""
+        return self._configs
+
+    @configs.setter
+    def configs(self, configs):
+        # Set the configs before forgetting the views,
+        # so a view built concurrently from the old configs is only ever stored in the old dict
+        self._configs = tuple(configs)
+        self._views = {}
+
+    def view(self, name, build):
+        """Return something derived from the configs, building it on first access
 
-        Return a list of config objects
+        name        a name for it, unique within this collection
+        build       a function that takes the tuple of configs and returns it
+
+        It is kept until the configs change
         """
-        result = []
+        views = self._views
+        if name not in views:
+            views[name] = build(self._configs)
+        return views[name]
 
-        for child in [os.path.join(directory, f) for f in os.listdir(directory)]:
-            if not os.path.isfile(child):
-                continue
+    def add(self, config):
+        """Add a config to the collection
 
-            with open(child) as cfile:
-                try:
-                    contents = yaml.load(cfile, Loader=yaml.SafeLoader)
-                except yaml.parser.ParserError as exc:
-                    logger.error(f"Error parsing config file {child}: {exc}")
-                    continue
+        Like configs passed to the constructor, it is kept when reload() reloads the directory
+        """
+        self._given += (config,)
+        self.configs = self._configs + (config,)
 
-            # TODO: Do real validation here - is there such a thing as a YAML schema?
-            #       Alternatively: maybe just try to apply them, then if they don't work display a
-            #       message saying that cost configurations from xyz file are not available?
+    def reload(self):
+        """Reparse the config files in directory that changed since they were loaded
 
-            result.append(CostConfiguration.fromdict(contents))
+        Configs from unchanged files stay the same objects,
+        and configs passed to the constructor are kept as they are.
 
-        return result
+        returns     True if any configs were added, changed, or removed
+        """
+        if not self.directory:
+            return False
+        loaded = tuple(self.cache.load(self.directory))
+        if len(loaded) == len(self._loaded) and all(
+                new is old for new, old in zip(loaded, self._loaded)):
+            return False
+        self._loaded = loaded
+        self.configs = self._given + loaded
+        self.generation += 1
+        logger.info(
+            "Reloaded cost configs from %s: %s configs", self.directory, len(self.configs))
+        return True
+
+    def watch(self, interval=2.0, callback=None):
+        """Reload changed config files in a background thread, until unwatch() is called
+
+        interval    seconds between checks for changed files
+        callback    a function to call with this collection after a reload changes anything;
+                    it is called from the background thread
+        """
+        if not self.directory:
+            raise ValueError("Only a collection loaded from a directory can be watched")
+        self.unwatch()
+        stop = threading.Event()
+
+        def poll():
+            while not stop.wait(interval):
+                try:
+                    if self.reload() and callback:
+                        callback(self)
+                except Exception as exc:
+                    logger.error("Error reloading cost configs from %s: %s", self.directory, exc)
+
+        thread = threading.Thread(target=poll, name=f"watch {self.directory}", daemon=True)
+        self._watcher = (stop, thread)
+        thread.start()
+
+    def unwatch(self):
+        """Stop the background thread started by watch(), if there is one"""
+        if self._watcher:
+            stop, thread = self._watcher
+            self._watcher = None
+            stop.set()
+            thread.join()
+
+    @property
+    def labels(self):
+        """A tuple of the label of each config"""
+        return self.view('labels', lambda configs: tuple(config.label for config in configs))
+
+    @property
+    def bylabel(self):
+        """A dict of label to a tuple of the positions of the configs with that label"""
+        def build(configs):
+            result = {}
+            for idx, config in enumerate(configs):
+                result.setdefault(config.label, []).append(idx)
+            return {label: tuple(positions) for label, positions in result.items()}
+        return self.view('bylabel', build)
+
+    def costs(self, costtype):
+        """A tuple of all costs of a CostType from all configs"""
+        def build(configs):
+            if costtype is CostType.CLOSING:
+                return tuple(cost for config in configs for cost in config.closing)
+            return tuple(cost for config in configs for cost in config.monthly)
+        return self.view(costtype, build)
 
     @property
     def closing(self):
         """All closing costs from all configs
         """
-        result = []
-        for config in self.configs:
-            for cost in config.closing:
-                result.append(cost)
-        return result
+        return self.costs(CostType.CLOSING)
 
     @property
     def monthly(self):
         """All monthly costs from all configs
         """
-        result = []
-        for config in self.configs:
-            for cost in config.monthly:
-                result.append(cost)
-        return result
+        return self.costs(CostType.MONTHLY)
+
+    @property
+    def key(self):
+        """A hashable key identifying the configs in this collection, for use in caches
+
+        Two collections containing the same config objects have the same key.
+        Unlike id(), a config's key is never reused by another config,
+        even after the first is reloaded and garbage collected.
+        """
+        return self.view('key', lambda configs: tuple(config.key for config in configs))
+
+    @property
+    def monthly_plan(self):
+        """All monthly costs from all configs, compiled into a CostPlan
+
+        Compiled on first access and kept until the configs change
+        """
+        return self.view('monthly_plan', lambda configs: CostPlan(
+            [cost for config in configs for cost in config.monthly]))
 
     def get(self, labels):
         """Get cost configurations from their labels
 
         labels      a list of labels to retrieve
 
-        returns     a CostConfigurationCollection
+        returns     a CostConfigurationCollection, with the configs in the same order as here;
+                    asking for the same labels again returns the same collection,
+                    with its views already built, until the configs change
         """
-        return CostConfigurationCollection(
-            configs=[cc for cc in self.configs if cc.label in labels])
+        selections = self.view('selections', lambda configs: {})
+        selection = frozenset(labels)
+        if selection not in selections:
+            bylabel = self.bylabel
+            positions = sorted(idx for label in selection for idx in bylabel.get(label, ()))
+            selections[selection] = CostConfigurationCollection(
+                configs=[self._configs[idx] for idx in positions])
+        return selections[selection]
@@ -0,0 +1,64 @@
+"""Display formatting for numbers
+
+These live in the calculation core, rather than the UI,
+so that e.g. cost descriptions can be formatted without importing any UI modules
+"""
+
+from bloodloan.mortgage import mmath
+
+
+DOLLAR_FORMAT = '${:,.2f}'
+PERCENT_FORMAT = '{:.4f}%'
+
+
+def dollar(amount):
+    """Return a string dollar amount from a float
+
+    For example, dollar(1926.2311831442486) => "$1,926.23"
+
+    We aren't too concerned about the lost accuracy;
+    this function should only be used for *display* values
+
+    NOTE: I'm not sure why, but I often find that if I don't wrap a dollar()
+    call in <span> tags, Jupyter does something really fucked up to my text
+    """
+    return DOLLAR_FORMAT.format(amount)
+
+
+def percent(decimal):
+    """Return a string percentage from a float
+
+    For example, percent(0.0320) => 3.2000%
+
+    The result is rounded to four decimal places (of the *return* value).
+
+    This function *loses precision* (and returns a string),
+    so it should only be relied upon to *display* a percentage value.
+    """
+    return PERCENT_FORMAT.format(mmath.decimal2percent(decimal))
+
+
+def pylist(values):
+    """Convert a NumPy array to a list of Python numbers, or return other sequences as is
+
+    Formatting NumPy scalars one at a time is much slower than formatting Python floats
+    """
+    return values.tolist() if hasattr(values, 'tolist') else values
+
+
+def dollars(amounts):
+    """Return a list of string dollar amounts from a column of floats
+
+    Gives the same results as calling dollar() on each amount, but faster,
+    especially for NumPy arrays
+    """
+    return list(map(DOLLAR_FORMAT.format, pylist(amounts)))
+
+
+def percents(decimals):
+    """Return a list of string percentages from a column of floats
+
+    Gives the same results as calling percent() on each decimal, but faster,
+    especially for NumPy arrays
+    """
+    return list(map(PERCENT_FORMAT.format, map(mmath.decimal2percent, pylist(decimals))))
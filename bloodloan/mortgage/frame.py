@@ -0,0 +1,219 @@
+"""Columnar mortgage schedules
+
+A ScheduleFrame holds a whole schedule as one contiguous NumPy array per field,
+instead of a list of LoanPayment objects that each carry their own copies of every Cost.
+"""
+
+import copy
+import logging
+
+import numpy
+
+from bloodloan.mortgage import mmath
+from bloodloan.mortgage import schedule
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+
+class ScheduleRow:
+    """A read-only view of one row of a ScheduleFrame
+
+    Has the same properties as a LoanPayment,
+    so it can be passed to templates and functions that expect one.
+    """
+
+    __slots__ = ('frame', 'row')
+
+    def __init__(self, frame, row):
+        self.frame = frame
+        self.row = row
+
+    def __getattr__(self, name):
+        try:
+            column = self.frame.columns[name]
+        except KeyError:
+            raise AttributeError(f"ScheduleRow has no attribute '{name}'")
+        return column[self.row].item()
+
+    def __str__(self):
+        return " ".join([
+            "ScheduleRow<",
+            f"#{self.index}",
+            f"RegularPayment({self.regularpmt})",
+            f"Total({self.totalpmt})",
+            f"RemainingPrincipal({self.principal})",
+            f"TotalInterest({self.totalinterest})",
+            ">"
+        ])
+
+    def __repr__(self):
+        return str(self)
+
+    @property
+    def othercosts(self):
+        """List of costconfig.Cost objects with their values for this row"""
+        return self.frame.costs_at(self.row)
+
+
+class ScheduleFrame:
+    """A mortgage schedule stored as columns
+
+    columns         a dict of column name to a 1d NumPy array, one element per payment;
+                    the names match the properties of a LoanPayment, and include
+                    precomputed totalothercosts, totalpmt, and equity columns
+    costplan        the costconfig.CostPlan that monthly costs were calculated from, if any
+    costbasis       the costplan basis for each row, if any
+    """
+
+    # Columns that must be passed to the constructor
+    FIELDS = (
+        'regularpmt',
+        'interestpmt',
+        'balancepmt',
+        'overpmt',
+        'principal',
+        'value',
+        'rent',
+        'totalinterest',
+        'totalothercosts',
+    )
+
+    def __init__(self, columns, costplan=None, costbasis=None):
+        missing = [field for field in self.FIELDS if field not in columns]
+        if missing:
+            raise ValueError(f"Missing ScheduleFrame columns: {missing}")
+
+        self.columns = {
+            name: numpy.ascontiguousarray(column, dtype=int if name == 'index' else float)
+            for name, column in columns.items()}
+        nrows = len(self.columns['interestpmt'])
+        self.columns.setdefault('index', numpy.arange(nrows))
+        self.columns['totalpmt'] = (
+            self.columns['interestpmt'] + self.columns['balancepmt'] +
+            self.columns['overpmt'] + self.columns['totalothercosts'])
+        self.columns['equity'] = self.columns['value'] - self.columns['principal']
+
+        self.costplan = costplan
+        self.costbasis = costbasis
+        self._othercosts = None
+
+    def __len__(self):
+        return len(self.columns['index'])
+
+    def __str__(self):
+        return f"<ScheduleFrame: {len(self)} rows, {len(self.costs)} other costs>"
+
+    def __getattr__(self, name):
+        # Expose each column as a property of the same name
+        try:
+            return self.__dict__['columns'][name]
+        except KeyError:
+            raise AttributeError(f"ScheduleFrame has no attribute '{name}'")
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            # A slice is another frame, whose columns are views of this frame's columns
+            return ScheduleFrame(
+                {name: column[row] for name, column in self.columns.items()},
+                costplan=self.costplan,
+                costbasis=None if self.costbasis is None else self.costbasis[row])
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(f"ScheduleFrame row {row} out of range")
+        return ScheduleRow(self, row)
+
+    def __iter__(self):
+        return self.rows()
+
+    def rows(self):
+        """Yield a ScheduleRow view for each row"""
+        for idx in range(len(self)):
+            yield ScheduleRow(self, idx)
+
+    @property
+    def costs(self):
+        """The list of costconfig.Cost objects that monthly costs were calculated from"""
+        return self.costplan.costs if self.costplan else []
+
+    @property
+    def othercosts(self):
+        """A 2d array of monthly cost values, with one row per item in costs
+
+        Only calculated when something asks for the per-item breakdown
+        """
+        if self._othercosts is None:
+            if self.costplan is None:
+                self._othercosts = numpy.zeros((0, len(self)))
+            else:
+                self._othercosts = self.costplan.values(self.costbasis).T
+        return self._othercosts
+
+    def costs_at(self, row):
+        """List of costconfig.Cost objects with their values calculated for one row"""
+        result = []
+        for cost, value in zip(self.costs, self.othercosts[:, row].tolist()):
+            cost = copy.copy(cost)
+            cost.value = value
+            result.append(cost)
+        return result
+
+    def rollup(self, interval=mmath.MONTHS_IN_YEAR, offset=0):
+        """Roll this monthly schedule up into longer intervals
+
+        interval    number of months in each interval, like 3 for quarters or 12 for years
+        offset      number of months in a partial first interval;
+                    see schedule.interval_offset()
+
+        returns     a ScheduleFrame with a row for each interval,
+                    like schedule.rollup() but calculated a column at a time
+
+        Monthly costs are linear in their basis,
+        so summing each interval's basis gives the totals for each line item
+        """
+        starts = schedule.interval_starts(len(self), interval, offset)
+        if not starts:
+            return self[:0]
+        lasts = numpy.array(starts[1:] + [len(self)], dtype=int) - 1
+
+        columns = {'index': numpy.arange(len(starts))}
+        for name in schedule.IntervalAggregator.SUMMED + ('totalothercosts',):
+            columns[name] = numpy.add.reduceat(self.columns[name], starts)
+        for name in schedule.IntervalAggregator.LAST:
+            columns[name] = self.columns[name][lasts]
+        costbasis = None
+        if self.costbasis is not None:
+            costbasis = numpy.add.reduceat(self.costbasis, starts, axis=0)
+        return ScheduleFrame(columns, costplan=self.costplan, costbasis=costbasis)
+
+    def loanpayments(self):
+        """Yield a LoanPayment object for each row"""
+        # Convert each column to a list once, rather than reading NumPy scalars row by row
+        fields = (
+            'index', 'regularpmt', 'interestpmt', 'balancepmt', 'overpmt',
+            'principal', 'value', 'rent', 'totalinterest')
+        rows = zip(*(self.columns[name].tolist() for name in fields))
+        for row, costvalues in zip(rows, self.othercosts.T.tolist()):
+            othercosts = []
+            for cost, value in zip(self.costs, costvalues):
+                cost = copy.copy(cost)
+                cost.value = value
+                othercosts.append(cost)
+            yield schedule.LoanPayment(*row, othercosts=othercosts)
+
+    def to_pandas(self):
+        """Return a pandas.DataFrame that shares memory with this frame's columns
+
+        Requires pandas, which is not otherwise a dependency
+        """
+        import pandas  # pylint: disable=C0415
+        return pandas.DataFrame(self.columns, copy=False)
+
+    def to_arrow(self):
+        """Return a pyarrow.Table built from this frame's columns without copying them
+
+        Requires pyarrow, which is not otherwise a dependency
+        """
+        import pyarrow  # pylint: disable=C0415
+        return pyarrow.table({name: pyarrow.array(col) for name, col in self.columns.items()})
@@ -0,0 +1,139 @@
+"""Memoized mortgage calculations
+
+Cache the results of closing costs and schedules,
+so that recalculating with inputs we've seen before is instant
+"""
+
+import collections
+import logging
+import numbers
+import threading
+
+from bloodloan.mortgage import amortize
+from bloodloan.mortgage import closing
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+
+class LRUCache:
+    """A bounded cache that evicts the least recently used entry first
+
+    maxsize     maximum number of entries to keep
+    hits        number of lookups that found an entry
+    misses      number of lookups that did not
+    evictions   number of entries evicted to stay under maxsize
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __str__(self):
+        return " ".join([
+            f"<LRUCache: {len(self)}/{self.maxsize} entries,",
+            f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions>"])
+
+    def get(self, key, calculate):
+        """Get the value for a key, calling calculate() to get it if it isn't cached
+
+        key         a hashable key
+        calculate   a function taking no arguments that returns the value for key
+        """
+        with self._lock:
+            try:
+                value = self._entries[key]
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            except KeyError:
+                self.misses += 1
+
+        # Don't hold the lock while calculating, which might take a while
+        value = calculate()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        """Remove all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+CLOSE_CACHE = LRUCache(maxsize=64)
+SCHEDULE_CACHE = LRUCache(maxsize=64)
+
+
+def normalize(value):
+    """Normalize an input so that equal inputs make equal cache keys
+
+    Numbers are converted to floats and rounded, so that e.g. 250000 and 250000.0 are the same;
+    sequences are converted to tuples of normalized values
+    """
+    if isinstance(value, numbers.Number):
+        return round(float(value), 10)
+    if value is None or isinstance(value, str):
+        return value
+    return tuple(normalize(item) for item in value)
+
+
+def close(saleprice, interestrate, loanterm, propertytaxes, costs):
+    """Memoized closing.close()
+
+    costs       a costconfig.CostConfigurationCollection;
+                its closing.closing_plan() is passed to closing.close()
+    """
+    key = (
+        normalize(saleprice), normalize(interestrate), normalize(loanterm),
+        normalize(propertytaxes), costs.key)
+    result = CLOSE_CACHE.get(key, lambda: closing.close(
+        saleprice, interestrate, loanterm, propertytaxes, closing.closing_plan(costs)))
+    logger.debug("Closing cache: %s", CLOSE_CACHE)
+    return result
+
+
+def amortize_tracks(
+        interestrate,
+        value,
+        principal,
+        saleprice,
+        term,
+        tracks,
+        appreciation=0,
+        costs=None,
+        monthlyrent=0,
+        keep=None):
+    """Memoized amortize.amortize_tracks()
+
+    costs       a costconfig.CostConfigurationCollection, or None;
+                its monthly cost plan is passed to amortize.amortize_tracks()
+
+    The summaries and frames in the result are shared between callers, so don't modify them
+    """
+    keep = range(len(tracks)) if keep is None else keep
+    key = (
+        normalize(interestrate), normalize(value), normalize(principal), normalize(saleprice),
+        normalize(term), normalize(tracks), normalize(appreciation),
+        costs.key if costs else None, normalize(monthlyrent), tuple(keep))
+    result = SCHEDULE_CACHE.get(key, lambda: amortize.amortize_tracks(
+        interestrate, value, principal, saleprice, term, tracks,
+        appreciation=appreciation, monthlycosts=costs.monthly_plan if costs else None,
+        monthlyrent=monthlyrent, keep=keep))
+    logger.debug("Schedule cache: %s", SCHEDULE_CACHE)
+    return result
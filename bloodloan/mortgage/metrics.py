@@ -0,0 +1,274 @@
+"""Investment metrics
+
+Score a mortgage schedule as an investment:
+internal rate of return, net present value, cap rate, cash-on-cash return,
+and debt service coverage ratio.
+
+The cash flows of buying a property, holding it for some months, and then selling it are:
+
+    at closing      minus the cash paid at closing (the down payment and fees)
+    each month      rent minus the total payment (mortgage payment, overpayment, and other costs)
+    when sold       plus the equity in the property (value minus remaining principal),
+                    minus the costs of selling it
+
+irr() and npv() work on a 2d array with one row of cash flows per hold period or scenario,
+so that thousands of them can be scored at once.
+"""
+
+import logging
+
+import numpy
+
+from bloodloan.mortgage import mmath
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+
+# Default yearly rate to discount future cash flows by, like the return of another investment
+DISCOUNT_RATE = 0.08
+
+# Bounds on the monthly rate that irr() searches between when Newton's method fails;
+# IRRs outside of them (roughly -100% to +400,000% a year) are reported as NaN
+IRR_BRACKET = (-0.5, 1.0)
+
+
+def annual2periodic(rate, periods=mmath.MONTHS_IN_YEAR):
+    """The rate per period that compounds to a yearly rate"""
+    return (1 + rate) ** (1 / periods) - 1
+
+
+def periodic2annual(rate, periods=mmath.MONTHS_IN_YEAR):
+    """The yearly rate that a rate per period compounds to"""
+    return (1 + rate) ** periods - 1
+
+
+def npv(rate, cashflows, periods=mmath.MONTHS_IN_YEAR):
+    """Net present value of cash flows
+
+    rate        yearly discount rate, or an array of them with one per row of cashflows
+    cashflows   a 1d array of cash flows, one per period, starting now;
+                or a 2d array, with one row of cash flows per scenario
+    periods     number of periods in a year
+
+    returns     the net present value, or an array with one per row of cashflows
+    """
+    cashflows = numpy.asarray(cashflows, dtype=float)
+    periodic = annual2periodic(numpy.asarray(rate, dtype=float), periods)
+    discounts = (1 + periodic)[..., numpy.newaxis] ** -numpy.arange(cashflows.shape[-1])
+    return (cashflows * discounts).sum(axis=-1)
+
+
+def _periodic_npv(rates, cashflows, times):
+    """NPV of each row of cashflows at the matching rate per period, and its derivative"""
+    discounts = numpy.exp(-times * numpy.log1p(rates)[:, numpy.newaxis])
+    values = (cashflows * discounts).sum(axis=1)
+    slopes = -(cashflows * times * discounts).sum(axis=1) / (1 + rates)
+    return values, slopes
+
+
+def irr(cashflows, periods=mmath.MONTHS_IN_YEAR, guess=0.1, tolerance=1e-10, maxiter=50):
+    """Internal rate of return of cash flows: the yearly discount rate at which their NPV is 0
+
+    cashflows   a 1d array of cash flows, one per period, starting now;
+                or a 2d array, with one row of cash flows per scenario
+    periods     number of periods in a year
+    guess       yearly rate to start searching from
+    tolerance   stop when the rate per period changes by less than this
+    maxiter     maximum number of Newton's method iterations
+
+    returns     the yearly IRR, or an array with one per row of cashflows;
+                NaN where there is none, like when every cash flow is negative
+
+    Every row is solved at once with Newton's method.
+    Rows where that doesn't converge are solved by bisection within IRR_BRACKET instead.
+    If cash flows change sign more than once, they can have more than one IRR;
+    this finds one of them.
+    """
+    cashflows = numpy.asarray(cashflows, dtype=float)
+    flows = numpy.atleast_2d(cashflows)
+    times = numpy.arange(flows.shape[1])
+    rates = numpy.full(len(flows), annual2periodic(guess, periods))
+
+    # Only rows that are still converging are recalculated each iteration.
+    # Extreme rates overflow or divide by zero; those rows just fail to converge.
+    active = numpy.arange(len(flows))
+    converged = numpy.zeros(len(flows), dtype=bool)
+    with numpy.errstate(over='ignore', divide='ignore', invalid='ignore'):
+        for _ in range(maxiter):
+            values, slopes = _periodic_npv(rates[active], flows[active], times)
+            steps = values / slopes
+            rates[active] -= steps
+            done = numpy.abs(steps) < tolerance
+            converged[active[done]] = True
+            active = active[~done & numpy.isfinite(steps)]
+            active = active[rates[active] > -1]
+            if active.size == 0:
+                break
+
+        failed = ~converged | ~(rates > -1)
+        if numpy.any(failed):
+            logger.debug("Solving %s IRRs by bisection", numpy.count_nonzero(failed))
+            lower, upper = IRR_BRACKET
+            rates[failed] = _bisect(flows[failed], times, lower, upper, tolerance)
+
+    result = periodic2annual(rates, periods)
+    return result if cashflows.ndim > 1 else result[0]
+
+
+def _bisect(flows, times, lower, upper, tolerance):
+    """Find a rate per period where each row of flows has an NPV of 0, by bisection
+
+    Rows whose NPV doesn't change sign between lower and upper get NaN
+    """
+    count = len(flows)
+    lows = numpy.full(count, lower)
+    highs = numpy.full(count, upper)
+    lowvalues, _ = _periodic_npv(lows, flows, times)
+    highvalues, _ = _periodic_npv(highs, flows, times)
+    bracketed = numpy.sign(lowvalues) != numpy.sign(highvalues)
+
+    iterations = int(numpy.ceil(numpy.log2((upper - lower) / tolerance)))
+    for _ in range(iterations):
+        middles = (lows + highs) / 2
+        middlevalues, _ = _periodic_npv(middles, flows, times)
+        below = numpy.sign(middlevalues) == numpy.sign(lowvalues)
+        lows = numpy.where(below, middles, lows)
+        lowvalues = numpy.where(below, middlevalues, lowvalues)
+        highs = numpy.where(below, highs, middles)
+
+    return numpy.where(bracketed, (lows + highs) / 2, numpy.nan)
+
+
+def schedule_column(payments, name):
+    """One column of a schedule as an array
+
+    payments    a frame.ScheduleFrame, or a list of LoanPayment objects
+    name        name of a LoanPayment property
+    """
+    if hasattr(payments, 'columns'):
+        return payments.columns[name]
+    return numpy.array([getattr(payment, name) for payment in payments], dtype=float)
+
+
+def hold_cashflows(payments, invested, holds, sellingcosts=0):
+    """Cash flows of buying a property, holding it for some number of months, and selling it
+
+    payments        the schedule, as a frame.ScheduleFrame or a list of LoanPayment objects
+    invested        cash paid at closing, like a CloseResult's downpayment_total + fees_total
+    holds           list of the number of months to hold the property before selling,
+                    each from 1 to the length of the schedule
+    sellingcosts    fraction of the property's value paid to sell it, like 0.06 for agent fees
+
+    returns         a 2d array with a row for each hold, a first column for closing,
+                    and a column for each month of the longest hold;
+                    months after a shorter hold ends are 0
+    """
+    holds = numpy.asarray(holds, dtype=int)
+    if holds.size == 0 or holds.min() < 1 or holds.max() > len(payments):
+        raise ValueError(f"Holds must be from 1 to {len(payments)} months, not {holds.tolist()}")
+    longest = holds.max()
+
+    monthly = (
+        schedule_column(payments, 'rent')[:longest] -
+        schedule_column(payments, 'totalpmt')[:longest])
+    months = numpy.arange(1, longest + 1)
+    flows = numpy.zeros((len(holds), longest + 1))
+    flows[:, 0] = -invested
+    flows[:, 1:] = numpy.where(months <= holds[:, numpy.newaxis], monthly, 0)
+
+    exits = holds - 1
+    flows[numpy.arange(len(holds)), holds] += (
+        schedule_column(payments, 'equity')[exits] -
+        sellingcosts * schedule_column(payments, 'value')[exits])
+    return flows
+
+
+class InvestmentMetrics:
+    """Investment metrics of a property
+
+    For each hold period:
+    holds           array of the number of months the property is held before it is sold
+    irr             array of the yearly internal rate of return
+    npv             array of the net present value at discountrate
+    discountrate    the yearly discount rate that npv was calculated at
+
+    For the first year:
+    noi             net operating income: rent minus other costs, before mortgage payments
+    debtservice     regular mortgage payments, not including overpayments
+    cashflow        net operating income minus debt service
+    invested        cash paid at closing
+    caprate         net operating income over the sale price
+    cashoncash      cash flow over the cash paid at closing
+    dscr            debt service coverage ratio: net operating income over debt service
+    """
+
+    def __init__(
+            self, holds, irr, npv, discountrate,  # pylint: disable=W0621
+            noi, debtservice, invested, saleprice):
+        self.holds = holds
+        self.irr = irr
+        self.npv = npv
+        self.discountrate = discountrate
+        self.noi = noi
+        self.debtservice = debtservice
+        self.cashflow = noi - debtservice
+        self.invested = invested
+        self.caprate = noi / saleprice if saleprice else numpy.nan
+        self.cashoncash = self.cashflow / invested if invested else numpy.nan
+        self.dscr = noi / debtservice if debtservice else numpy.nan
+
+    def __str__(self):
+        return " ".join([
+            f"<InvestmentMetrics: {len(self.holds)} holds,",
+            f"cap rate {self.caprate:.4f}, cash-on-cash {self.cashoncash:.4f},",
+            f"DSCR {self.dscr:.2f}>"])
+
+    def rows(self):
+        """Yield (months held, IRR, NPV) for each hold period"""
+        yield from zip(self.holds.tolist(), self.irr.tolist(), self.npv.tolist())
+
+
+def evaluate(
+        payments,
+        downpayment,
+        fees,
+        saleprice,
+        holds=None,
+        discountrate=DISCOUNT_RATE,
+        sellingcosts=0):
+    """Calculate investment metrics for a schedule
+
+    payments        the schedule, as a frame.ScheduleFrame or a list of LoanPayment objects
+    downpayment     down payment paid at closing, like a CloseResult's downpayment_total
+    fees            fees paid at closing, like a CloseResult's fees_total
+    saleprice       sale price of the property
+    holds           list of the number of months to hold the property before selling it;
+                    by default, every whole year of the schedule
+    discountrate    yearly rate to discount cash flows by for NPV
+    sellingcosts    fraction of the property's value paid to sell it
+
+    returns         an InvestmentMetrics
+    """
+    invested = downpayment + fees
+    if holds is None:
+        holds = numpy.arange(mmath.MONTHS_IN_YEAR, len(payments) + 1, mmath.MONTHS_IN_YEAR)
+        if holds.size == 0:
+            holds = numpy.array([len(payments)])
+    holds = numpy.asarray(holds, dtype=int)
+
+    flows = hold_cashflows(payments, invested, holds, sellingcosts=sellingcosts)
+
+    # First year figures; a schedule shorter than a year is scaled up to one
+    year = slice(0, mmath.MONTHS_IN_YEAR)
+    scale = mmath.MONTHS_IN_YEAR / min(len(payments), mmath.MONTHS_IN_YEAR)
+    noi = scale * float(numpy.sum(
+        schedule_column(payments, 'rent')[year] -
+        schedule_column(payments, 'totalothercosts')[year]))
+    debtservice = scale * float(numpy.sum(
+        schedule_column(payments, 'interestpmt')[year] +
+        schedule_column(payments, 'balancepmt')[year]))
+
+    return InvestmentMetrics(
+        holds, irr(flows), npv(discountrate, flows), discountrate,
+        noi, debtservice, invested, saleprice)
@@ -1,5 +1,8 @@
 """Generic mortgage-related math"""
 
+import math
+
+
 MONTHS_IN_YEAR = 12
 DAYS_IN_MONTH_APPROX = 30
 
@@ -21,8 +24,8 @@ def decimal2percent(decimal):
 
         1.9000000000000000000004
 
-    Consider using bloodloan.ui.uiutil.percent() when trying to display a decimal value as a
-    percentage instead.
+    Consider using bloodloan.mortgage.formatting.percent() when trying to display a decimal value
+    as a percentage instead.
     """
     return decimal * 100
 
@@ -42,3 +45,77 @@ def monthly_payment(interestrate, principal, term):
     """
     mrate = monthlyrate(interestrate)
     return mrate * principal / (1 - (1 + mrate)**(-term))
+
+
+def balance_after(interestrate, principal, term, month, overpayment=0):
+    """The principal balance after N months of payments with a constant overpayment
+
+    Formula from: https://en.wikipedia.org/wiki/Mortgage_calculator#Monthly_payment_formula
+    with the overpayment added to the regular monthly payment.
+    This does not stop at zero: after the loan is paid off, the result is negative.
+
+    interestrate    yearly interest rate of the loan
+    principal       total amount of the loan
+    term            loan term in months
+    month           the number of payments that have been made
+    overpayment     constant amount overpaid every month
+    """
+    mrate = monthlyrate(interestrate)
+    mpay = monthly_payment(interestrate, principal, term) + overpayment
+    growth = (1 + mrate)**month
+    return growth * principal - (growth - 1) / mrate * mpay
+
+
+def payoff_months(interestrate, principal, term, overpayment=0):
+    """The number of monthly payments before a loan with a constant overpayment is paid off
+
+    Agrees with the length of schedule.schedule(), which makes the last payment in the month
+    that would take the principal to zero or below,
+    unless the principal is already less than a cent.
+
+    interestrate    yearly interest rate of the loan
+    principal       total amount of the loan
+    term            loan term in months
+    overpayment     constant amount overpaid every month
+    """
+    if principal <= 0:
+        return 0
+    mrate = monthlyrate(interestrate)
+    mpay = monthly_payment(interestrate, principal, term) + overpayment
+    if mpay <= mrate * principal:
+        raise ValueError(f"A monthly payment of {mpay} will never pay off {principal}")
+
+    # The principal reaches zero when (1 + mrate)**month >= mpay / (mpay - mrate * principal);
+    # the log only gets us close, so check the neighbors to correct for rounding error
+    def balance(month):
+        return balance_after(interestrate, principal, term, month, overpayment)
+
+    month = math.ceil(math.log(mpay / (mpay - mrate * principal)) / math.log(1 + mrate))
+    while month > 0 and balance(month - 1) <= 0:
+        month -= 1
+    while balance(month) > 0:
+        month += 1
+
+    # Don't count a final payment of a fraction of a cent
+    while month > 0 and balance(month - 1) < 0.01:
+        month -= 1
+    return month
+
+
+def total_interest(interestrate, principal, term, overpayment=0, months=None):
+    """Total interest paid over some months of a loan with a constant overpayment
+
+    interestrate    yearly interest rate of the loan
+    principal       total amount of the loan
+    term            loan term in months
+    overpayment     constant amount overpaid every month
+    months          the number of payments to count interest for;
+                    if None, count until the loan is paid off
+    """
+    if months is None:
+        months = payoff_months(interestrate, principal, term, overpayment)
+    mpay = monthly_payment(interestrate, principal, term) + overpayment
+    # Whatever was paid that didn't reduce the principal went to interest;
+    # the final payment is truncated, but the interest in that month is not
+    remaining = balance_after(interestrate, principal, term, months, overpayment)
+    return remaining - principal + months * mpay
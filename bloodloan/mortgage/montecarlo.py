@@ -0,0 +1,149 @@
+"""Monte Carlo simulation of appreciation, rent, and vacancy
+
+schedule.schedule() assumes a fixed appreciation rate, a fixed rent, and (via cost configs)
+a fixed vacancy fraction. Here, those are drawn at random for thousands of paths,
+and every path is evaluated at once as a (paths x months) array.
+
+The loan itself doesn't depend on any of the random draws,
+so its schedule is calculated once and broadcast across all paths.
+"""
+
+import logging
+
+import numpy
+
+from bloodloan.mortgage import amortize
+from bloodloan.mortgage import costconfig
+from bloodloan.mortgage import mmath
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+
+# Metrics with a percentile band for each month
+METRICS = ('value', 'rent', 'equity', 'cashflow', 'totalcost')
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class MonteCarloResult:
+    """Percentile bands of simulated metrics
+
+    percentiles     the percentiles of each band, like 5 for the 5th percentile
+    bands           dict of metric name to a 2d array, with one row per percentile
+                    and one column per month
+    means           dict of metric name to a 1d array of the mean of each month
+    paths           dict of metric name to the full (paths x months) array,
+                    if simulate() was asked to keep them, otherwise None
+    """
+
+    def __init__(self, percentiles, bands, means, paths=None):
+        self.percentiles = tuple(percentiles)
+        self.bands = bands
+        self.means = means
+        self.paths = paths
+
+    def __str__(self):
+        months = len(next(iter(self.means.values()))) if self.means else 0
+        return f"<MonteCarloResult: {months} months, percentiles {self.percentiles}>"
+
+    def band(self, metric, percentile):
+        """The given percentile of a metric for each month"""
+        return self.bands[metric][self.percentiles.index(percentile)]
+
+
+def simulate(
+        interestrate,
+        value,
+        principal,
+        saleprice,
+        term,
+        overpayments=None,
+        monthlycosts=None,
+        monthlyrent=0,
+        appreciation=0,
+        appreciation_volatility=0,
+        rentgrowth=0,
+        rentgrowth_volatility=0,
+        vacancy=0,
+        paths=1000,
+        seed=None,
+        percentiles=PERCENTILES,
+        keep_paths=False):
+    """Simulate a loan over many random paths of appreciation, rent, and vacancy
+
+    interestrate, value, principal, saleprice, term, overpayments, and monthlycosts
+    are the same as for schedule.schedule(). Then:
+
+    monthlyrent             projected monthly rent at the start of the loan
+    appreciation            mean yearly appreciation rate
+    appreciation_volatility standard deviation of the yearly appreciation rate;
+                            appreciation is drawn independently for every month,
+                            scaled to a monthly mean and standard deviation
+    rentgrowth              mean yearly rent growth rate
+    rentgrowth_volatility   standard deviation of the yearly rent growth rate;
+                            rent changes once a year, as it would when a lease is renewed
+    vacancy                 chance that the property is vacant in any given month;
+                            when it is, no rent is collected that month.
+                            Leave fixed vacancy costs (like the 5% rent fraction in
+                            misc_management.yaml) out of monthlycosts, or it will count twice
+    paths                   number of paths to simulate
+    seed                    seed for the random number generator; the same seed and arguments
+                            always give the same results
+    percentiles             percentiles to calculate for each metric
+    keep_paths              if True, keep the full arrays of every path in the result
+
+    returns                 a MonteCarloResult, with these metrics for each month:
+                            value       value of the property
+                            rent        scheduled rent, whether or not it was collected
+                            equity      value minus remaining principal
+                            cashflow    rent collected minus all payments and other costs
+                            totalcost   all payments and other costs minus rent collected,
+                                        summed from the start of the loan to that month
+    """
+    rng = numpy.random.default_rng(seed)
+    costplan = costconfig.CostPlan.compile(monthlycosts)
+
+    # Other costs are recalculated per path below, so the schedule doesn't need them
+    payments = amortize.amortize(
+        interestrate, value, principal, saleprice, term, overpayments=overpayments)
+    nmonths = len(payments)
+    logger.info("Simulating %s paths of %s months", paths, nmonths)
+
+    months = numpy.arange(nmonths)
+    monthyears = months // mmath.MONTHS_IN_YEAR
+    nyears = int(monthyears[-1]) + 1 if nmonths else 0
+
+    growth = 1 + rng.normal(
+        appreciation / mmath.MONTHS_IN_YEAR,
+        appreciation_volatility / numpy.sqrt(mmath.MONTHS_IN_YEAR),
+        size=(paths, nmonths))
+    values = value * numpy.cumprod(growth, axis=1)
+
+    # Rent grows at the start of each year after the first
+    rentgrowths = 1 + rng.normal(rentgrowth, rentgrowth_volatility, size=(paths, nyears))
+    if nyears:
+        rentgrowths[:, 0] = 1
+    rents = monthlyrent * numpy.cumprod(rentgrowths, axis=1)[:, monthyears]
+    collected = numpy.where(rng.random(size=(paths, nmonths)) < vacancy, 0, rents)
+
+    boms = payments.principal + payments.balancepmt + payments.overpmt
+    boyprincipals = boms[months - months % mmath.MONTHS_IN_YEAR]
+    othercosts = costplan.totalfor(saleprice, values, boyprincipals, rents)
+    loanpayments = payments.interestpmt + payments.balancepmt + payments.overpmt
+
+    simulated = {
+        'value': values,
+        'rent': rents,
+        'equity': values - payments.principal,
+        'cashflow': collected - loanpayments - othercosts,
+    }
+    simulated['totalcost'] = -numpy.cumsum(simulated['cashflow'], axis=1)
+
+    return MonteCarloResult(
+        percentiles,
+        bands={
+            name: numpy.percentile(metric, percentiles, axis=0)
+            for name, metric in simulated.items()},
+        means={name: metric.mean(axis=0) for name, metric in simulated.items()},
+        paths=simulated if keep_paths else None)
@@ -1,12 +1,16 @@
 """Mortgage schedule"""
 
+import copy
 import logging
 
+from bloodloan import logs
+from bloodloan.mortgage import costconfig
 from bloodloan.mortgage import expenses
 from bloodloan.mortgage import mmath
 
 
 logger = logging.getLogger(__name__)  # pylint: disable=C0103
+monthlogger = logs.monthlogger(__name__)  # pylint: disable=C0103
 
 
 class LoanPayment:
@@ -72,6 +76,53 @@ class LoanPayment:
         return self.value - self.principal
 
 
+class ScheduleSummary:
+    """Summary numbers for a whole schedule, without the schedule itself
+
+    months          number of monthly payments until the loan is paid off
+    totalinterest   total interest paid over the life of the loan
+    frame           the schedule itself as a frame.ScheduleFrame, if it was kept
+    """
+
+    def __init__(self, months=0, totalinterest=0, frame=None):
+        self.months = months
+        self.totalinterest = totalinterest
+        self.frame = frame
+
+    def __str__(self):
+        return f"<ScheduleSummary: {self.months} months, {self.totalinterest} total interest>"
+
+    def __repr__(self):
+        return str(self)
+
+    @classmethod
+    def fromschedule(cls, payments):
+        """Summarize a schedule that has already been calculated
+
+        payments    a list of LoanPayment objects, or a frame.ScheduleFrame
+        """
+        if len(payments) == 0:
+            return cls()
+        return cls(months=len(payments), totalinterest=payments[-1].totalinterest)
+
+
+def summarize(interestrate, principal, term, overpayment=0):
+    """Summarize the schedule of a loan with a constant overpayment, without calculating it
+
+    interestrate    yearly interest rate of the loan
+    principal       total amount of the loan
+    term            loan term in months
+    overpayment     constant amount overpaid every month
+
+    returns         a ScheduleSummary
+    """
+    months = mmath.payoff_months(interestrate, principal, term, overpayment)
+    return ScheduleSummary(
+        months=months,
+        totalinterest=mmath.total_interest(
+            interestrate, principal, term, overpayment, months=months))
+
+
 def schedule(
         interestrate,
         value,
@@ -94,32 +145,23 @@ def schedule(
     term            loan term in months
     overpayments    array of overpayment amounts for each month in the term
     appreciation    appreciation in decimal value representing percent
-    monthlycosts    list of MonthlyCost objects to apply
+    monthlycosts    list of MonthlyCost objects to apply, or a costconfig.CostPlan
     monthlyrent     projected monthly rent for the property
 
     yield           LoanPayment objects
 
     NOTE: Calculating with the actual formula
-    You can use the formula to calculate monthly payments
-    The disadvantage to this is basically me: I haven't figured out how to apply overpayments
-    (I guess if I remembered calculus better, I could use a calculus formula instead.)
-    def balance_after(interestrate, principal, term, month):
-        '''The principal balance after N months of on-time patyments of *only* the monthly_payment
-
-        Formula from: https://en.wikipedia.org/wiki/Mortgage_calculator#Monthly_payment_formula
-
-        interestrate    yearly interest rate of the loan
-        principal       total amount of the loan
-        term            loan term in months
-        month           the month to calculate from
-        '''
-        mrate = monthlyrate(interestrate)
-        mpay = monthly_payment(interestrate, principal, term)
-        return (1 + mrate)**month * principal - ((1 + mrate)**month - 1) / mrate * mpay
+    When the overpayment is the same every month, mmath.balance_after(),
+    mmath.payoff_months(), and mmath.total_interest() calculate the same results with the
+    formula instead of iterating; see summarize().
+    The disadvantage is that they can't apply overpayments that change from month to month.
     """
     overpayments = overpayments or []
+    monthlycosts = costconfig.CostPlan.compile(monthlycosts)
     mpay = mmath.monthly_payment(interestrate, principal, term)
-    logger.info(f"Monthly payment calculated at {mpay}")
+    logger.info("Monthly payment calculated at %s", mpay)
+    # Checked once, so that logging per month costs nothing when it's off
+    verbose = monthlogger.isEnabledFor(logging.DEBUG)
     monthidx = 0
     totalinterest = 0
     # beginning-of-year principal
@@ -141,33 +183,34 @@ def schedule(
 
         if principal <= 0:
             # Break before the yield so we don't get empty lines
-            logger.info(f"#{monthidx}: Principal {principal} is <= 0 in final month")
+            logger.info("#%s: Principal %s is <= 0 in final month", monthidx, principal)
             break
         elif principal < 0.01:
             # Also break if the principal is less than a cent
             # This prevents a weird payment that looks like it's for $0,
             # but actually is a rounded-down fraction of a cent
             logger.info(
-                f"#{monthidx}: Ignoring remaining principal of {principal} "
-                "because it is a fraction of a cent in final month")
+                "#%s: Ignoring remaining principal of %s "
+                "because it is a fraction of a cent in final month", monthidx, principal)
             break
         elif principal - balancepmt - overpmt <= 0:
             # Paying the normal amount will result in overpaying in the final month
             # Handle this by adjusting the balancepmt and overpmt
             if principal - balancepmt > 0:
-                logger.info(f"#{monthidx}: Truncating overpayment to {overpmt} in final month")
+                logger.info("#%s: Truncating overpayment to %s in final month", monthidx, overpmt)
                 overpmt = principal - balancepmt
                 principal = 0
             elif balancepmt > principal:
                 logger.info(
-                    f"#{monthidx}: Truncating balance payment to {balancepmt} in final month")
+                    "#%s: Truncating balance payment to %s in final month", monthidx, balancepmt)
                 overpmt = 0
                 balancepmt = principal
                 principal = 0
             else:
                 raise Exception("This should not happen")
         else:
-            # logger.debug(f"#{monthidx}: Paying normal amounts in non-final month")
+            if verbose:
+                monthlogger.debug("#%s: Paying normal amounts in non-final month", monthidx)
             principal = principal - balancepmt - overpmt
 
         monthapprec = appreciation / mmath.MONTHS_IN_YEAR
@@ -192,34 +235,149 @@ def schedule(
         monthidx += 1
 
 
+def check_interval(interval, offset):
+    """Raise a ValueError unless interval and offset describe valid intervals
+
+    interval    number of months in each interval, like 3 for quarters or 12 for years
+    offset      number of months in a partial first interval, from 0 to interval - 1;
+                0 means the first interval starts with the first month like all the others
+    """
+    if interval < 1:
+        raise ValueError(f"Interval must be at least one month, not {interval}")
+    if not 0 <= offset < interval:
+        raise ValueError(f"Offset must be from 0 to {interval - 1} months, not {offset}")
+
+
+def interval_offset(startmonth, intervalstart=1, interval=mmath.MONTHS_IN_YEAR):
+    """Find the offset for intervals aligned to the calendar
+
+    startmonth      calendar month of the first payment, from 1 to 12
+    intervalstart   calendar month that an interval starts in, like 1 for calendar years,
+                    or 10 for a fiscal year starting in October
+    interval        number of months in each interval
+
+    For example, if the first payment is in April, yearly intervals starting in January
+    have an offset of 9: April through December make a partial first year
+    """
+    return (intervalstart - startmonth) % interval
+
+
+def interval_starts(nmonths, interval=mmath.MONTHS_IN_YEAR, offset=0):
+    """The indexes of the months that start each interval of a schedule
+
+    nmonths     number of months in the schedule
+    """
+    check_interval(interval, offset)
+    if nmonths == 0:
+        return []
+    return ([0] if offset else []) + list(range(offset, nmonths, interval))
+
+
+class IntervalAggregator:
+    """Roll monthly payments up into longer intervals, one month at a time
+
+    Only running totals for the current interval are kept:
+    the sums of each payment, and a total for each line item of othercosts,
+    so the memory used doesn't grow with the length of the interval.
+
+    interval    number of months in each interval, like 3 for quarters or 12 for years
+    offset      number of months in a partial first interval; see check_interval()
+    """
+
+    # Properties that are summed over an interval
+    SUMMED = ('regularpmt', 'interestpmt', 'balancepmt', 'overpmt', 'rent')
+
+    # Properties that take the value of the last month in an interval
+    LAST = ('principal', 'value', 'totalinterest')
+
+    def __init__(self, interval=mmath.MONTHS_IN_YEAR, offset=0):
+        check_interval(interval, offset)
+        self.interval = interval
+        self.offset = offset
+        self.months = 0
+        self.index = 0
+        self.current = None
+        self.costs = []
+        self.costtotals = []
+
+    def add(self, month):
+        """Add the next month of a schedule
+
+        month       a LoanPayment, or anything with the same properties
+
+        returns     the finished LoanPayment for an interval if this month completed one,
+                    otherwise None
+        """
+        if self.current is None:
+            self.current = LoanPayment(index=self.index)
+            self.costs = list(month.othercosts)
+            self.costtotals = [0.0 for _ in self.costs]
+        elif len(month.othercosts) != len(self.costs):
+            raise ValueError(
+                f"Month {month.index} has {len(month.othercosts)} other costs, "
+                f"but earlier months in its interval had {len(self.costs)}")
+
+        current = self.current
+        current.regularpmt += month.regularpmt
+        current.interestpmt += month.interestpmt
+        current.balancepmt += month.balancepmt
+        current.overpmt += month.overpmt
+        current.rent += month.rent
+        current.principal = month.principal
+        current.value = month.value
+        current.totalinterest = month.totalinterest
+        self.costtotals = [
+            total + cost.value for total, cost in zip(self.costtotals, month.othercosts)]
+
+        self.months += 1
+        if (self.months - self.offset) % self.interval == 0:
+            return self.flush()
+        return None
+
+    def flush(self):
+        """Finish the current interval, even if it is partial
+
+        returns     its LoanPayment, or None if no months were added since the last one
+        """
+        if self.current is None:
+            return None
+        finished = self.current
+        for cost, total in zip(self.costs, self.costtotals):
+            cost = copy.copy(cost)
+            cost.value = total
+            finished.othercosts.append(cost)
+        self.current = None
+        self.index += 1
+        return finished
+
+
+def rollup(months, interval=mmath.MONTHS_IN_YEAR, offset=0):
+    """Roll a monthly schedule up into longer intervals
+
+    months      an iterable of LoanPayment objects, such as the schedule() generator
+    interval    number of months in each interval, like 3 for quarters or 12 for years
+    offset      number of months in a partial first interval; see interval_offset()
+
+    yield       a LoanPayment for each interval;
+                each of its othercosts is the total of that line item over the interval
+
+    For a frame.ScheduleFrame, its rollup() method does the same thing a column at a time
+    """
+    aggregator = IntervalAggregator(interval, offset)
+    for month in months:
+        finished = aggregator.add(month)
+        if finished is not None:
+            yield finished
+    last = aggregator.flush()
+    if last is not None:
+        yield last
+
+
 def monthly2yearly_schedule(months):
     """Convert a monthly schedule to a yearly one
 
-    months: array of LoanPayment objects
+    months: array of LoanPayment objects, or a frame.ScheduleFrame
     """
-    year = None
-    idx = 0
-    for month in months:
-        if idx % mmath.MONTHS_IN_YEAR == 0:
-            if year:
-                yield year
-                newyearidx = year.index + 1
-            else:
-                newyearidx = 0
-            year = LoanPayment(index=newyearidx)
-
-        # Adds:
-        year.regularpmt += month.regularpmt
-        year.interestpmt += month.interestpmt
-        year.balancepmt += month.balancepmt
-        year.overpmt += month.overpmt
-        year.rent += month.rent
-        year.othercosts += month.othercosts
-
-        # Overwrites:
-        year.principal = month.principal
-        year.value = month.value
-        year.totalinterest = month.totalinterest
-        idx += 1
-
-    yield year
+    if hasattr(months, 'rollup'):
+        return months.rollup(mmath.MONTHS_IN_YEAR).loanpayments()
+    return rollup(months, mmath.MONTHS_IN_YEAR)
@@ -0,0 +1,247 @@
+"""Scenario sweeps
+
+Calculate closing costs and schedules over a grid of parameters,
+like every combination of a few interest rates, sale prices, and overpayments,
+and collect the results in N-dimensional arrays labeled by those parameters.
+
+Overpayments are constant for each point of the grid,
+so schedule.summarize() gets the length and total interest of each schedule in closed form,
+without calculating it month by month.
+The other axes can be spread across a process pool.
+"""
+
+import itertools
+import logging
+import multiprocessing
+
+import numpy
+
+from bloodloan.mortgage import closing
+from bloodloan.mortgage import costconfig
+from bloodloan.mortgage import mmath
+from bloodloan.mortgage import schedule
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+
+# Parameters that can be swept or fixed, and their defaults; None means they must be passed.
+# As in the rest of the calculation core, interestrate and appreciation are decimals.
+PARAMETERS = {
+    'interestrate': None,
+    'saleprice': None,
+    'years': 30,
+    'rent': 0,
+    'overpayment': 0,
+    'appreciation': 0,
+    'propertytaxes': 0,
+}
+
+# Metrics calculated for each point of the grid
+METRICS = (
+    'loanamount',
+    'cashatclosing',
+    'monthlypayment',
+    'months',
+    'totalinterest',
+    'cashflow',
+)
+
+# The axis calculated within each task, rather than spread across tasks
+VECTORIZED = 'overpayment'
+
+# Calculation state for this process; see init_worker()
+_WORKER = {}
+
+
+class SweepResult:
+    """Metrics calculated over a grid of parameters
+
+    axes        dict of axis name to a 1d array of its coordinates, in order of dimension
+    metrics     dict of metric name to an N-dimensional array, with one dimension per axis
+    """
+
+    def __init__(self, axes, metrics):
+        self.axes = axes
+        self.metrics = metrics
+
+    def __str__(self):
+        dims = ", ".join(f"{name}: {len(coords)}" for name, coords in self.axes.items())
+        return f"<SweepResult: {dims}>"
+
+    def __getitem__(self, metric):
+        return self.metrics[metric]
+
+    @property
+    def shape(self):
+        """The shape of each metric's array"""
+        return tuple(len(coords) for coords in self.axes.values())
+
+    def sel(self, **coords):
+        """Select a single coordinate from some axes
+
+        coords      axis name to one of its coordinates
+
+        returns     a SweepResult without the selected axes
+        """
+        unknown = set(coords) - set(self.axes)
+        if unknown:
+            raise KeyError(f"Unknown axes {sorted(unknown)}")
+        index = []
+        axes = {}
+        for name, values in self.axes.items():
+            if name in coords:
+                matches = numpy.flatnonzero(numpy.isclose(values, coords[name]))
+                if len(matches) == 0:
+                    raise KeyError(f"{coords[name]} is not a coordinate of axis {name}")
+                index.append(matches[0])
+            else:
+                index.append(slice(None))
+                axes[name] = values
+        return SweepResult(
+            axes, {name: metric[tuple(index)] for name, metric in self.metrics.items()})
+
+    def records(self):
+        """Yield a flat dict of coordinates and metrics for each point of the grid"""
+        names = list(self.axes)
+        for index in numpy.ndindex(*self.shape):
+            record = {name: self.axes[name][idx].item() for name, idx in zip(names, index)}
+            record.update({name: metric[index].item() for name, metric in self.metrics.items()})
+            yield record
+
+    def to_xarray(self):
+        """Return an xarray.Dataset with a variable per metric
+
+        Requires xarray, which is not otherwise a dependency
+        """
+        import xarray  # pylint: disable=C0415
+        dims = list(self.axes)
+        return xarray.Dataset(
+            {name: (dims, metric) for name, metric in self.metrics.items()},
+            coords=self.axes)
+
+
+def init_worker(costs):
+    """Load cost configurations once for each worker process
+
+    costs       a costconfig.CostConfigurationCollection,
+                a directory of cost configuration YAML files to load one from,
+                or None for no costs
+    """
+    if costs is None:
+        costs = costconfig.CostConfigurationCollection()
+    elif isinstance(costs, str):
+        costs = costconfig.CostConfigurationCollection(directory=costs)
+    _WORKER['costs'] = costs
+
+
+def evaluate_point(
+        interestrate,
+        saleprice,
+        years,
+        rent,
+        appreciation,
+        propertytaxes,
+        overpayments):
+    """Calculate the metrics for one point of the grid, for every overpayment at once
+
+    overpayments    list of monthly overpayment amounts
+
+    returns         a dict of metric name to an array with one element per overpayment
+    """
+    costs = _WORKER['costs']
+    term = years * mmath.MONTHS_IN_YEAR
+    downpayment, fees, principal = closing.closing_plan(costs).totals(
+        saleprice, interestrate, propertytaxes)
+    plan = costs.monthly_plan
+
+    # None of the metrics need the schedule itself, just its length and total interest
+    summaries = [
+        schedule.summarize(interestrate, principal, term, overpayment)
+        for overpayment in overpayments]
+
+    # Cash flow in the first month; its other costs don't depend on the overpayment,
+    # so we don't need to build a schedule to get them
+    mpay = mmath.monthly_payment(interestrate, principal, term)
+    firstvalue = saleprice * (1 + appreciation / mmath.MONTHS_IN_YEAR)
+    firstcosts = float(plan.total(plan.basis(saleprice, firstvalue, principal, rent)))
+
+    count = len(overpayments)
+    return {
+        'loanamount': numpy.full(count, principal),
+        'cashatclosing': numpy.full(count, downpayment + fees),
+        'monthlypayment': numpy.full(count, mpay),
+        'months': numpy.array([summary.months for summary in summaries]),
+        'totalinterest': numpy.array([summary.totalinterest for summary in summaries]),
+        'cashflow': rent - (mpay + numpy.asarray(overpayments, dtype=float) + firstcosts),
+    }
+
+
+def evaluate_task(task):
+    """Evaluate one point of the grid, in a worker process
+
+    task        a tuple of (index, parameters dict), as made by sweep()
+
+    returns     a tuple of (index, metrics dict)
+    """
+    index, params = task
+    return index, evaluate_point(**params)
+
+
+def sweep(axes, costs=None, jobs=1, chunksize=8, **fixed):
+    """Calculate metrics over every combination of some parameters
+
+    axes        dict of parameter name to a list of values to sweep it over;
+                parameter names are the keys of PARAMETERS
+    costs       a costconfig.CostConfigurationCollection, a directory to load one from, or None;
+                each worker process loads it once, rather than receiving it with each task
+    jobs        number of worker processes; if 1, work in this process
+    chunksize   number of grid points to send to a worker at a time
+    fixed       values for parameters that are not swept, overriding the PARAMETERS defaults
+
+    returns     a SweepResult with the axes in the order they were passed
+    """
+    unknown = (set(axes) | set(fixed)) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters {sorted(unknown)}")
+    params = dict(PARAMETERS)
+    params.update(fixed)
+    missing = [name for name, value in params.items() if value is None and name not in axes]
+    if missing:
+        raise ValueError(f"Missing sweep parameters {missing}")
+
+    coords = {name: numpy.asarray(values) for name, values in axes.items()}
+    names = list(coords)
+    shape = tuple(len(values) for values in coords.values())
+    vectorized = VECTORIZED in coords
+    outer = [name for name in names if name != VECTORIZED]
+    params['overpayments'] = (
+        coords[VECTORIZED].tolist() if vectorized else [params[VECTORIZED]])
+    del params[VECTORIZED]
+
+    def tasks():
+        for index in itertools.product(*(range(len(coords[name])) for name in outer)):
+            point = dict(params)
+            point.update({name: coords[name][idx].item() for name, idx in zip(outer, index)})
+            yield index, point
+
+    metrics = {
+        name: numpy.zeros(shape, dtype=int if name == 'months' else float) for name in METRICS}
+
+    def store(results):
+        for index, values in results:
+            position = dict(zip(outer, index))
+            key = tuple(position.get(name, slice(None)) for name in names)
+            for name, value in values.items():
+                metrics[name][key] = value if vectorized else value[0]
+
+    npoints = int(numpy.prod([len(coords[name]) for name in outer]))
+    logger.info("Sweeping %s points of %s with %s jobs", npoints, names, jobs)
+    if jobs == 1:
+        init_worker(costs)
+        store(map(evaluate_task, tasks()))
+    else:
+        with multiprocessing.Pool(jobs, initializer=init_worker, initargs=(costs,)) as pool:
+            store(pool.imap_unordered(evaluate_task, tasks(), chunksize=chunksize))
+
+    return SweepResult(coords, metrics)
@@ -0,0 +1,237 @@
+"""Lightweight timing spans and opt-in profiling
+
+Wrap code in spans to see where time goes:
+
+    from bloodloan import profiling
+    profiling.PROFILER.enable()
+    with profiling.span('close'):
+        ...
+    print(profiling.PROFILER.table())
+    profiling.PROFILER.write_chrome_trace('trace.json')  # open in chrome://tracing or Perfetto
+
+Spans record wall time, CPU time, and call counts, and cost almost nothing when disabled.
+For more detail, a Profiler can also capture a cProfile and/or tracemalloc report
+for each recalculation; see Profiler.capture().
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+
+class SpanStats:
+    """Totals for every span with the same name
+
+    count       number of times the span was entered
+    wall        total wall clock seconds
+    cpu         total CPU seconds of this process, from time.process_time()
+    maxwall     longest wall clock seconds of a single span
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.maxwall = 0.0
+
+    def add(self, wall, cpu):
+        """Add one span's times"""
+        self.count += 1
+        self.wall += wall
+        self.cpu += cpu
+        self.maxwall = max(self.maxwall, wall)
+
+
+class Capture:
+    """The result of one Profiler.capture()
+
+    name        name of the captured code
+    profile     text report of the top functions by cumulative time from cProfile, or None
+    memory      text report of the top allocation sites from tracemalloc, or None
+    peak        peak traced memory in bytes, or None
+    """
+
+    def __init__(self, name, profile=None, memory=None, peak=None):
+        self.name = name
+        self.profile = profile
+        self.memory = memory
+        self.peak = peak
+
+    def __str__(self):
+        sections = [f"Capture of {self.name}"]
+        if self.peak is not None:
+            sections.append(f"Peak traced memory: {self.peak / 1024:.1f} KiB")
+        if self.memory:
+            sections.append(self.memory)
+        if self.profile:
+            sections.append(self.profile)
+        return "\n\n".join(sections)
+
+
+class Profiler:
+    """Collect timing spans
+
+    enabled     whether spans are recorded
+    cprofile    whether capture() runs cProfile
+    tracemalloc whether capture() runs tracemalloc
+    stats       dict of span name to SpanStats
+    events      list of individual spans for the Chrome trace, up to maxevents of them
+    captures    list of the most recent Capture objects, up to maxcaptures of them
+    """
+
+    def __init__(
+            self,
+            enabled=False,
+            cprofile=False,
+            tracemalloc=False,
+            maxevents=100000,
+            maxcaptures=10,
+            top=25):
+        self.enabled = enabled
+        self.cprofile = cprofile
+        self.tracemalloc = tracemalloc
+        self.maxevents = maxevents
+        self.maxcaptures = maxcaptures
+        self.top = top
+        self.stats = {}
+        self.events = []
+        self.captures = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def enable(self, cprofile=False, tracemalloc=False):  # pylint: disable=W0621
+        """Start recording spans, and optionally per-capture profiles"""
+        self.enabled = True
+        self.cprofile = cprofile
+        self.tracemalloc = tracemalloc
+
+    def disable(self):
+        """Stop recording spans and profiles"""
+        self.enabled = False
+        self.cprofile = False
+        self.tracemalloc = False
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self._lock:
+            self.stats = {}
+            self.events = []
+            self.captures = []
+            self._origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """Time the code in a with block
+
+        name        name of the span; spans with the same name are totalled together
+        args        extra information to show with the span in the Chrome trace
+        """
+        if not self.enabled:
+            yield
+            return
+        wallstart = time.perf_counter()
+        cpustart = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wallstart
+            cpu = time.process_time() - cpustart
+            with self._lock:
+                if name not in self.stats:
+                    self.stats[name] = SpanStats(name)
+                self.stats[name].add(wall, cpu)
+                if len(self.events) < self.maxevents:
+                    self.events.append({
+                        'name': name,
+                        'ph': 'X',
+                        'ts': (wallstart - self._origin) * 1e6,
+                        'dur': wall * 1e6,
+                        'pid': os.getpid(),
+                        'tid': threading.get_ident(),
+                        'args': dict(args, cpu_ms=cpu * 1e3),
+                    })
+
+    @contextlib.contextmanager
+    def capture(self, name):
+        """Time the code in a with block as a span, and profile it if profiling is enabled
+
+        If cprofile or tracemalloc are set, a Capture is added to captures
+        """
+        profiler = cProfile.Profile() if self.enabled and self.cprofile else None
+        tracing = self.enabled and self.tracemalloc and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if profiler:
+            profiler.enable()
+        try:
+            with self.span(name):
+                yield
+        finally:
+            if profiler:
+                profiler.disable()
+            result = Capture(name)
+            if profiler:
+                report = io.StringIO()
+                pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(
+                    self.top)
+                result.profile = report.getvalue()
+            if tracing:
+                snapshot = tracemalloc.take_snapshot()
+                result.peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                result.memory = "\n".join(
+                    str(stat) for stat in snapshot.statistics('lineno')[:self.top])
+            if profiler or tracing:
+                with self._lock:
+                    self.captures = (self.captures + [result])[-self.maxcaptures:]
+
+    def summary(self):
+        """Return a list of SpanStats, slowest total wall time first"""
+        with self._lock:
+            return sorted(self.stats.values(), key=lambda stats: stats.wall, reverse=True)
+
+    def table(self):
+        """Return the summary as a plain text table"""
+        namewidth = max([len(stats.name) for stats in self.stats.values()] + [4])
+        lines = [
+            f"{'Span':<{namewidth}}  {'Count':>7}  {'Wall ms':>10}  {'CPU ms':>10}  "
+            f"{'Mean ms':>10}  {'Max ms':>10}"]
+        for stats in self.summary():
+            lines.append(
+                f"{stats.name:<{namewidth}}  {stats.count:>7}  {stats.wall * 1e3:>10.3f}  "
+                f"{stats.cpu * 1e3:>10.3f}  {stats.wall / stats.count * 1e3:>10.3f}  "
+                f"{stats.maxwall * 1e3:>10.3f}")
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """Return spans in the Chrome trace event format, as a dict ready for json.dump()
+
+        Load the JSON file in chrome://tracing or https://ui.perfetto.dev
+        """
+        with self._lock:
+            return {'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        """Write spans to a Chrome trace JSON file"""
+        with open(path, 'w') as tracefile:
+            json.dump(self.chrome_trace(), tracefile)
+
+
+# The default profiler, disabled until something enables it
+PROFILER = Profiler()
+
+
+def span(name, **args):
+    """Time the code in a with block with the default profiler"""
+    return PROFILER.span(name, **args)
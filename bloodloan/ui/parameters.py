@@ -1,9 +1,13 @@
 """Parameters for the mortgage worksheet
 """
 
-import io
+import atexit
+import json
 import logging
 import os
+import stat
+import tempfile
+import threading
 
 import ipywidgets
 import yaml
@@ -12,6 +16,20 @@ import yaml
 logger = logging.getLogger(__name__)  # pylint: disable=C0103
 
 
+def _new_file_mode():
+    """The permissions open() gives a new file: 0666 minus the umask
+
+    The umask can only be read by setting it, so do that once at import,
+    before any flush timer threads could be creating files
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+NEW_FILE_MODE = _new_file_mode()
+
+
 class ParamMetadata:
     """Metadata required to build a parameter widget
 
@@ -43,38 +61,64 @@ class ParameterIds:
     COSTS = 'costs'
 
 
+def load_persisted(path):
+    """Load persisted parameter values from a file
+
+    Values are saved as JSON, but older versions saved YAML, so fall back to that.
+    JSON has no tuples, so lists are converted to tuples (as e.g. SelectMultiple widgets expect).
+
+    returns     a dict of parameter ID to value
+    """
+    try:
+        with open(path) as ppfile:
+            contents = ppfile.read()
+    except FileNotFoundError:
+        logger.debug("The persisted values path %s did not exist", path)
+        return {}
+
+    try:
+        persisted = json.loads(contents)
+    except ValueError:
+        try:
+            persisted = yaml.load(contents, Loader=yaml.UnsafeLoader)
+        except yaml.YAMLError as exc:
+            logger.debug("Could not load persisted data from %s: %s", path, exc)
+            return {}
+    if not isinstance(persisted, dict):
+        logger.debug("Ignoring persisted data from %s that is not a dict: %s", path, persisted)
+        return {}
+
+    logger.debug("Loaded persisted data from %s: %s", path, persisted)
+    return {
+        key: tuple(value) if isinstance(value, list) else value
+        for key, value in persisted.items()}
+
+
 class Params:
     """Parameter widgets for the mortgage worksheet
+
+    Persisted parameter values are kept in memory, and written to persist_path
+    after no value has changed for flush_delay seconds (or immediately if flush_delay is None).
     """
 
-    def __init__(self, persist_path=None, cost_config_names=None):
+    def __init__(self, persist_path=None, cost_config_names=None, flush_delay=1.0):
 
         cost_config_names = cost_config_names or []
 
-        persisted = {}
         self.persist_path = persist_path
+        self.flush_delay = flush_delay
+        self._persist_lock = threading.Lock()
+        self._flush_timer = None
+        self._dirty = False
+        persisted = {}
         if self.persist_path:
+            persist_dir, _ = os.path.split(self.persist_path)
+            os.makedirs(persist_dir or '.', exist_ok=True)
+            persisted = load_persisted(self.persist_path)
+            atexit.register(self.flush)
+        self.persisted = persisted
 
-            if not os.path.exists(self.persist_path):
-                logger.debug(f"The persisted values path {self.persist_path} did not exist")
-                persist_dir, _ = os.path.split(self.persist_path)
-                os.makedirs(persist_dir, exist_ok=True)
-                with open(self.persist_path, 'w') as ppfile:
-                    ppfile.write(yaml.dump({}))
-                persisted = {}
-
-            with open(self.persist_path) as ppfile:
-                try:
-                    persisted = yaml.load(ppfile, Loader=yaml.UnsafeLoader)
-                    logger.debug(f"Loaded persisted data from {self.persist_path}: {persisted}")
-                except io.UnsupportedOperation as exc:
-                    logger.debug(f"Could not load persisted data from {self.persist_path}: {exc}")
-                    persisted = {}
-            if persisted == {}:
-                with open(self.persist_path, 'w') as ppfile:
-                    ppfile.write(yaml.dump({}))
-
-        logger.debug(f"When initializing parameters, found persisted values: {persisted}")
+        logger.debug("When initializing parameters, found persisted values: %s", persisted)
 
         self.params_box = ipywidgets.Box(layout=ipywidgets.Layout(
             display='flex',
@@ -125,9 +169,9 @@ class Params:
             try:
                 value = persisted[widgetmd.widgetid]
                 widgetmd.kwargs['value'] = value
-                logger.debug(f"Found persisted value '{value}' for {widgetmd.widgetid}")
+                logger.debug("Found persisted value '%s' for %s", value, widgetmd.widgetid)
             except KeyError:
-                logger.debug(f"Could not find persisted value for {widgetmd.widgetid}")
+                logger.debug("Could not find persisted value for %s", widgetmd.widgetid)
             except Exception as exc:
                 raise Exception(f"Failure working with {widgetmd.widgetid}: {exc}")
 
@@ -148,16 +192,63 @@ class Params:
             setattr(self, widgetmd.widgetid, widget)
 
     def persist(self, paramid, value):
-        """Persist a parameter value to disk
+        """Persist a parameter value
+
+        The value is saved in memory immediately, and written to disk later by flush()
         """
         if not self.persist_path:
             logger.debug(
-                f"Cannot persist {paramid} with value '{value}' because persist_path was not set")
+                "Cannot persist %s with value '%s' because persist_path was not set",
+                paramid, value)
             return
-        logger.debug(f"Persisting {paramid} with value '{value}'")
 
-        with open(self.persist_path) as ppfile:
-            persisted = yaml.load(ppfile, Loader=yaml.UnsafeLoader)
-        persisted[paramid] = value
-        with open(self.persist_path, 'w') as ppfile:
-            ppfile.write(yaml.dump(persisted))
+        with self._persist_lock:
+            if paramid in self.persisted and self.persisted[paramid] == value:
+                return
+            logger.debug("Persisting %s with value '%s'", paramid, value)
+            self.persisted[paramid] = value
+            self._dirty = True
+
+            if self.flush_delay is None:
+                flush_now = True
+            else:
+                flush_now = False
+                if self._flush_timer:
+                    self._flush_timer.cancel()
+                self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+        if flush_now:
+            self.flush()
+
+    def flush(self):
+        """Write persisted parameter values to disk, if any have changed
+
+        Writes to a temporary file and then renames it over persist_path,
+        so that the file is never left half-written.
+        The temporary file gets persist_path's permissions,
+        or those open() would give a new file, rather than mkstemp()'s 0600.
+        """
+        with self._persist_lock:
+            if self._flush_timer:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            persist_dir, persist_name = os.path.split(self.persist_path)
+            fd, temppath = tempfile.mkstemp(dir=persist_dir or '.', prefix=f"{persist_name}.")
+            try:
+                with os.fdopen(fd, 'w') as ppfile:
+                    try:
+                        mode = stat.S_IMODE(os.stat(self.persist_path).st_mode)
+                    except FileNotFoundError:
+                        mode = NEW_FILE_MODE
+                    os.chmod(temppath, mode)
+                    json.dump(self.persisted, ppfile)
+                os.replace(temppath, self.persist_path)
+            except BaseException:
+                os.unlink(temppath)
+                raise
+            self._dirty = False
+            logger.debug("Flushed persisted values to %s", self.persist_path)
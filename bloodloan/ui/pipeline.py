@@ -0,0 +1,115 @@
+"""A dependency-aware recalculation pipeline
+
+Split a big recalculation into stages with declared inputs,
+so that changing one parameter only recalculates and redisplays the stages that depend on it
+"""
+
+import logging
+
+import ipywidgets
+
+from bloodloan import profiling
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+
+class Stage:
+    """One step of a Pipeline
+
+    name        a unique name; later stages can use this stage's result as an input by this name
+    inputs      list of names of pipeline parameters and earlier stage results this stage needs
+    calculate   a function that takes the inputs as keyword arguments and returns a result;
+                if None, the result is None, and the stage only displays things
+    show        a function that displays the result;
+                it takes the result as its first argument and the inputs as keyword arguments,
+                and its output goes to the stage's ipywidgets.Output
+    """
+
+    def __init__(self, name, inputs, calculate=None, show=None):
+        self.name = name
+        self.inputs = inputs
+        self.calculate = calculate
+        self.show = show
+
+    def __str__(self):
+        return f"<Stage {self.name}: {', '.join(self.inputs)}>"
+
+
+class Pipeline:
+    """Stages that only rerun when their inputs change
+
+    stages      list of Stage objects, where each stage comes after the stages it depends on
+    outputs     dict of stage name to the ipywidgets.Output its results are displayed in;
+                the caller is responsible for placing these in the notebook
+    results     dict of stage name to its most recent result
+    runs        dict of stage name to the number of times it has run
+    profiler    a profiling.Profiler to record each stage's calculate and show times in;
+                defaults to profiling.PROFILER
+    """
+
+    def __init__(self, stages, profiler=None):
+        self.stages = stages
+        self.profiler = profiler or profiling.PROFILER
+        self.outputs = {stage.name: ipywidgets.Output() for stage in stages}
+        self.results = {}
+        self.runs = {stage.name: 0 for stage in stages}
+        self._params = {}
+
+        known = set()
+        for stage in stages:
+            if stage.name in known:
+                raise ValueError(f"Duplicate stage name {stage.name}")
+            known.add(stage.name)
+
+    def run(self, **params):
+        """Rerun every stage whose inputs have changed since the last run
+
+        params      the pipeline parameters, by name
+
+        returns     a list of the names of the stages that ran
+        """
+        with self.profiler.capture('pipeline.run'):
+            return self._run(params)
+
+    def _run(self, params):
+        changed = {
+            name for name, value in params.items()
+            if name not in self._params or self._params[name] != value}
+        values = dict(params)
+        ran = []
+
+        for stage in self.stages:
+            unknown = [name for name in stage.inputs if name not in values]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} has unknown inputs {unknown}")
+
+            if stage.name in self.results and not changed.intersection(stage.inputs):
+                values[stage.name] = self.results[stage.name]
+                continue
+
+            logger.info("Running stage %s", stage.name)
+            kwargs = {name: values[name] for name in stage.inputs}
+            try:
+                with self.profiler.span(f"{stage.name}.calculate"):
+                    result = stage.calculate(**kwargs) if stage.calculate else None
+            except Exception:
+                # Make sure we try again next time, even if the inputs are the same
+                self.results.pop(stage.name, None)
+                raise
+            self.results[stage.name] = result
+            self.runs[stage.name] += 1
+            values[stage.name] = result
+            changed.add(stage.name)
+            ran.append(stage.name)
+
+            if stage.show:
+                output = self.outputs[stage.name]
+                output.clear_output(wait=True)
+                with output, self.profiler.span(f"{stage.name}.show"):
+                    stage.show(result, **kwargs)
+
+        # Only remember the parameters once every stage has succeeded,
+        # so that if one fails, the stages after it still notice what changed next time
+        self._params = dict(params)
+        return ran
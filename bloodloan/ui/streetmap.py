@@ -2,15 +2,16 @@
 
 """Mapping functions"""
 
+import contextlib
+import functools
 import json
 import logging
+import os
+import sqlite3
+import threading
+import time
 import urllib.parse
 
-import ipyleaflet
-
-import namedtupled
-import requests
-
 
 logger = logging.getLogger(__name__)  # pylint: disable=C0103
 
@@ -24,7 +25,8 @@ class GeocodeResult():
             displayname="",
             neighborhood="Unknown",
             county="Unknown",
-            figure=None):
+            figure=None,
+            figurefactory=None):
         """Initialize
 
         coordinates     tuple containing (lat, long) coordinates
@@ -32,12 +34,27 @@ class GeocodeResult():
         neighborhood    neighborhood where the coordinates are located
         county          county where the coordinates are located
         figure          display()-able streetmap of the coordinates
+        figurefactory   a function taking no arguments that returns the figure;
+                        if figure is None, it is called the first time figure is accessed
         """
         self.coordinates = coordinates or ()
         self.displayname = displayname
         self.neighborhood = neighborhood
         self.county = county
-        self.figure = figure
+        self._figure = figure
+        self.figurefactory = figurefactory
+
+    @property
+    def figure(self):
+        """display()-able streetmap of the coordinates
+
+        Maps are widgets, which are expensive to create and send to the browser,
+        so they are not created until something asks for them
+        """
+        if self._figure is None and self.figurefactory is not None:
+            self._figure = self.figurefactory()
+            self.figurefactory = None
+        return self._figure
 
 
 class MapperInterface():
@@ -55,10 +72,25 @@ class MapperInterface():
         """
         raise NotImplementedError("NOT IMPLEMENTED")
 
+    def map(self, coordinates, zoomlevel):
+        """Return a display()-able map for coordinates"""
+        raise NotImplementedError("NOT IMPLEMENTED")
+
 
 class OpenStreetMapper(MapperInterface):
     """Retrieve mapping data from OpenStreetMap"""
 
+    def __init__(self, httpget=None):
+        """Initialize
+
+        httpget     a function like requests.get, which takes a URI and returns a response
+                    with a .json() method; tests can pass a fake to avoid the network
+        """
+        if httpget is None:
+            import requests  # pylint: disable=C0415
+            httpget = requests.get
+        self.httpget = httpget
+
     def __str__(self):
         return "OpenStreetMap"
 
@@ -68,8 +100,8 @@ class OpenStreetMapper(MapperInterface):
             "{0}",
             "?format=json&addressdetails=1&extratags=1&namedetails=1&dedupe=1"])
         uri = uritempl.format(urllib.parse.quote(address))
-        logger.debug(f"Attempting to get coordinates from URI {uri}")
-        httpresults = requests.get(uri).json()
+        logger.debug("Attempting to get coordinates from URI %s", uri)
+        httpresults = self.httpget(uri).json()
         georesults = []
         for result in httpresults:
             try:
@@ -88,13 +120,178 @@ class OpenStreetMapper(MapperInterface):
                 county = result['address']['county']
             except KeyError:
                 county = "Unknown"
-            figure = self.map(coordinates, zoomlevel)
             georesults.append(GeocodeResult(
-                coordinates, displayname, neighborhood, county, figure))
+                coordinates, displayname, neighborhood, county,
+                figurefactory=functools.partial(self.map, coordinates, zoomlevel)))
         return georesults
 
     def map(self, coordinates, zoomlevel):
         """Return a display()-able map for coordinates"""
+        # ipyleaflet is slow to import, and isn't needed until something is displayed
+        import ipyleaflet  # pylint: disable=C0415
         figure = ipyleaflet.Map(center=coordinates, zoom=zoomlevel)
         figure += ipyleaflet.Marker(location=coordinates)
         return figure
+
+
+def normalize_address(address):
+    """Normalize an address for use as a cache key
+
+    Case and runs of whitespace don't change the results of a lookup
+    """
+    return " ".join(address.lower().split())
+
+
+class GeocodeCache():
+    """A persistent cache of geocode results, stored in SQLite
+
+    Results are stored without their figures, which can't be saved,
+    so whoever retrieves them must make new figures.
+    """
+
+    def __init__(self, path, ttl=30 * 24 * 60 * 60, emptyttl=60 * 60, maxentries=1000):
+        """Initialize
+
+        path        path to the SQLite database file, which is created if it doesn't exist
+        ttl         seconds after which a cached result expires
+        emptyttl    seconds after which a lookup that found nothing expires;
+                    shorter than ttl, so that an address the backend didn't know yet,
+                    or a failed lookup, is retried soon
+        maxentries  maximum number of addresses to keep;
+                    when there are too many, the least recently used are evicted
+        """
+        self.path = path
+        self.ttl = ttl
+        self.emptyttl = emptyttl
+        self.maxentries = maxentries
+        self.hits = 0
+        self.misses = 0
+        # Access times of cache hits, keyed by (backend, address);
+        # reads don't write to the database, so these are saved by the next put()
+        self._accessed = {}
+        # Geocoding happens in DelayedExecutor threads, so guard the counters and _accessed
+        self._lock = threading.Lock()
+        persist_dir, _ = os.path.split(self.path)
+        os.makedirs(persist_dir or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS geocodes (
+                    backend TEXT NOT NULL,
+                    address TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL,
+                    PRIMARY KEY (backend, address))""")
+
+    def __str__(self):
+        return f"<GeocodeCache: {self.path}, {self.hits} hits, {self.misses} misses>"
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open a connection, commit when done, and close it
+
+        Geocoding happens in a DelayedExecutor thread, so use a new connection for every call
+        rather than sharing one across threads
+        """
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, backend, address):
+        """Return cached geocode results as a list of dicts, or None if there are none
+
+        backend     name of the mapping backend the results came from
+        address     the address that was looked up
+
+        Only reads the database; expired results are ignored here and deleted by put()
+        """
+        now = time.time()
+        key = (backend, normalize_address(address))
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT results, created FROM geocodes WHERE backend = ? AND address = ?",
+                key).fetchone()
+        results = None if row is None else json.loads(row[0])
+        with self._lock:
+            if results is None or row[1] < now - (self.ttl if results else self.emptyttl):
+                self.misses += 1
+                return None
+            self._accessed[key] = now
+            self.hits += 1
+        return results
+
+    def put(self, backend, address, results):
+        """Cache geocode results
+
+        backend     name of the mapping backend the results came from
+        address     the address that was looked up
+        results     a list of JSON-serializable dicts
+
+        Also saves the access times of hits since the last put(),
+        deletes expired results, and evicts the least recently used beyond maxentries
+        """
+        now = time.time()
+        with self._lock:
+            accessed, self._accessed = self._accessed, {}
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE geocodes SET accessed = ? WHERE backend = ? AND address = ?",
+                [(when,) + key for key, when in accessed.items()])
+            conn.execute(
+                "DELETE FROM geocodes WHERE created < ? OR (results = '[]' AND created < ?)",
+                (now - self.ttl, now - self.emptyttl))
+            conn.execute(
+                "INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?)",
+                (backend, normalize_address(address), json.dumps(results), now, now))
+            conn.execute(
+                """DELETE FROM geocodes WHERE rowid NOT IN (
+                    SELECT rowid FROM geocodes ORDER BY accessed DESC LIMIT ?)""",
+                (self.maxentries,))
+
+
+class CachingMapper(MapperInterface):
+    """Wrap another mapper, caching its geocode results in a GeocodeCache"""
+
+    def __init__(self, mapper, cache):
+        """Initialize
+
+        mapper      the MapperInterface to look up addresses that aren't cached
+        cache       a GeocodeCache
+        """
+        self.mapper = mapper
+        self.cache = cache
+
+    def __str__(self):
+        return f"{self.mapper} (cached)"
+
+    def geocode(self, address, zoomlevel=14):
+        backend = str(self.mapper)
+        cached = self.cache.get(backend, address)
+        if cached is not None:
+            logger.debug("Using cached geocode for %s", address)
+            return [
+                GeocodeResult(
+                    tuple(result['coordinates']),
+                    result['displayname'],
+                    result['neighborhood'],
+                    result['county'],
+                    figurefactory=functools.partial(
+                        self.map, tuple(result['coordinates']), zoomlevel))
+                for result in cached]
+
+        georesults = self.mapper.geocode(address, zoomlevel)
+        self.cache.put(backend, address, [
+            {
+                'coordinates': list(result.coordinates),
+                'displayname': result.displayname,
+                'neighborhood': result.neighborhood,
+                'county': result.county,
+            }
+            for result in georesults])
+        return georesults
+
+    def map(self, coordinates, zoomlevel):
+        return self.mapper.map(coordinates, zoomlevel)
@@ -3,19 +3,37 @@
 
 import os
 
-from mako.template import Template
-
 
 SCRIPTDIR = os.path.dirname(os.path.realpath(__file__))
 TEMPL = os.path.join(SCRIPTDIR, 'templ')
 
 
+class LazyTemplate:
+    """A Mako template that is not compiled until the first time it is used
+
+    filename    the template's filename, relative to the TEMPL directory
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.template = None
+
+    def __get__(self, instance, owner):
+        if self.template is None:
+            from mako.template import Template  # pylint: disable=C0415
+            self.template = Template(filename=os.path.join(TEMPL, self.filename))
+        return self.template
+
+
 class Templ:
     """A list of templates
+
+    Each is compiled the first time it is accessed, not when this module is imported
     """
 
-    Close = Template(filename=os.path.join(TEMPL, 'close.mako'))
-    SchedulePreface = Template(filename=os.path.join(TEMPL, 'schedule_preface.mako'))
-    Schedule = Template(filename=os.path.join(TEMPL, 'schedule.mako'))
-    MonthlyCosts = Template(filename=os.path.join(TEMPL, 'monthlycosts.mako'))
-    Instructions = Template(filename=os.path.join(TEMPL, 'instructions.mako'))
+    Close = LazyTemplate('close.mako')
+    SchedulePreface = LazyTemplate('schedule_preface.mako')
+    Schedule = LazyTemplate('schedule.mako')
+    MonthlyCosts = LazyTemplate('monthlycosts.mako')
+    Investment = LazyTemplate('investment.mako')
+    Instructions = LazyTemplate('instructions.mako')
@@ -0,0 +1,75 @@
+<%page args="investment, unavailable, payoffmonths" />
+
+<%!
+from bloodloan.mortgage.mmath import MONTHS_IN_YEAR
+from bloodloan.ui.uiutil import dollar, percent
+%>
+
+<%def name="rate(value)">${percent(value) if value == value else "n/a"}</%def>
+
+<h3>Investment metrics</h3>
+
+<p>
+    Net operating income is rent minus other costs, before mortgage payments.
+    Cash flow is net operating income minus regular mortgage payments.
+</p>
+
+<table>
+
+<tr>
+    <th colspan="2">In the first year</th>
+</tr>
+<tr>
+    <td>Cash paid at closing</td>
+    <td><span>${dollar(investment.invested)}</span></td>
+</tr>
+<tr>
+    <td>Net operating income</td>
+    <td><span>${dollar(investment.noi)}</span></td>
+</tr>
+<tr>
+    <td>Cash flow</td>
+    <td><span>${dollar(investment.cashflow)}</span></td>
+</tr>
+<tr>
+    <td>Cap rate (net operating income over sale price)</td>
+    <td>${rate(investment.caprate)}</td>
+</tr>
+<tr>
+    <td>Cash-on-cash return (cash flow over cash paid at closing)</td>
+    <td>${rate(investment.cashoncash)}</td>
+</tr>
+<tr>
+    <td>Debt service coverage ratio (net operating income over mortgage payments)</td>
+    <td>${f"{investment.dscr:.2f}" if investment.dscr == investment.dscr else "n/a"}</td>
+</tr>
+
+</table>
+
+<p>
+    If the property is sold after some years for its value, minus the remaining principal:
+</p>
+
+<table>
+
+<tr>
+    <th>Years held</th>
+    <th>Internal rate of return</th>
+    <th>Net present value at ${percent(investment.discountrate)}</th>
+</tr>
+
+%for months, irr, npv in investment.rows():
+    <tr>
+        <td>${f"{months / MONTHS_IN_YEAR:g}"}</td>
+        <td>${rate(irr)}</td>
+        <td><span>${dollar(npv)}</span></td>
+    </tr>
+%endfor
+%for years in unavailable:
+    <tr>
+        <td>${years}</td>
+        <td colspan="2">n/a: the loan is paid off after ${payoffmonths} months</td>
+    </tr>
+%endfor
+
+</table>
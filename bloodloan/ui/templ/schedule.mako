@@ -1,7 +1,7 @@
-<%page args="principal, value, loanpayments, paymentinterval_name" />
+<%page args="principal, value, loanpayments, paymentinterval_name, showinitial=True" />
 
 <%!
-from bloodloan.ui.uiutil import dollar
+from bloodloan.ui.uiutil import dollar, schedule_rows
 %>
 
 <table>
@@ -20,33 +20,27 @@ from bloodloan.ui.uiutil import dollar
     <th>Total interest paid</th>
 </tr>
 
-<tr>
-    <td>Initial loan amount</td>
-    <td></td>
-    <td></td>
-    <td></td>
-    <td></td>
-    <td></td>
-    <td></td>
-    <td>${dollar(principal)}</td>
-    <td>${dollar(value)}</td>
-    <td>${dollar(0)}</td>
-    <td>${dollar(0)}</td>
-</tr>
+%if showinitial:
+    <tr>
+        <td>Initial loan amount</td>
+        <td></td>
+        <td></td>
+        <td></td>
+        <td></td>
+        <td></td>
+        <td></td>
+        <td>${dollar(principal)}</td>
+        <td>${dollar(value)}</td>
+        <td>${dollar(0)}</td>
+        <td>${dollar(0)}</td>
+    </tr>
+%endif
 
-%for payment in loanpayments:
+%for row in schedule_rows(loanpayments):
     <tr>
-        <td>${payment.index + 1}</td>
-        <td>${dollar(payment.regularpmt)}</td>
-        <td>${dollar(payment.totalpmt)}</td>
-        <td>${dollar(payment.interestpmt)}</td>
-        <td>${dollar(payment.balancepmt)}</td>
-        <td>${dollar(payment.overpmt)}</td>
-        <td>${dollar(payment.totalothercosts)}</td>
-        <td>${dollar(payment.principal)}</td>
-        <td>${dollar(payment.value)}</td>
-        <td>${dollar(payment.equity)}</td>
-        <td>${dollar(payment.totalinterest)}</td>
+        %for cell in row:
+            <td>${cell}</td>
+        %endfor
     </tr>
 %endfor
 
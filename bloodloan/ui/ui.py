@@ -11,19 +11,26 @@ from IPython.display import (
 )
 import ipywidgets
 
+from bloodloan import profiling
 from bloodloan import util
-from bloodloan.mortgage import closing
 from bloodloan.mortgage import costconfig
+from bloodloan.mortgage import memo
+from bloodloan.mortgage import metrics
 from bloodloan.mortgage import mmath
 from bloodloan.mortgage import schedule
 from bloodloan.ui import streetmap
 from bloodloan.ui.parameters import Params, ParameterIds
+from bloodloan.ui.pipeline import Pipeline, Stage
 from bloodloan.ui.templ import Templ
 
 
 logger = logging.getLogger(__name__)  # pylint: disable=C0103
 
 
+# Years after which to show investment metrics for selling the property
+INVESTMENT_HOLD_YEARS = (1, 3, 5, 10, 15, 20, 30)
+
+
 def getlogconfig(
         notebookdir,
         logfile='log.txt',
@@ -31,7 +38,9 @@ def getlogconfig(
         datefmt='%Y%m%d-%H%M%S',
         maxbytes=10 * 1024 * 1024,  # 10MB
         backupcount=1,
-        level='DEBUG'):
+        level='INFO',
+        background=True,
+        permonth_every=0):
     """Get the bloodloan logging configuration
 
     notebookdir     the location of the Jupyter notebook
@@ -41,10 +50,18 @@ def getlogconfig(
     maxbytes        maximum size of each log file
     backupcount     number of backups to make; cannot be zero or log will grow forever
     level           a valid log level
+    background      write the log file from a background thread,
+                    so that recalculating never waits on the disk
+    permonth_every  log messages repeated for every month of a schedule,
+                    keeping only one in this many; 0, the default, leaves them off
 
     returns         a dict that can be passed to logging.config.dictConfig
     """
 
+    handler_class = 'logging.handlers.RotatingFileHandler'
+    if background:
+        handler_class = 'bloodloan.logs.QueuedRotatingFileHandler'
+
     return {
         'version': 1,
         'disable_existing_loggers': False,
@@ -52,9 +69,17 @@ def getlogconfig(
             'format': fmt,
             'datefmt': datefmt,
         }},
+        'filters': {'mort_permonth_filter': {
+            '()': 'bloodloan.logs.SampleFilter',
+            'every': permonth_every,
+        }},
+        'loggers': {'bloodloan.mortgage.schedule.months': {
+            'level': 'DEBUG' if permonth_every else 'WARNING',
+            'filters': ['mort_permonth_filter'],
+        }},
         'handlers': {
             'mort_file_handler': {
-                'class': 'logging.handlers.RotatingFileHandler',
+                'class': handler_class,
                 'formatter': 'mort_formatter',
                 'filename': os.path.join(notebookdir, logfile),
                 'maxBytes': maxbytes,
@@ -116,79 +141,83 @@ def toggleinputcells():
         '''))
 
 
-def wrap_close(saleprice, interestrate, loanterm, propertytaxes, closingcosts):
-    """Show loan amounts and closing costs"""
-    monthterm = loanterm * mmath.MONTHS_IN_YEAR
-    result = closing.close(saleprice, interestrate, monthterm, propertytaxes, closingcosts)
-    display(HTML(Templ.Close.render(closeresult=result)))
+def calculate_close(saleprice, interestrate, years, propertytaxes, costs):
+    """Calculate loan amounts and closing costs
 
-    return result
+    costs           a costconfig.CostConfigurationCollection
+    """
+    monthterm = years * mmath.MONTHS_IN_YEAR
+    return memo.close(saleprice, interestrate, monthterm, propertytaxes, costs)
 
 
-def wrap_schedule(
+def wrap_close(closed, **_):
+    """Show loan amounts and closing costs"""
+    with profiling.span('render.Close'):
+        html = Templ.Close.render(closeresult=closed)
+    display(HTML(html))
+
+
+def calculate_schedules(
         interestrate,
-        value,
-        principal,
         saleprice,
+        closed,
         years,
         overpayment,
         appreciation,
-        monthlycosts,
+        costs,
         rent):
-    """Show a loan's mortgage schedule in a Jupyter notebook"""
+    """Calculate a loan's mortgage schedule
 
+    costs           a costconfig.CostConfigurationCollection
+
+    returns         a tuple of (summary, summary_no_over) schedule.ScheduleSummary objects;
+                    the first has the monthly schedule as its frame
+    """
     term = years * mmath.MONTHS_IN_YEAR
     overpayments = [overpayment for _ in range(term)]
 
-    # Calculate the monthly payments for the mortgage schedule detail,
-    # yearly payments for the mortgage schedule summary
-    # and monthly payments with no overpayments for comparative analysis in prefacetempl
-    months = [month for month in schedule.schedule(
-        interestrate, value, principal, saleprice, term,
-        overpayments=overpayments, appreciation=appreciation, monthlycosts=monthlycosts,
-        monthlyrent=rent)]
-    months_no_over = [month for month in schedule.schedule(
-        interestrate, value, principal, saleprice, term,
-        overpayments=None, appreciation=appreciation,
-        monthlyrent=rent)]
-    years = [year for year in schedule.monthly2yearly_schedule(months)]
-
-    # Display a preface / summary first
-    display(HTML(Templ.SchedulePreface.render(
-        interestrate=interestrate,
-        principal=principal,
-        term=term,
-        overpayment=overpayment,
-        appreciation=appreciation,
-        monthlypayments=months,
-        monthlypayments_no_over=months_no_over)))
-
-    # Create new Output objects, and call display(HTML(...)) in them
-    # We do this because IPython.display.HTML() has nicer talbles
-    # than ipywidgets.HTML(), but only ipywidgets-type widgets can be put
-    # into an Accordion.
-    summaryout = ipywidgets.Output()
-    detailout = ipywidgets.Output()
-    with summaryout:
-        display(HTML(Templ.Schedule.render(
-            principal=principal,
-            value=value,
-            loanpayments=years,
-            paymentinterval_name="Year")))
-    with detailout:
-        display(HTML(Templ.Schedule.render(
-            principal=principal,
-            value=value,
-            loanpayments=months,
-            paymentinterval_name="Month")))
-
-    parentwidg = ipywidgets.Accordion()
-    parentwidg.children = [summaryout, detailout]
-    parentwidg.set_title(0, 'Yearly summary')
-    parentwidg.set_title(1, 'Monthly detail')
-    display(parentwidg)
-
-    return months
+    # TODO: currently assuming sale price is value; allow changing to something else
+    summary, = memo.amortize_tracks(
+        interestrate, saleprice, closed.principal_total, saleprice, term, [overpayments],
+        appreciation=appreciation, costs=costs, monthlyrent=rent)
+
+    # For comparative analysis in prefacetempl, we only need the length and total interest
+    # of a schedule with no overpayments, which has a closed form
+    summary_no_over = schedule.summarize(interestrate, closed.principal_total, term)
+    return summary, summary_no_over
+
+
+def wrap_schedule_preface(schedules, interestrate, closed, years, overpayment, appreciation, **_):
+    """Show a summary of a loan's mortgage schedule"""
+    summary, summary_no_over = schedules
+    with profiling.span('render.SchedulePreface'):
+        html = Templ.SchedulePreface.render(
+            interestrate=interestrate,
+            principal=closed.principal_total,
+            term=years * mmath.MONTHS_IN_YEAR,
+            overpayment=overpayment,
+            appreciation=appreciation,
+            summary=summary,
+            summary_no_over=summary_no_over)
+    display(HTML(html))
+
+
+def wrap_schedule(loanpayments, paymentinterval_name, closed, saleprice, showinitial=True, **_):
+    """Show a loan's mortgage schedule in a Jupyter notebook
+
+    loanpayments            the schedule, as LoanPayment objects or a frame.ScheduleFrame
+    paymentinterval_name    name of the interval between payments, like "Month"
+    showinitial             whether to show the initial loan amount before the payments,
+                            which should only be done on the first page of a schedule
+    """
+    with profiling.span('render.Schedule', rows=len(loanpayments)):
+        html = Templ.Schedule.render(
+            principal=closed.principal_total,
+            value=saleprice,
+            loanpayments=loanpayments,
+            paymentinterval_name=paymentinterval_name,
+            showinitial=showinitial)
+    display(HTML(html))
 
 
 def wrap_monthly_expense_breakdown(costs, rent, mortgagepmt):
@@ -198,7 +227,39 @@ def wrap_monthly_expense_breakdown(costs, rent, mortgagepmt):
     rent            projected monthly rent
     mortgagepmt     regular mortgage payment amount
     """
-    display(HTML(Templ.MonthlyCosts.render(costs=costs, rent=rent, mortgagepmt=mortgagepmt)))
+    with profiling.span('render.MonthlyCosts'):
+        html = Templ.MonthlyCosts.render(costs=costs, rent=rent, mortgagepmt=mortgagepmt)
+    display(HTML(html))
+
+
+def calculate_investment(schedules, closed, saleprice):
+    """Calculate investment metrics for selling after each of INVESTMENT_HOLD_YEARS
+
+    Only holds within the schedule are calculated; wrap_investment() lists the others
+
+    returns     a metrics.InvestmentMetrics
+    """
+    frame = schedules[0].frame
+    holds = [
+        years * mmath.MONTHS_IN_YEAR for years in INVESTMENT_HOLD_YEARS
+        if years * mmath.MONTHS_IN_YEAR <= len(frame)]
+    return metrics.evaluate(
+        frame, closed.downpayment_total, closed.fees_total, saleprice, holds=holds or None)
+
+
+def wrap_investment(investment, schedules, **_):
+    """Show investment metrics
+
+    Holds longer than the schedule can't be calculated,
+    so they are listed as unavailable instead of being left out
+    """
+    nmonths = len(schedules[0].frame)
+    unavailable = [
+        years for years in INVESTMENT_HOLD_YEARS if years * mmath.MONTHS_IN_YEAR > nmonths]
+    with profiling.span('render.Investment'):
+        html = Templ.Investment.render(
+            investment=investment, unavailable=unavailable, payoffmonths=nmonths)
+    display(HTML(html))
 
 
 def get_displayable_geocode(geocode, title):
@@ -238,19 +299,25 @@ def get_displayable_geocode(geocode, title):
         info_row("Longitude", geocode.coordinates[1]))
 
     result.display(property_info)
-    result.display(geocode.figure)
+    with profiling.span('widgets.map'):
+        result.display(geocode.figure)
 
     return result
 
 
-def wrap_streetmap(address):
-    """Show street maps and property information"""
+def wrap_streetmap(address, mapper, maxmaps=3):
+    """Show street maps and property information
+
+    address     the address to look up
+    mapper      a streetmap.MapperInterface
+    maxmaps     show at most this many results at first;
+                the rest are behind a button, and their maps aren't created until it is clicked
+    """
 
-    logger.debug("Instantiating mapper...")
-    mapper = streetmap.OpenStreetMapper()
     logger.debug("Getting geocode...")
-    geocodes = mapper.geocode(address)
-    logger.debug(f"Got geocode: {geocodes}")
+    with profiling.span('geocode'):
+        geocodes = mapper.geocode(address)
+    logger.debug("Got geocode: %s", geocodes)
 
     result = util.OutputChildren()
     result.display(util.html_hbox(f"Using {mapper} for maps", "info"))
@@ -263,16 +330,128 @@ def wrap_streetmap(address):
         result.display(
             util.html_hbox(f"{len(geocodes)} matches returned for {address}", "warning"))
 
-    for idx, geocode in enumerate(geocodes):
-        if len(geocodes) != 1:
-            maptitle = f"Property {idx + 1}</h3>"
-        else:
-            maptitle = "Property information"
-        result += get_displayable_geocode(geocode, maptitle)
+    def displayable_geocodes(start, end):
+        """Return an OutputChildren for the results from geocodes[start:end]"""
+        displayable = util.OutputChildren()
+        for idx in range(start, end):
+            if len(geocodes) != 1:
+                maptitle = f"Property {idx + 1}"
+            else:
+                maptitle = "Property information"
+            displayable += get_displayable_geocode(geocodes[idx], maptitle)
+        return displayable
+
+    result += displayable_geocodes(0, min(maxmaps, len(geocodes)))
+
+    if len(geocodes) > maxmaps:
+        more = ipywidgets.VBox()
+        button = ipywidgets.Button(description=f"Show {len(geocodes) - maxmaps} more results")
+
+        def show_more(_):
+            more.children = displayable_geocodes(maxmaps, len(geocodes)).tuple()
+
+        button.on_click(show_more)
+        more.children = (button,)
+        result.append(more)
 
     return result
 
 
+def propertyinfo_pipeline(cost_configs, street_map_executor, mapper):
+    """Build the pipeline of stages that calculate and show information about a property
+
+    cost_configs            a costconfig.CostConfigurationCollection of all cost configs
+    street_map_executor     a util.DelayedExecutor for looking up addresses
+    mapper                  a streetmap.MapperInterface for looking up addresses
+
+    returns                 (pipeline, container), where container is a widget
+                            with each stage's output in place, ready to display
+    """
+
+    def show_streetmap(_, address):
+        if not address:
+            logger.debug("No address to map")
+            return
+        logger.debug("Mapping address of %s", address)
+        streetmap_container = ipywidgets.Box()
+        logger.debug("Running the street map executor...")
+        street_map_executor.run(
+            streetmap_container,
+            "Loading maps...",
+            wrap_streetmap,
+            action_args=(address, mapper))
+        display(streetmap_container)
+
+    # There can be hundreds of months, so only render the monthly detail
+    # when its Accordion pane is opened, and then only a page at a time
+    monthly_pager = util.PagedOutput(pagesize=10 * mmath.MONTHS_IN_YEAR)
+
+    def show_months(months, closed, saleprice, **_):
+        monthly_pager.update(months, lambda page, start: wrap_schedule(
+            page, "Month", closed, saleprice, showinitial=start == 0))
+
+    stages = [
+        Stage(
+            'costs', ['selected_cost_configs', 'cost_config_generation'],
+            calculate=lambda selected_cost_configs, **_: cost_configs.get(
+                selected_cost_configs)),
+        Stage(
+            'closed', ['saleprice', 'interestrate', 'years', 'propertytaxes', 'costs'],
+            calculate=calculate_close, show=wrap_close),
+        Stage(
+            'schedules', [
+                'interestrate', 'saleprice', 'closed', 'years', 'overpayment', 'appreciation',
+                'costs', 'rent'],
+            calculate=calculate_schedules, show=wrap_schedule_preface),
+        Stage(
+            'months', ['schedules', 'closed', 'saleprice'],
+            calculate=lambda schedules, **_: schedules[0].frame,
+            show=show_months),
+        Stage(
+            'years', ['months', 'closed', 'saleprice'],
+            calculate=lambda months, **_: months.rollup(mmath.MONTHS_IN_YEAR),
+            show=lambda years, **kwargs: wrap_schedule(years, "Year", **kwargs)),
+        Stage(
+            'expenses', ['months', 'rent'],
+            show=lambda _, months, rent: wrap_monthly_expense_breakdown(
+                months[0].othercosts, rent, months[0].regularpmt)),
+        Stage(
+            'investment', ['schedules', 'closed', 'saleprice'],
+            calculate=calculate_investment, show=wrap_investment),
+        Stage('streetmap', ['address'], show=show_streetmap),
+    ]
+    pipeline = Pipeline(stages)
+
+    # The schedule tables go in an Accordion.
+    # We display(HTML(...)) in Output widgets because IPython.display.HTML() has nicer tables
+    # than ipywidgets.HTML(), but only ipywidgets-type widgets can be put into an Accordion.
+    # The months stage renders its pages into monthly_pager,
+    # so its own output only shows anything if paging the schedule fails.
+    accordion = ipywidgets.Accordion()
+    accordion.children = [
+        pipeline.outputs['years'],
+        ipywidgets.VBox(children=[pipeline.outputs['months'], monthly_pager.widget])]
+    accordion.set_title(0, 'Yearly summary')
+    accordion.set_title(1, 'Monthly detail')
+
+    def on_accordion_select(change):
+        if change['new'] == 1:
+            monthly_pager.show()
+
+    accordion.observe(on_accordion_select, names='selected_index')
+
+    container = ipywidgets.VBox(children=[
+        pipeline.outputs['closed'],
+        pipeline.outputs['schedules'],
+        accordion,
+        pipeline.outputs['expenses'],
+        pipeline.outputs['investment'],
+        pipeline.outputs['streetmap'],
+    ])
+
+    return pipeline, container
+
+
 def propertyinfo(
 
         # Notebook parameters:
@@ -287,11 +466,20 @@ def propertyinfo(
         selected_cost_configs,
 
         # Other data passing:
-        cost_configs,
         parameters,
-        street_map_executor,
+        pipeline,
+        cost_configs,
+        watch_configs,
         ):
-    """Gather information about a property"""
+    """Gather information about a property
+
+    Only the stages of the pipeline that depend on a changed parameter are recalculated.
+    With watch_configs, cost config files that changed are reparsed first,
+    and the stages that depend on them are recalculated too.
+    """
+
+    if watch_configs:
+        cost_configs.reload()
 
     parameters.persist(ParameterIds.INTEREST_RATE, interestrate)
     parameters.persist(ParameterIds.SALE_PRICE, saleprice)
@@ -305,50 +493,62 @@ def propertyinfo(
 
     logger.info("Recalculating...")
 
-    interestrate = mmath.percent2decimal(interestrate)
-    appreciation = mmath.percent2decimal(appreciation)
-
-    # TODO: split out display and calculation
-    #       We're getting values like the 'closed' and 'months' variables from functions that
-    #       also display data to the end user;
-    #       instead, we should calculated them all at once and then display the results
-
-    costs = cost_configs.get(selected_cost_configs)
-    logger.info(costs)
-    closed = wrap_close(saleprice, interestrate, years, propertytaxes, costs.closing)
-
-    # TODO: currently assuming sale price is value; allow changing to something else
-    months = wrap_schedule(
-        interestrate, saleprice, closed.principal_total, saleprice, years, overpayment,
-        appreciation, costs.monthly, rent)
-
-    wrap_monthly_expense_breakdown(months[0].othercosts, rent, months[0].regularpmt)
-
-    if address:
-        logger.debug(f"Mapping address of {address}")
-        streetmap_container = ipywidgets.Box()
-        logger.debug("Running the street map executor...")
-        street_map_executor.run(
-            streetmap_container,
-            "Loading maps...",
-            wrap_streetmap,
-            action_args=(address,))
-        display(streetmap_container)
-    else:
-        logger.debug("No address to map")
-
+    ran = pipeline.run(
+        interestrate=mmath.percent2decimal(interestrate),
+        saleprice=saleprice,
+        rent=rent,
+        years=years,
+        overpayment=overpayment,
+        appreciation=mmath.percent2decimal(appreciation),
+        propertytaxes=propertytaxes,
+        address=address,
+        selected_cost_configs=selected_cost_configs,
+        cost_config_generation=cost_configs.generation)
+
+    logger.info("Recalculated stages: %s", ran)
+
+    labels = cost_configs.labels
+    if labels != tuple(parameters.costs.options):
+        # Setting options clears the selection, so put back what is still available.
+        # If that changes the selection, this function runs again to recalculate.
+        selected = parameters.costs.value
+        with parameters.costs.hold_trait_notifications():
+            parameters.costs.options = labels
+            parameters.costs.value = tuple(label for label in selected if label in labels)
+    # Building the table isn't free, so only do it if it will be logged
+    if pipeline.profiler.enabled and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Timing so far:\n%s", pipeline.profiler.table())
+
+
+def main(worksheetdir, profile=False, cprofile=False, memory=False, watch_configs=False):
+    """Gather information about a property using Jupyter UI elements
+
+    worksheetdir    the location of the Jupyter notebook
+    profile         record the time each stage takes in profiling.PROFILER,
+                    and log a summary table after each recalculation
+    cprofile        with profile, also capture a cProfile report of each recalculation
+    memory          with profile, also capture a tracemalloc report of each recalculation
+    watch_configs   before each recalculation, reparse any files in the configs directory
+                    that changed, so cost configs can be edited while the kernel is running
+    """
 
-def main(worksheetdir):
-    """Gather information about a property using Jupyter UI elements"""
+    if profile:
+        profiling.PROFILER.enable(cprofile=cprofile, tracemalloc=memory)
 
     display(HTML(Templ.Instructions.render()))
 
     costconfigs = costconfig.CostConfigurationCollection(
-        directory=os.path.join(worksheetdir, 'configs'))
+        directory=os.path.join(worksheetdir, 'configs'),
+        cache=costconfig.ConfigFileCache(os.path.join(worksheetdir, '.config_cache.pickle')))
     params = Params(
         persist_path=os.path.join(worksheetdir, '.param_persist'),
-        cost_config_names=[config.label for config in costconfigs.configs])
+        cost_config_names=costconfigs.labels)
     street_map_executor = util.DelayedExecutor()
+    mapper = streetmap.CachingMapper(
+        streetmap.OpenStreetMapper(),
+        streetmap.GeocodeCache(os.path.join(worksheetdir, '.geocode_cache.sqlite')))
+    pipeline, pipeline_container = propertyinfo_pipeline(
+        costconfigs, street_map_executor, mapper)
 
     # WARNING: DISABLING ERRORS FOR 'Instance of <class> has no <member> member'
     # FOR REMAINDER OF FILE!
@@ -369,9 +569,12 @@ def main(worksheetdir):
         'selected_cost_configs': params.costs,
 
         # Other data passing (must be fixed)
-        'cost_configs': ipywidgets.fixed(costconfigs),
         'parameters': ipywidgets.fixed(params),
-        'street_map_executor': ipywidgets.fixed(street_map_executor),
+        'pipeline': ipywidgets.fixed(pipeline),
+        'cost_configs': ipywidgets.fixed(costconfigs),
+        'watch_configs': ipywidgets.fixed(watch_configs),
     })
 
-    display(params.params_box, output)
+    # The pipeline updates its own outputs in place,
+    # so output only shows anything if propertyinfo() raises an exception
+    display(params.params_box, output, pipeline_container)
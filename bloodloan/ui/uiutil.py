@@ -7,31 +7,46 @@
 #       and templ.py has a template which uses ui.dollar(),
 #       we get a runtime error.
 
-from bloodloan.mortgage import mmath
-
-
-def dollar(amount):
-    """Return a string dollar amount from a float
-
-    For example, dollar(1926.2311831442486) => "$1,926.23"
-
-    We aren't too concerned about the lost accuracy;
-    this function should only be used for *display* values
-
-    NOTE: I'm not sure why, but I often find that if I don't wrap a dollar()
-    call in <span> tags, Jupyter does something really fucked up to my text
-    """
-    return '${:,.2f}'.format(amount)
-
-
-def percent(decimal):
-    """Return a string percentage from a float
-
-    For example, percent(0.0320) => 3.2000%
-
-    The result is rounded to four decimal places (of the *return* value).
-
-    This function *loses precision* (and returns a string),
-    so it should only be relied upon to *display* a percentage value.
+# The formatting functions themselves live in the calculation core,
+# so that it doesn't have to import anything from the UI
+from bloodloan.mortgage.formatting import (  # pylint: disable=W0611
+    dollar,
+    dollars,
+    percent,
+    percents,
+    pylist,
+)
+
+
+# The LoanPayment properties shown as columns in a schedule, in order
+SCHEDULE_COLUMNS = (
+    'regularpmt',
+    'totalpmt',
+    'interestpmt',
+    'balancepmt',
+    'overpmt',
+    'totalothercosts',
+    'principal',
+    'value',
+    'equity',
+    'totalinterest',
+)
+
+
+def schedule_rows(loanpayments):
+    """Format a schedule for display, a whole column at a time
+
+    loanpayments    a frame.ScheduleFrame, or an iterable of LoanPayment objects
+
+    returns         a list with a tuple of strings for each payment:
+                    the payment number, counting from 1, then each of SCHEDULE_COLUMNS
     """
-    return '{:.4f}%'.format(mmath.decimal2percent(decimal))
+    columns = getattr(loanpayments, 'columns', None)
+    if columns is None:
+        # Read each payment once, even if loanpayments is a generator
+        loanpayments = list(loanpayments)
+        columns = {
+            name: [getattr(payment, name) for payment in loanpayments]
+            for name in ('index',) + SCHEDULE_COLUMNS}
+    numbers = [str(index + 1) for index in pylist(columns['index'])]
+    return list(zip(numbers, *(dollars(columns[name]) for name in SCHEDULE_COLUMNS)))
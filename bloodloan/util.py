@@ -106,7 +106,7 @@ class DelayedExecutor():
                 logger.info("Stop event did not fire - calling action()")
                 self.container.children = ()
                 result = action(*action_args, **action_kwargs)
-                logger.info(f"Got {len(result)} children to display in thread output container")
+                logger.info("Got %s children to display in thread output container", len(result))
                 self.container.children = result
                 self.stopevent.set() # Stop the loop
                 logger.info("Sent stop event from within timer() - all done")
@@ -129,6 +129,78 @@ class OutputChildren(list):
         return tuple(self)
 
 
+class PagedOutput():
+    """Display a long list of rows one page at a time, and only once it has been shown
+
+    Useful for e.g. a big table inside an Accordion pane that may never be opened:
+    nothing is rendered until show() is called, and then only one page of rows at a time.
+
+    widget      an ipywidgets.VBox containing page controls and the output,
+                which the caller is responsible for displaying
+    """
+
+    def __init__(self, pagesize=120):
+        self.pagesize = pagesize
+        self.rows = []
+        self.render = None
+        self.page = 0
+        self.shown = False
+        self.drawn = None
+
+        self.output = ipywidgets.Output()
+        self.label = ipywidgets.Label()
+        self.prevbutton = ipywidgets.Button(description="Previous")
+        self.nextbutton = ipywidgets.Button(description="Next")
+        self.prevbutton.on_click(lambda _: self.turn(-1))
+        self.nextbutton.on_click(lambda _: self.turn(1))
+        self.widget = ipywidgets.VBox(children=(
+            ipywidgets.HBox(children=(self.prevbutton, self.label, self.nextbutton)),
+            self.output))
+
+    @property
+    def pages(self):
+        """Number of pages"""
+        return max(1, -(-len(self.rows) // self.pagesize))
+
+    def update(self, rows, render):
+        """Replace the rows, and go back to the first page
+
+        rows        a sequence of rows that supports slicing
+        render      a function that displays a page of rows;
+                    it takes a slice of rows and the index of the first row in the slice
+        """
+        self.rows = rows
+        self.render = render
+        self.page = 0
+        self.drawn = None
+        if self.shown:
+            self.draw()
+
+    def show(self):
+        """Render the current page, if it has not been rendered already"""
+        self.shown = True
+        self.draw()
+
+    def turn(self, pages):
+        """Move forward or backward some number of pages"""
+        self.page = min(max(self.page + pages, 0), self.pages - 1)
+        self.draw()
+
+    def draw(self):
+        """Render the current page"""
+        if self.render is None or self.drawn == self.page:
+            return
+        start = self.page * self.pagesize
+        end = min(start + self.pagesize, len(self.rows))
+        self.label.value = f"Rows {start + 1}-{end} of {len(self.rows)}"
+        self.prevbutton.disabled = self.page == 0
+        self.nextbutton.disabled = self.page == self.pages - 1
+        self.output.clear_output(wait=True)
+        with self.output:
+            self.render(self.rows[start:end], start)
+        self.drawn = self.page
+
+
 def html_hbox(text, style):
     """Create a styled HBox from a string containing HTML
 
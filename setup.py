@@ -1,10 +1,10 @@
 #!/usr/bin/env python3
 
-import distutils.core
+import setuptools
 
 VERSION = '0.0.1-devel'
 
-distutils.core.setup(
+setuptools.setup(
     name='bloodloan',
     version=VERSION,
     description='Mortgage calculation backend for a Jupyter Notebook',
@@ -27,5 +27,11 @@ distutils.core.setup(
         'Topic :: Office/Business :: Financial :: Investment',
         'Topic :: Software Development :: Libraries :: Python Modules',
     ],
-    packages=['bloodloan'],
-    package_dir={'bloodloan': 'bloodloan'})
+    packages=['bloodloan', 'bloodloan.mortgage', 'bloodloan.ui'],
+    package_dir={'bloodloan': 'bloodloan'},
+    package_data={'bloodloan.ui': ['templ/*.mako']},
+    entry_points={
+        'console_scripts': [
+            'bloodloan = bloodloan.cli:main',
+        ],
+    })
@@ -0,0 +1,72 @@
+"""Tests that the vectorized schedule matches schedule.schedule()"""
+
+import logging
+import os
+
+import pytest
+
+from bloodloan.mortgage import amortize
+from bloodloan.mortgage import costconfig
+from bloodloan.mortgage import mmath
+from bloodloan.mortgage import schedule
+
+
+CONFIGDIR = os.path.join(os.path.dirname(__file__), os.pardir, 'configs')
+
+COLUMNS = (
+    'index', 'regularpmt', 'interestpmt', 'balancepmt', 'overpmt', 'principal',
+    'value', 'rent', 'totalinterest', 'totalothercosts', 'totalpmt', 'equity')
+
+
+def cent_cutoff_overpayment(interestrate, principal, term, months):
+    """A constant overpayment that leaves half a cent of principal after some months"""
+    mrate = mmath.monthlyrate(interestrate)
+    growth = (1 + mrate)**months
+    return (
+        (growth * principal - 0.005) * mrate / (growth - 1) -
+        mmath.monthly_payment(interestrate, principal, term))
+
+
+def changing_overpayments(term):
+    """Overpay 100 a month for five years, then 1500 a month"""
+    return [100] * 60 + [1500] * (term - 60)
+
+
+def large_first_overpayment(principal, term):
+    """Pay off all but 1000 of the principal in the first month"""
+    return [principal - 1000] + [0] * (term - 1)
+
+
+CASES = [
+    # interestrate, principal, term, overpayments, the final month rule it exercises
+    (0.04, 200000, 360, None, None),
+    (0.0325, 150000, 180, [250] * 180, "Truncating balance payment"),
+    (0.07, 300000, 360, changing_overpayments(360), "Truncating overpayment"),
+    (0.05, 10000, 12, large_first_overpayment(10000, 12), "Truncating balance payment"),
+    (0.05, 10000, 12, [cent_cutoff_overpayment(0.05, 10000, 12, 2)] * 12, "fraction of a cent"),
+    (0.001, 50000, 120, [333.33] * 120, None),
+]
+
+
+@pytest.mark.parametrize('interestrate, principal, term, overpayments, rule', CASES)
+@pytest.mark.parametrize('withcosts', (False, True))
+def test_amortize_matches_schedule(
+        caplog, interestrate, principal, term, overpayments, rule, withcosts):
+    monthlycosts = None
+    if withcosts:
+        monthlycosts = costconfig.CostConfigurationCollection(directory=CONFIGDIR).monthly
+    args = (interestrate, principal * 1.25, principal, principal * 1.25, term)
+    kwargs = {
+        'overpayments': overpayments, 'appreciation': 0.03,
+        'monthlycosts': monthlycosts, 'monthlyrent': 1800}
+
+    with caplog.at_level(logging.INFO, logger='bloodloan.mortgage.schedule'):
+        expected = list(schedule.schedule(*args, **kwargs))
+    if rule:
+        assert rule in caplog.text
+    result = amortize.amortize(*args, **kwargs)
+
+    assert len(result) == len(expected)
+    for name in COLUMNS:
+        assert result.columns[name].tolist() == pytest.approx(
+            [getattr(payment, name) for payment in expected], abs=1e-6), name
@@ -0,0 +1,113 @@
+"""Tests for the command line batch calculator"""
+
+import csv
+import json
+import logging
+import os
+
+import pytest
+
+from bloodloan import cli
+from bloodloan.mortgage import mmath
+
+
+CONFIGDIR = os.path.join(os.path.dirname(__file__), os.pardir, 'configs')
+
+
+def write(tmp_path, name, text):
+    """Write an input file and return its path"""
+    path = os.path.join(str(tmp_path), name)
+    with open(path, 'w') as infile:
+        infile.write(text)
+    return path
+
+
+def read_csv(path):
+    """Read an output CSV file as a list of dicts"""
+    with open(path, newline='') as outfile:
+        return list(csv.DictReader(outfile))
+
+
+def test_csv_summaries(tmp_path):
+    inpath = write(tmp_path, 'in.csv', "\n".join([
+        "id,saleprice,interestrate,years,costs",
+        "first,250000,4,30,",
+        "second,100000,6.5,15,IronHarbor FHA costs",
+        ""]))
+    outpath = os.path.join(str(tmp_path), 'out.csv')
+    assert cli.main(inpath, '-c', CONFIGDIR, '-o', outpath) == 0
+
+    rows = read_csv(outpath)
+    assert [row['id'] for row in rows] == ['first', 'second']
+    assert list(rows[0]) == list(cli.SUMMARY_FIELDS)
+    assert float(rows[0]['loanamount']) == 250000
+    assert int(rows[0]['months']) == 360
+    assert float(rows[0]['monthlypayment']) == pytest.approx(
+        mmath.monthly_payment(0.04, 250000, 360))
+    # 3.5% down, then the upfront FHA premium is financed
+    assert float(rows[1]['loanamount']) == pytest.approx(96500 * 1.0175)
+    assert int(rows[1]['months']) == 180
+
+
+def test_jsonl_errors_are_reported_per_line(tmp_path, caplog):
+    inpath = write(tmp_path, 'in.jsonl', "\n".join([
+        json.dumps({'id': 'good', 'saleprice': 200000, 'interestrate': 5}),
+        '{"id": "truncated", "saleprice": ',
+        '[200000, 5]',
+        json.dumps({'id': 'missing', 'saleprice': 200000}),
+        "",
+        json.dumps({'saleprice': 150000, 'interestrate': 3.5, 'years': 15}),
+        ""]))
+    outpath = os.path.join(str(tmp_path), 'out.jsonl')
+    with caplog.at_level(logging.ERROR, logger='bloodloan.cli'):
+        assert cli.main(inpath, '-o', outpath) == 1
+
+    with open(outpath) as outfile:
+        rows = [json.loads(line) for line in outfile]
+    # Records without an id are identified by their line number
+    assert [row['id'] for row in rows] == ['good', 6]
+
+    errors = [record.getMessage() for record in caplog.records]
+    assert len(errors) == 3
+    assert errors[0].startswith("Line 2: JSONDecodeError")
+    assert errors[1] == "Line 3: ValueError: Expected a JSON object, not list"
+    assert errors[2] == "Line 4: ValueError: Missing required field interestrate"
+
+
+def test_csv_errors_set_exit_code(tmp_path, caplog):
+    inpath = write(tmp_path, 'in.csv', "\n".join([
+        "saleprice,interestrate,costs",
+        "250000,4,",
+        "abc,4,",
+        "250000,4,No such config",
+        ""]))
+    outpath = os.path.join(str(tmp_path), 'out.csv')
+    with caplog.at_level(logging.ERROR, logger='bloodloan.cli'):
+        assert cli.main(inpath, '-c', CONFIGDIR, '-o', outpath) == 1
+
+    assert [row['id'] for row in read_csv(outpath)] == ['2']
+    errors = [record.getMessage() for record in caplog.records]
+    assert errors[0] == "Line 3: ValueError: could not convert string to float: 'abc'"
+    assert errors[1].startswith("Line 4: ValueError: Unknown cost configs")
+
+
+def test_schedules(tmp_path):
+    inpath = write(tmp_path, 'in.csv', "id,saleprice,interestrate,years\nloan,100000,5,1\n")
+    outpath = os.path.join(str(tmp_path), 'out.csv')
+    assert cli.main(inpath, '--schedules', '-o', outpath) == 0
+
+    rows = read_csv(outpath)
+    assert list(rows[0]) == list(cli.SCHEDULE_FIELDS)
+    assert len(rows) == 12
+    assert float(rows[-1]['principal']) == pytest.approx(0, abs=1e-6)
+
+
+def test_worker_processes_give_the_same_results(tmp_path):
+    lines = ["saleprice,interestrate,overpayment"] + [
+        f"{100000 + 10000 * idx},{3 + idx / 4},{idx * 50}" for idx in range(20)]
+    inpath = write(tmp_path, 'in.csv', "\n".join(lines) + "\n")
+    serial = os.path.join(str(tmp_path), 'serial.csv')
+    parallel = os.path.join(str(tmp_path), 'parallel.csv')
+    assert cli.main(inpath, '-o', serial) == 0
+    assert cli.main(inpath, '-o', parallel, '-j', '2', '--chunksize', '3') == 0
+    assert read_csv(parallel) == read_csv(serial)
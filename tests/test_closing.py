@@ -0,0 +1,98 @@
+"""Tests for closing costs, against results worked out by hand"""
+
+import os
+
+import pytest
+
+from bloodloan.mortgage import closing
+from bloodloan.mortgage import costconfig
+
+
+CONFIGDIR = os.path.join(os.path.dirname(__file__), os.pardir, 'configs')
+
+CALC = costconfig.CostCalculationType
+PAY = costconfig.CostPaymentType
+
+
+def closingcost(label, paytype, calctype=CALC.DOLLAR_AMOUNT, value=None, calc=None):
+    """A closing cost"""
+    return costconfig.Cost(
+        label=label, costtype=costconfig.CostType.CLOSING,
+        value=value, calc=calc, calctype=calctype, paytype=paytype)
+
+
+def downpayment():
+    return closingcost("Down payment", PAY.DOWN_PAYMENT, CALC.SALE_FRACTION, calc=0.2)
+
+
+def repairs():
+    return closingcost("Repairs", PAY.PRINCIPAL, value=5000)
+
+
+def premium():
+    return closingcost("Financed premium", PAY.PRINCIPAL, CALC.LOAN_FRACTION, calc=0.02)
+
+
+def origination():
+    return closingcost("Origination", PAY.FEE, CALC.LOAN_FRACTION, calc=0.01)
+
+
+def values(result):
+    """Map the label of each cost in a CloseResult to its value"""
+    return {
+        cost.label: cost.value
+        for cost in result.downpayment + result.fees + result.principal}
+
+
+def test_bundled_configs():
+    costs = costconfig.CostConfigurationCollection(directory=CONFIGDIR).closing
+    plan = closing.ClosingPlan(costs)
+    result = plan.close(200000, 0.06, 4000)
+
+    # 3.5% down leaves 193000, and the 1.75% FHA premium is financed into the loan
+    principal = 193000 + 193000 * 0.0175
+    prepaid = principal * 0.06 / 12 * 0.5
+    dollarfees = 0 + 600 + 495 + 150 + 72 + 150 + 443 + 450 + 175 + 1440 + 360
+    assert values(result)["Upfront FHA mortgage insurance"] == pytest.approx(3377.5)
+    assert values(result)["Prepaid interest (est 15 days)"] == pytest.approx(prepaid)
+    assert values(result)["Taxes escrow (3 months)"] == pytest.approx(1000)
+    assert result.downpayment_total == pytest.approx(7000)
+    assert result.fees_total == pytest.approx(dollarfees + 1000 + prepaid)
+    assert result.principal_total == pytest.approx(principal)
+    assert plan.totals(200000, 0.06, 4000) == pytest.approx(
+        (result.downpayment_total, result.fees_total, result.principal_total))
+
+    # Costs that don't depend on the loan amount are reported first, as they always have been
+    assert [cost.label for cost in result.fees] == [
+        "Taxes escrow (3 months)", "Origination points", "Flat lender fee", "Appraisal",
+        "Lender attorney", "Tax service", "Credit reports/supplements",
+        "Title lenders and endorsements", "Title closing/courire fee", "County recording",
+        "Estimated prepaid insurance (1 year)", "Insurance escrow (3 months)",
+        "Prepaid interest (est 15 days)"]
+
+
+@pytest.mark.parametrize('costs', [
+    [downpayment(), premium(), repairs(), origination()],
+    [downpayment(), repairs(), premium(), origination()],
+    [premium(), origination(), repairs(), downpayment()],
+], ids=['premium-before-repairs', 'premium-after-repairs', 'down-payment-last'])
+def test_financed_loan_fraction_after_principal_costs(costs):
+    # 20% down leaves 80000, and the repairs are always added first: 85000.
+    # The premium is 2% of that, and origination is 1% of the loan including the premium
+    result = closing.close(100000, 0.05, 360, 3000, costs)
+    assert values(result)["Financed premium"] == pytest.approx(1700)
+    assert values(result)["Origination"] == pytest.approx(867)
+    assert result.principal_total == pytest.approx(86700)
+    assert closing.ClosingPlan(costs).totals(100000, 0.05, 3000) == pytest.approx(
+        (20000, 867, 86700))
+
+
+def test_loan_fraction_fee_before_financed_cost():
+    # A loan fraction listed before a financed loan fraction doesn't include it
+    costs = [origination(), downpayment(), premium(), repairs()]
+    result = closing.close(100000, 0.05, 360, 3000, costs)
+    assert values(result)["Origination"] == pytest.approx(850)
+    assert values(result)["Financed premium"] == pytest.approx(1700)
+    assert result.principal_total == pytest.approx(86700)
+    assert [cost.label for cost in result.principal] == [
+        "Sale price", "Down payment", "Repairs", "Financed premium"]
@@ -0,0 +1,128 @@
+"""Tests for validating cost configuration files"""
+
+import os
+import textwrap
+
+import pytest
+
+from bloodloan.mortgage import costconfig
+
+
+CONFIGDIR = os.path.join(os.path.dirname(__file__), os.pardir, 'configs')
+
+
+def write_config(tmp_path, text):
+    """Write a cost configuration file and return its path"""
+    path = os.path.join(str(tmp_path), 'costs.yaml')
+    with open(path, 'w') as cfile:
+        cfile.write(textwrap.dedent(text).lstrip())
+    return path
+
+
+INVALID = {
+    'unknown key': ("""
+        label: Costs
+        closing:
+          - label: Appraisal
+            value: 495
+            paymnet type: fee
+        """, 5, "Unknown key 'paymnet type'"),
+    'dollar amount without value': ("""
+        label: Costs
+        monthly:
+          - label: Insurance
+            value: 100
+          - label: Lawn care
+            payment type: fee
+        """, 5, "needs a value"),
+    'calctype without calc': ("""
+        label: Costs
+        closing:
+          - label: Down payment
+            calculation type: sale fraction
+            payment type: downpayment
+        """, 3, "has no nonzero calculation"),
+    'bad percentage': ("""
+        label: Costs
+        monthly:
+          - label: Management
+            calculation: ten%
+            calculation type: rent fraction
+        """, 4, "'ten%', not a number or a percentage"),
+    'capex without lifespan': ("""
+        label: Costs
+        capex:
+          - label: Roof
+            cost: 12000
+        """, 3, "needs a lifespan"),
+    'monthly calctype in closing': ("""
+        label: Costs
+        closing:
+          - label: Appraisal
+            value: 495
+          - label: Mortgage insurance
+            calculation: 0.85%
+            calculation type: BOY remaining principal fraction
+        """, 5, "closing costs can only be one of"),
+}
+
+
+@pytest.mark.parametrize('text, line, message', INVALID.values(), ids=list(INVALID))
+def test_problem_reported_at_line(tmp_path, text, line, message):
+    path = write_config(tmp_path, text)
+    contents, problems = costconfig.validate_config_file(path)
+    assert contents is not None
+    assert len(problems) == 1, problems
+    assert str(problems[0]).startswith(f"{path}:{line}: ")
+    assert message in problems[0].message
+    assert costconfig.parse_config_file(path) is None
+
+
+@pytest.mark.parametrize('text', [
+    INVALID['dollar amount without value'][0],
+    INVALID['calctype without calc'][0],
+], ids=['dollar amount without value', 'calctype without calc'])
+def test_validator_catches_what_check_catches(tmp_path, text):
+    # Costs from valid files skip Cost.check(),
+    # so the validator must reject what it or Cost() would
+    path = write_config(tmp_path, text)
+    contents, problems = costconfig.validate_config_file(path)
+    assert problems
+    with pytest.raises(Exception):
+        config = costconfig.CostConfiguration.fromdict(contents)
+        for cost in config.closing + config.monthly:
+            cost.check()
+
+
+def test_every_problem_is_reported(tmp_path):
+    path = write_config(tmp_path, """
+        label: Costs
+        colsing: []
+        monthly:
+          - label: Management
+            calculation: ten%
+            calculation type: rent fraction
+          - label: Lawn care
+        """)
+    _, problems = costconfig.validate_config_file(path)
+    assert [problem.line for problem in problems] == [2, 5, 7]
+
+
+def test_invalid_yaml(tmp_path):
+    path = write_config(tmp_path, """
+        label: Costs
+        monthly:
+          - label: [Insurance
+        """)
+    contents, problems = costconfig.validate_config_file(path)
+    assert contents is None
+    assert len(problems) == 1 and problems[0].message.startswith("Invalid YAML")
+
+
+def test_bundled_configs_are_valid():
+    for name in sorted(os.listdir(CONFIGDIR)):
+        path = os.path.join(CONFIGDIR, name)
+        _, problems = costconfig.validate_config_file(path)
+        assert problems == [], name
+        config = costconfig.parse_config_file(path)
+        assert all(cost.validated for cost in config.closing + config.monthly)
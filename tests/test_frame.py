@@ -0,0 +1,65 @@
+"""Tests for rolling a ScheduleFrame up into intervals"""
+
+import os
+
+import pytest
+
+from bloodloan.mortgage import amortize
+from bloodloan.mortgage import costconfig
+from bloodloan.mortgage import schedule
+
+
+CONFIGDIR = os.path.join(os.path.dirname(__file__), os.pardir, 'configs')
+
+COLUMNS = (
+    'index', 'regularpmt', 'interestpmt', 'balancepmt', 'overpmt', 'principal',
+    'value', 'rent', 'totalinterest', 'totalothercosts', 'totalpmt', 'equity')
+
+
+def short_frame(term, overpayment=0):
+    """A schedule of at most term months"""
+    return amortize.amortize(
+        0.04, 100000, 100000, 100000, term, overpayments=[overpayment] * term,
+        monthlyrent=1000)
+
+
+def check_one_year(frame):
+    """Check that a schedule of a year or less rolls up into a single year"""
+    years = frame.rollup()
+    assert len(years) == 1
+    assert years.interestpmt[0] == pytest.approx(frame.interestpmt.sum())
+    assert years.principal[0] == frame.principal[-1]
+    assert years.value[0] == frame.value[-1]
+    assert len(list(schedule.monthly2yearly_schedule(frame))) == 1
+
+
+def test_rollup_twelve_months():
+    frame = short_frame(12)
+    assert len(frame) == 12
+    check_one_year(frame)
+
+
+def test_rollup_two_months():
+    frame = short_frame(12, overpayment=60000)
+    assert len(frame) == 2
+    check_one_year(frame)
+
+
+@pytest.mark.parametrize('interval, offset', [(12, 0), (12, 9), (3, 0), (3, 2), (1, 0)])
+def test_rollup_matches_generator(interval, offset):
+    monthlycosts = costconfig.CostConfigurationCollection(directory=CONFIGDIR).monthly
+    frame = amortize.amortize(
+        0.045, 250000, 200000, 250000, 360, overpayments=[150] * 360,
+        appreciation=0.03, monthlycosts=monthlycosts, monthlyrent=1800)
+    result = frame.rollup(interval, offset)
+    expected = list(schedule.rollup(frame.loanpayments(), interval, offset))
+
+    assert len(result) == len(expected) > 1
+    for name in COLUMNS:
+        assert result.columns[name].tolist() == pytest.approx(
+            [getattr(payment, name) for payment in expected]), name
+    for row, payment in zip(result, expected):
+        assert [cost.label for cost in row.othercosts] == [
+            cost.label for cost in payment.othercosts]
+        assert [cost.value for cost in row.othercosts] == pytest.approx(
+            [cost.value for cost in payment.othercosts])
@@ -0,0 +1,79 @@
+"""Tests for investment metrics"""
+
+import logging
+
+import numpy
+import pytest
+
+from bloodloan.mortgage import amortize
+from bloodloan.mortgage import metrics
+
+
+def test_two_flow_irr():
+    # Paying 100 now and getting 110 back a year later is a 10% return
+    assert metrics.irr([-100, 110], periods=1) == pytest.approx(0.1)
+    assert metrics.npv(0.1, [-100, 110], periods=1) == pytest.approx(0)
+
+
+def test_monthly_irr_is_yearly():
+    # Getting 110 back twelve months later is also 10% a year
+    flows = [-100] + [0] * 11 + [110]
+    assert metrics.irr(flows) == pytest.approx(0.1)
+
+
+def test_all_negative_flows_have_no_irr():
+    result = metrics.irr([[-100, -10, -10], [-100, 50, 60]], periods=1)
+    assert numpy.isnan(result[0])
+    assert not numpy.isnan(result[1])
+
+
+def test_rows_needing_bisection(caplog):
+    # Newton's method can't converge in one iteration,
+    # so these rows are solved by bisection, and must agree with what Newton's method finds
+    flows = numpy.array([[-100] + [3] * 120 + [50], [-100] + [30] * 12 + [0] * 109])
+    newton = metrics.irr(flows)
+    with caplog.at_level(logging.DEBUG, logger='bloodloan.mortgage.metrics'):
+        bisected = metrics.irr(flows, guess=5, maxiter=1)
+    assert "Solving 2 IRRs by bisection" in caplog.text
+    assert bisected == pytest.approx(newton, abs=1e-6)
+    rates = metrics.annual2periodic(bisected)
+    for row, rate in zip(flows, rates):
+        assert metrics.npv(metrics.periodic2annual(rate), row) == pytest.approx(0, abs=1e-6)
+
+
+def test_npv_at_irr_is_zero():
+    rng = numpy.random.default_rng(1)
+    flows = numpy.concatenate((
+        -rng.uniform(1000, 5000, (50, 1)), rng.uniform(0, 100, (50, 120))), axis=1)
+    rates = metrics.irr(flows)
+    assert numpy.abs(metrics.npv(rates, flows)).max() < 1e-6
+
+
+def test_frame_and_loanpayments_agree():
+    frame = amortize.amortize(
+        0.05, 300000, 240000, 300000, 360, overpayments=[200] * 360, monthlyrent=2400)
+    payments = list(frame.loanpayments())
+    kwargs = {'downpayment': 60000, 'fees': 5000, 'saleprice': 300000, 'sellingcosts': 0.06}
+    fromframe = metrics.evaluate(frame, **kwargs)
+    fromlist = metrics.evaluate(payments, **kwargs)
+
+    assert fromframe.holds.tolist() == fromlist.holds.tolist()
+    assert fromframe.holds.tolist() == list(range(12, len(frame) + 1, 12))
+    assert fromframe.irr == pytest.approx(fromlist.irr)
+    assert fromframe.npv == pytest.approx(fromlist.npv)
+    for name in ('noi', 'debtservice', 'cashflow', 'caprate', 'cashoncash', 'dscr'):
+        assert getattr(fromframe, name) == pytest.approx(getattr(fromlist, name)), name
+
+
+def test_hold_cashflows():
+    frame = amortize.amortize(0.05, 100000, 80000, 100000, 12, monthlyrent=1000)
+    flows = metrics.hold_cashflows(frame, 20000, [6, 12])
+    monthly = 1000 - frame.totalpmt
+    assert flows.shape == (2, 13)
+    assert flows[:, 0].tolist() == [-20000, -20000]
+    assert flows[0, 1:6] == pytest.approx(monthly[:5])
+    assert flows[0, 6] == pytest.approx(monthly[5] + frame.equity[5])
+    assert flows[0, 7:].tolist() == [0] * 6
+    assert flows[1, 12] == pytest.approx(monthly[11] + frame.equity[11])
+    with pytest.raises(ValueError):
+        metrics.hold_cashflows(frame, 20000, [13])
@@ -0,0 +1,21 @@
+"""Tests for persisting parameter values"""
+
+import json
+import os
+import stat
+
+from bloodloan.ui import parameters
+
+
+def test_flush_keeps_file_mode(tmp_path):
+    path = os.path.join(str(tmp_path), '.param_persist')
+    params = parameters.Params(persist_path=path, flush_delay=None)
+    params.persist('rent', 1000)
+    assert stat.S_IMODE(os.stat(path).st_mode) == parameters.NEW_FILE_MODE
+
+    os.chmod(path, 0o640)
+    params.persist('rent', 1200)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    with open(path) as ppfile:
+        assert json.load(ppfile) == {'rent': 1200}
+    assert os.listdir(str(tmp_path)) == ['.param_persist']
@@ -0,0 +1,136 @@
+"""Tests for the geocode cache, with a fake HTTP responder instead of the network"""
+
+import os
+
+import pytest
+
+from bloodloan.ui import streetmap
+
+
+FAKE_RESULT = {
+    'lat': '30.2672',
+    'lon': '-97.7431',
+    'display_name': "123 Main St, Austin, Texas",
+    'address': {'neighborhood': "Downtown", 'county': "Travis County"},
+}
+
+
+class FakeResponse:
+    """A response from FakeHttpGet"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        """Return the response data"""
+        return self.data
+
+
+class FakeHttpGet:
+    """Stand in for requests.get, recording the URIs it was asked for"""
+
+    def __init__(self, results=None):
+        self.results = [FAKE_RESULT] if results is None else results
+        self.uris = []
+
+    def __call__(self, uri):
+        self.uris.append(uri)
+        return FakeResponse(self.results)
+
+
+class FakeClock:
+    """Stand in for time.time, which only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(streetmap.time, 'time', fake)
+    return fake
+
+
+def caching_mapper(tmp_path, results=None, **cacheargs):
+    """A CachingMapper around an OpenStreetMapper with a FakeHttpGet"""
+    httpget = FakeHttpGet(results)
+    cache = streetmap.GeocodeCache(os.path.join(str(tmp_path), 'geocode.db'), **cacheargs)
+    return streetmap.CachingMapper(streetmap.OpenStreetMapper(httpget=httpget), cache), httpget
+
+
+def test_hit_does_not_call_network(tmp_path, clock):
+    mapper, httpget = caching_mapper(tmp_path)
+    first = mapper.geocode("123 Main St")
+    second = mapper.geocode("123 Main St")
+    assert len(httpget.uris) == 1
+    assert mapper.cache.hits == 1 and mapper.cache.misses == 1
+    assert [result.coordinates for result in second] == [result.coordinates for result in first]
+    assert second[0].displayname == FAKE_RESULT['display_name']
+    assert second[0].county == "Travis County"
+
+
+def test_addresses_are_normalized(tmp_path, clock):
+    assert streetmap.normalize_address("  123 MAIN\tSt ") == "123 main st"
+    mapper, httpget = caching_mapper(tmp_path)
+    mapper.geocode("123 Main St")
+    mapper.geocode("123  main st")
+    mapper.geocode("\n123 MAIN ST ")
+    assert len(httpget.uris) == 1
+
+
+def test_expires_after_ttl(tmp_path, clock):
+    mapper, httpget = caching_mapper(tmp_path, ttl=100, emptyttl=10)
+    mapper.geocode("123 Main St")
+    clock.now += 99
+    mapper.geocode("123 Main St")
+    assert len(httpget.uris) == 1
+    clock.now += 2
+    mapper.geocode("123 Main St")
+    assert len(httpget.uris) == 2
+
+
+def test_empty_results_expire_after_emptyttl(tmp_path, clock):
+    mapper, httpget = caching_mapper(tmp_path, results=[], ttl=100, emptyttl=10)
+    assert mapper.geocode("Nowhere") == []
+    clock.now += 9
+    assert mapper.geocode("Nowhere") == []
+    assert len(httpget.uris) == 1
+    clock.now += 2
+    mapper.geocode("Nowhere")
+    assert len(httpget.uris) == 2
+
+
+def test_put_deletes_expired_rows(tmp_path, clock):
+    cache = streetmap.GeocodeCache(os.path.join(str(tmp_path), 'geocode.db'), ttl=100)
+    cache.put('backend', "old", [{'coordinates': []}])
+    clock.now += 101
+    cache.put('backend', "new", [{'coordinates': []}])
+    with cache._connect() as conn:  # pylint: disable=W0212
+        addresses = [row[0] for row in conn.execute("SELECT address FROM geocodes")]
+    assert addresses == ["new"]
+
+
+def test_evicts_least_recently_used(tmp_path, clock):
+    cache = streetmap.GeocodeCache(os.path.join(str(tmp_path), 'geocode.db'), maxentries=2)
+    cache.put('backend', "first", [{'n': 1}])
+    clock.now += 1
+    cache.put('backend', "second", [{'n': 2}])
+    clock.now += 1
+    # Reading the first makes the second the least recently used
+    assert cache.get('backend', "first") == [{'n': 1}]
+    clock.now += 1
+    cache.put('backend', "third", [{'n': 3}])
+    assert cache.get('backend', "second") is None
+    assert cache.get('backend', "first") == [{'n': 1}]
+    assert cache.get('backend', "third") == [{'n': 3}]
+
+
+def test_backends_are_cached_separately(tmp_path, clock):
+    cache = streetmap.GeocodeCache(os.path.join(str(tmp_path), 'geocode.db'))
+    cache.put('one', "123 Main St", [{'n': 1}])
+    assert cache.get('two', "123 Main St") is None
+    assert cache.get('one', "123 Main St") == [{'n': 1}]
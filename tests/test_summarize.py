@@ -0,0 +1,54 @@
+"""Tests for closed-form summaries of constant-overpayment loans"""
+
+import itertools
+
+import pytest
+
+from bloodloan.mortgage import mmath
+from bloodloan.mortgage import schedule
+
+
+PRINCIPALS = (1000, 87654.32, 200000, 1250000)
+TERMS = (12, 180, 360)
+OVERPAYMENTS = (0, 0.005, 1, 250, 3000, 200000)
+
+
+@pytest.mark.parametrize('interestrate', (0.001, 0.0375, 0.065, 0.12, 0.25))
+def test_summarize_matches_schedule(interestrate):
+    for principal, term, overpayment in itertools.product(PRINCIPALS, TERMS, OVERPAYMENTS):
+        payments = list(schedule.schedule(
+            interestrate, principal, principal, principal, term,
+            overpayments=[overpayment] * term))
+        summary = schedule.summarize(interestrate, principal, term, overpayment)
+        assert summary.months == len(payments), (principal, term, overpayment)
+        assert summary.totalinterest == pytest.approx(payments[-1].totalinterest, abs=1e-4)
+
+
+@pytest.mark.parametrize('overpayment', (0, 100))
+def test_balance_after_matches_schedule(overpayment):
+    payments = list(schedule.schedule(
+        0.05, 300000, 300000, 300000, 360, overpayments=[overpayment] * 360))
+    for payment in payments[:-1]:
+        balance = mmath.balance_after(0.05, 300000, 360, payment.index + 1, overpayment)
+        assert balance == pytest.approx(payment.principal, abs=1e-4)
+
+
+def test_payoff_months_ignores_final_fraction_of_a_cent():
+    # Solve balance_after() for the overpayment that leaves half a cent after two months
+    interestrate, principal, term, months = 0.05, 10000, 12, 2
+    mrate = mmath.monthlyrate(interestrate)
+    growth = (1 + mrate)**months
+    overpayment = (
+        (growth * principal - 0.005) * mrate / (growth - 1) -
+        mmath.monthly_payment(interestrate, principal, term))
+    assert 0 < mmath.balance_after(interestrate, principal, term, months, overpayment) < 0.01
+
+    payments = list(schedule.schedule(
+        interestrate, principal, principal, principal, term, overpayments=[overpayment] * term))
+    assert len(payments) == months
+    assert mmath.payoff_months(interestrate, principal, term, overpayment) == months
+
+
+def test_payoff_months_never_paid_off():
+    with pytest.raises(ValueError):
+        mmath.payoff_months(0.05, 100000, 360, -1000)